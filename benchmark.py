@@ -0,0 +1,85 @@
+import argparse
+
+from src.benchmarks import BASELINE_FILE, collect_benchmarks, find_regressions, load_baseline, measure, save_baseline
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the harness against local mocks and compare with the stored baseline")
+    parser.add_argument(
+        "--records",
+        type=int,
+        nargs="+",
+        default=[10, 1000],
+        help="CRM sizes for reset, dump and evaluator benchmarks (default: 10 1000)"
+    )
+    parser.add_argument(
+        "--lines",
+        type=int,
+        nargs="+",
+        default=[100, 10000],
+        help="Result lines for pass^k and CSV benchmarks (default: 100 10000)"
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        default=None,
+        help="Run only benchmarks with these names, e.g. dump_hubspot calculate_pass_k"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Timed repeats of each benchmark, the fastest is reported (default: 5)"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed relative slowdown against the baseline (default: 0.25)"
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=0.1,
+        help="Allowed relative growth of peak memory against the baseline (default: 0.1)"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=BASELINE_FILE,
+        help="Baseline file, measured on this machine (default: benchmarks/baseline.json)"
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store the measurements as the new baseline instead of comparing"
+    )
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.baseline)
+    if not baseline and not args.save_baseline:
+        print(f"- No baseline at {args.baseline}, run with --save-baseline to store one")
+    measurements = {}
+    for benchmark in collect_benchmarks(records=args.records, lines=args.lines, only=args.only):
+        measured = measure(benchmark, repeat=args.repeat)
+        measurements[benchmark.id] = measured
+        base = baseline.get(benchmark.id)
+        compared = f" (baseline {base['seconds']:.4f}s, {base['peak_kb']:.1f}KB)" if base else ""
+        print(f"- {benchmark.id}: {measured['seconds']:.4f}s, {measured['peak_kb']:.1f}KB peak{compared}")
+
+    if args.save_baseline:
+        save_baseline(measurements, args.baseline)
+        print(f"\n- Saved baseline to {args.baseline}")
+        exit(0)
+
+    regressions = find_regressions(
+        measurements,
+        baseline,
+        threshold=args.threshold,
+        memory_threshold=args.memory_threshold
+    )
+    if regressions:
+        print("\n- Regressions -")
+        for regression in regressions:
+            print(f"  {regression}")
+        exit(1)
+    print("\n- No regressions")
@@ -0,0 +1,179 @@
+import argparse
+import io
+import os
+import time
+from contextlib import nullcontext, redirect_stdout
+
+from src.change_feed import CrmMirror
+from src.crm_agent import CRMAgent
+from src.dump_hubspot import use_change_feed
+from src.evaluator import Evaluator
+from src.fake_hubspot import FakeHubSpot
+from src.fault_injection import FAULT_COUNTS, FaultPlan, install_fault_injection
+from src.tool_cache import install_tool_cache
+from src.metrics import METRICS
+from src.scripted_llm import register_scripted_llm
+from src.shared import Model
+from src.vibecode_toolset import create_vibecode_toolset
+from run import load_tasks, run_trial
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Push trials through reset, agent, dump and evaluation with a scripted LLM and an in-memory HubSpot")
+    parser.add_argument(
+        "--trials",
+        type=int,
+        default=100,
+        help="Number of trials per task (default: 100)"
+    )
+    parser.add_argument(
+        "--tasks",
+        nargs="+",
+        default=None,
+        help="Names of tasks to run (default: all tasks in data/tasks.jsonl)"
+    )
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=0.0,
+        help="Mean seconds the scripted LLM waits before each completion (default: 0)"
+    )
+    parser.add_argument(
+        "--pass-rate",
+        type=float,
+        default=0.8,
+        help="Probability that the scripted judge passes a trial (default: 0.8)"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Seed of think times and verdicts (default: None)"
+    )
+    parser.add_argument(
+        "--trial-timeout",
+        type=float,
+        default=None,
+        help="Deadline in seconds for each trial (default: none)"
+    )
+    parser.add_argument(
+        "--faults",
+        type=str,
+        default=None,
+        help="Faults to inject into the agent's HubSpot requests and tool calls, as in run.py (default: none)"
+    )
+    parser.add_argument(
+        "--fault-seed",
+        type=int,
+        default=0,
+        help="Seed of the fault schedule (default: 0)"
+    )
+    parser.add_argument(
+        "--tool-cache",
+        action="store_true",
+        help="Memoize read-only tool calls within each trial, as in run.py"
+    )
+    parser.add_argument(
+        "--incremental-dump",
+        action="store_true",
+        help="Dump through the change feed mirror, as in run.py"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream agent completions and pipeline tool calls, as in run.py"
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print the trial log instead of only the summary"
+    )
+    args = parser.parse_args()
+
+    # the vibecode toolset requires a token, the fake HubSpot ignores it
+    os.environ.setdefault("HUBSPOT_API_KEY", "loadtest")
+    register_scripted_llm(think_time=args.think_time, pass_rate=args.pass_rate, seed=args.seed)
+
+    if args.tool_cache:
+        install_tool_cache()
+
+    if args.incremental_dump:
+        use_change_feed(CrmMirror())
+
+    if args.faults:
+        try:
+            install_fault_injection(FaultPlan.parse(args.faults, seed=args.fault_seed))
+        except ValueError as e:
+            parser.error(str(e))
+
+    tasks = load_tasks()
+    if args.tasks:
+        tasks = [task for task in tasks if task.name in args.tasks]
+
+    hubspot = FakeHubSpot()
+    agent = CRMAgent(model=Model.SCRIPTED, tools=create_vibecode_toolset(), stream=args.stream)
+    durations = []
+    passed = 0
+    errors = 0
+    fault_infos = []
+    streaming_infos = []
+    cache_infos = []
+
+    METRICS.start()
+    METRICS.plan(args.trials * len(tasks))
+    print(f"- Running {args.trials * len(tasks)} trials")
+    started = time.perf_counter()
+    with hubspot.patch():
+        for task in tasks:
+            for i in range(1, args.trials+1):
+                trial_started = time.perf_counter()
+                with nullcontext() if args.verbose else redirect_stdout(io.StringIO()):
+                    result = run_trial(
+                        agent=agent,
+                        task=task,
+                        model=Model.SCRIPTED,
+                        trial_idx=i,
+                        trials_count=args.trials,
+                        seed=args.seed,
+                        judge=Evaluator(model=Model.SCRIPTED),
+                        trial_timeout=args.trial_timeout,
+                    )
+                durations.append(time.perf_counter() - trial_started)
+                passed += 1 if result.verdict and result.verdict.verdict else 0
+                errors += 1 if result.error else 0
+                if result.info.get("faults"):
+                    fault_infos.append(result.info["faults"])
+                if result.info.get("tool_cache"):
+                    cache_infos.append(result.info["tool_cache"])
+                if result.info.get("streaming"):
+                    streaming_infos.append(result.info["streaming"])
+    elapsed = time.perf_counter() - started
+
+    durations.sort()
+    print(f"- {len(durations)} trials in {elapsed:.2f}s ({len(durations) / elapsed * 60:.1f} trials/min)")
+    print(f"  passed: {passed}, errors: {errors}, timeouts: {METRICS.outcomes['timeout']}")
+    print(f"  trial duration p50: {durations[len(durations) // 2]:.4f}s, p95: {durations[int(len(durations) * 0.95)]:.4f}s, max: {durations[-1]:.4f}s")
+    if fault_infos:
+        injected = {name: sum(info[name] for info in fault_infos) for name in FAULT_COUNTS}
+        p95s = sorted(info["tool_call_p95"] for info in fault_infos if info["tool_call_p95"] is not None)
+        print(f"- Faults injected: {', '.join(f'{name}: {count}' for name, count in injected.items())}, delay total {sum(info['injected_seconds'] for info in fault_infos):.2f}s")
+        if p95s:
+            print(f"  tool call p95 per trial, median: {p95s[len(p95s) // 2]:.4f}s, worst: {p95s[-1]:.4f}s, tool call max: {max(info['tool_call_max'] for info in fault_infos):.4f}s")
+    if cache_infos:
+        reads = sum(info["reads"] for info in cache_infos)
+        hits = sum(info["hits"] for info in cache_infos)
+        print(f"- Tool cache: {hits} of {reads} reads served from cache, {sum(info['writes'] for info in cache_infos)} writes,"
+              f" {sum(info['invalidated'] for info in cache_infos)} entries invalidated, {sum(info['saved_seconds'] for info in cache_infos):.2f}s saved")
+    if streaming_infos:
+        steps = [step for info in streaming_infos for step in info["steps"] if step["time_to_first_tool"] is not None]
+        tool_seconds = sum(info["tool_seconds"] for info in streaming_infos)
+        overlap = sum(info["overlap_seconds"] for info in streaming_infos)
+        first_tool = sorted(step["time_to_first_tool"] for step in steps)
+        print(f"- Streaming: {len(steps)} steps with tool calls, {overlap:.2f}s of {tool_seconds:.2f}s tool time overlapped with generation")
+        if first_tool:
+            print(f"  time to first tool p50: {first_tool[len(first_tool) // 2]:.4f}s, p95: {first_tool[int(len(first_tool) * 0.95)]:.4f}s")
+    print("- Stages")
+    for name, stats in METRICS.snapshot()["stages"].items():
+        print(f"  {name:<10} avg {stats['avg_seconds']:.4f}s, max {stats['max_seconds']:.4f}s, total {stats['total_seconds']:.2f}s")
+    print(f"- HubSpot requests: {hubspot.total_requests()}")
+    for (method, path), count in sorted(hubspot.requests_count.items(), key=lambda item: -item[1]):
+        print(f"  {count:>8}  {method} {path}")
@@ -0,0 +1,22 @@
+import argparse
+
+from src.sharding import SHARDS_DIR, merge_shards
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge per-shard result files into results files for process.py")
+    parser.add_argument(
+        "--shards-dir",
+        type=str,
+        default=SHARDS_DIR,
+        help=f"Directory with per-shard result files (default: {SHARDS_DIR})"
+    )
+    args = parser.parse_args()
+
+    merged = merge_shards(args.shards_dir)
+    if len(merged) == 0:
+        print("No shard results to merge. Exiting.")
+        exit(1)
+
+    for toolset, trials, duplicates, partial in merged:
+        skipped = f", {partial} partially written lines skipped" if partial else ""
+        print(f"- Merged {trials} trials into results/{toolset}.jsonl ({duplicates} duplicates dropped{skipped})")
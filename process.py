@@ -1,9 +1,15 @@
 import argparse
 import json
 
-from run import toolset_options
-from src.processing.pass_k import calculate_pass_k, create_csv_pass_k, PassKResult
+from src.fault_injection import fault_summary
+from src.processing.pass_k import AVG_LITERAL, count_results, create_csv_pass_k, excluded_summary, format_pass_k, pass_k_from_counts, PassKResult
+from src.processing.result_index import update_counts
 from src.processing.utils import csv_to_markdown
+from src.profiler import DEFAULT_INTERVAL, SamplingProfiler
+from src.tool_cache import cache_summary
+from src.tool_retrieval import retrieval_summary
+from src.toolset_registry import toolset_names
+from contextlib import nullcontext
 import os
 
 PROCESSING_DIRNAME = 'processed'
@@ -50,9 +56,9 @@ if __name__ == "__main__":
     parser.add_argument(
         "--toolsets",
         nargs="+",
-        choices=list(toolset_options),
+        choices=toolset_names(),
         required=True,
-        help=f"Specify one or more toolsets to process: {', '.join(toolset_options)}"
+        help=f"Specify one or more toolsets to process: {', '.join(toolset_names())}"
     )
     parser.add_argument(
         "--ix",
@@ -60,19 +66,73 @@ if __name__ == "__main__":
         default=None,
         help="Specify the index of results file to process (default: without index)"
     )
+    parser.add_argument(
+        "--baseline-ix",
+        type=int,
+        default=None,
+        help="Index of a results file to compare pass^k against, such as a run without --tool-top-k (default: no comparison)"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Reread results files from the beginning instead of folding new lines into their sidecar index"
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample the stacks while processing and write flamegraphs, collapsed stacks and a Chrome trace to profiles/"
+    )
+    parser.add_argument(
+        "--profile-interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help=f"Seconds between profiler samples (default: {DEFAULT_INTERVAL})"
+    )
 
     args = parser.parse_args()
     run_id = f"run_{args.ix}" if bool(args.ix) else "run_0"
 
     processed_result: PassKResult = {}
+    retrieval_summaries = {}
+    fault_summaries = {}
+    cache_summaries = {}
+    excluded_summaries = {}
+    baseline_pass_ks = {}
+
+    profiler = SamplingProfiler(interval=args.profile_interval) if args.profile else None
+    stage = profiler.stage if profiler else lambda name: nullcontext()
+    if profiler:
+        profiler.start()
 
     for toolset in args.toolsets:
         results_file = get_result_filepath(toolset, args.ix)
 
         if os.path.exists(results_file):
             print(f"- Processing results file: {results_file}")
-            pass_hat_ks = calculate_pass_k(results_file)
-            processed_result[toolset] = pass_hat_ks
+            with stage("count"):
+                counts = count_results(results_file) if args.full else update_counts(results_file)
+            with stage("pass_k"):
+                processed_result[toolset] = pass_k_from_counts(counts)
+            retrieval = retrieval_summary(counts)
+            if retrieval:
+                retrieval_summaries[toolset] = retrieval
+            faults = fault_summary(counts)
+            if faults:
+                fault_summaries[toolset] = faults
+            cache = cache_summary(counts)
+            if cache:
+                cache_summaries[toolset] = cache
+            excluded = excluded_summary(counts)
+            if excluded:
+                excluded_summaries[toolset] = excluded
+            baseline_file = get_result_filepath(toolset, args.baseline_ix) if args.baseline_ix is not None else None
+            if baseline_file and os.path.exists(baseline_file):
+                with stage("count"):
+                    baseline_counts = count_results(baseline_file) if args.full else update_counts(baseline_file)
+                baseline_pass_ks[toolset] = pass_k_from_counts(baseline_counts)[AVG_LITERAL]
+            elif baseline_file:
+                print(f"- Baseline file {baseline_file} does not exist. Skipping the comparison.")
         else:
             print(f"- Results file {results_file} does not exist. Skipping.")
     
@@ -83,11 +143,12 @@ if __name__ == "__main__":
     csv_results = create_csv_pass_k(processed_result, run_id=run_id)
 
     try:
-        written_files = write_results_to_files(
-            data=processed_result,
-            csv=csv_results,
-            run_id=run_id
-)
+        with stage("write"):
+            written_files = write_results_to_files(
+                data=processed_result,
+                csv=csv_results,
+                run_id=run_id
+            )
         print("\n- Saved processed results to disk")
         for file in written_files:
             print(f"  {file}")
@@ -96,6 +157,37 @@ if __name__ == "__main__":
     finally:
         print("\n- Processed results -")
         print(csv_to_markdown(csv_results))
-
-        
-
+        for toolset, retrieval in retrieval_summaries.items():
+            print(
+                f"- {toolset} tool retrieval: {retrieval['schema_tokens_per_trial']} of {retrieval['schema_tokens_full_per_trial']}"
+                f" schema tokens per trial ({retrieval['schema_tokens_saved']:.0%} saved, {retrieval['trials']} trials)"
+            )
+            without = f" vs {format_pass_k(retrieval['pass_k_without'])} in {retrieval['trials_without']} trials without" if retrieval["trials_without"] else ""
+            print(f"- {toolset} with tool retrieval: {format_pass_k(retrieval['pass_k'])}{without}")
+        for toolset, baseline_pass_k in baseline_pass_ks.items():
+            print(f"- {toolset} vs run_{args.baseline_ix}: {format_pass_k(processed_result[toolset][AVG_LITERAL])} vs {format_pass_k(baseline_pass_k)}")
+        for toolset, faults in fault_summaries.items():
+            clean = f", {faults['clean_pass_rate']:.0%} in {faults['clean_trials']} trials without" if faults["clean_trials"] else ""
+            print(
+                f"- {toolset} under faults: {faults['pass_rate']:.0%} passed in {faults['trials']} trials{clean},"
+                f" {faults['faults_per_trial']} faults per trial, worst tool call p95 {faults['worst_tool_call_p95_ms']}ms, max {faults['worst_tool_call_max_ms']}ms"
+            )
+        for toolset, cache in cache_summaries.items():
+            print(
+                f"- {toolset} tool cache: {cache['hit_rate']:.0%} of {cache['reads']} reads served from cache,"
+                f" {cache['saved_seconds_per_trial']}s of tool time saved per trial ({cache['trials']} trials)"
+            )
+        for toolset, excluded in excluded_summaries.items():
+            for key, label in (("infra_errors", "infra errors"), ("budget_stopped", "stopped by the sweep or toolset budget")):
+                if key not in excluded:
+                    continue
+                tasks = ", ".join(f"{task_name} {count}" for task_name, count in excluded[key].items())
+                print(
+                    f"- {toolset} {label}: {sum(excluded[key].values())} trials left out of pass^k"
+                    f" next to {excluded['counted_trials']} counted ({tasks})"
+                )
+        if profiler:
+            profiler.stop()
+            print(profiler.summary())
+            for path in profiler.save("process"):
+                print(f"  {path}")
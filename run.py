@@ -1,16 +1,29 @@
 import os
 import json
 from dotenv import load_dotenv
-from superface import Superface
-from superface.client.superface import SuperfaceAPI
-from composio_openai import ComposioToolSet, Action
+from contextlib import ExitStack, nullcontext
 from typing import List, Optional, TextIO
-from src.reset_hubspot import reset_hubspot
-from src.shared import Model, Task, Tool, Toolset, SolveResult, Verdict
+from src.adaptive import AdaptiveScheduler
+from src.processing.pass_k import excluded_from_pass_k
+from src.reset_hubspot import reset_hubspot, wait_for_search_index
+from src.shared import Model, Task, Toolset, SolveResult, Verdict
 from src.crm_agent import CRMAgent
-from src.dump_hubspot import dump_hubspot
-from src.evaluator import Evaluator
-from src.vibecode_toolset import create_vibecode_toolset
+from src.dump_hubspot import dump_hubspot, seed_change_feed, use_change_feed
+from src.crm_render import touched_ids
+from src.change_feed import CrmMirror
+from src.budget import BudgetGovernor, admit_trial, budget_scope, current_governor, install_budget
+from src.deadline import Deadline, deadline_scope, drain_abandoned, is_deadline_timeout
+from src.evaluator import CascadingEvaluator, Evaluator, Judge
+from src.fault_injection import FaultPlan, fault_scope, install_fault_injection
+from src.resume import DEFAULT_MAX_RETRIES, configure_resume, is_infra_error, resumable, resume_scope
+from src.tool_cache import install_tool_cache, tool_cache_scope
+from src.fingerprint import cell_fingerprint, load_baseline, reuse_results
+from src.blob_store import BlobStore
+from src.results import open_results_file, results_file_name, results_file_path, set_blob_store, write_result_to_file
+from src.profiler import DEFAULT_INTERVAL, SamplingProfiler
+from src.metrics import METRICS, MetricsExporter, install_http_metrics, progress_line
+from src.sharding import Heartbeat, Shard, TrialItem, WorkQueue, default_worker_id, enumerate_trials, open_shard_results_file, portal_fingerprint
+from src.toolset_registry import create_toolset, toolset_names
 import argparse
 
 load_dotenv()
@@ -20,88 +33,6 @@ def create_empty_toolset() -> Toolset:
         tools=[]
     )
 
-def create_superface_toolset() -> Toolset:
-    superface = Superface(api_key=os.getenv("SUPERFACE_API_KEY"))
-    sf_tools = superface.get_tools(user_id="benchmark")
-    return Toolset(
-        name="Superface Toolset",
-        tools=[
-            Tool(
-                name=tool.name,
-                description=tool.description,
-                parameters=tool.input_schema_raw,
-                handler=lambda arguments, tool=tool: tool.run(arguments),
-            )
-            for tool in sf_tools
-        ]
-    )
-
-def create_superface_specialiasts_toolset() -> Toolset:
-    superface = SuperfaceAPI(api_key=os.getenv("SUPERFACE_API_KEY"), base_url="https://pod.superface.ai")
-    specialist_fd = superface.get(path='/api/specialists/hubspot', user_id="benchmark")
-
-    return Toolset(
-        name="Superface Specialist Toolset",
-        tools=[
-            Tool(
-                name=specialist_fd['name'],
-                description=specialist_fd['description'],
-                parameters=specialist_fd['parameters'],
-                handler=lambda arguments: superface.post(path='/api/specialists/hubspot', data=json.loads(arguments), user_id="benchmark"),
-            )
-        ]
-    )
-
-def create_superface_dynamic_specialists_toolset() -> Toolset:
-    superface = SuperfaceAPI(api_key=os.getenv("SUPERFACE_API_KEY"), base_url="https://pod.superface.ai")
-    specialist_fd = superface.get(path='/api/specialists/dynamic/hubspot', user_id="benchmark")
-
-    return Toolset(
-        name="Superface Dynamic Specialist Toolset",
-        tools=[
-            Tool(
-                name=specialist_fd['name'],
-                description=specialist_fd['description'],
-                parameters=specialist_fd['parameters'],
-                handler=lambda arguments: superface.post(path='/api/specialists/dynamic/hubspot', data=json.loads(arguments), user_id="benchmark"),
-            )
-        ]
-    )
-
-def create_composio_toolset() -> Toolset:
-    toolset = ComposioToolSet(api_key=os.getenv("COMPOSIO_API_KEY"))
-
-    tools = toolset.get_tools(
-        # filtering by tags doesn't work: https://github.com/ComposioHQ/composio/issues/1548
-        # apps=[App.HUBSPOT],
-        # tags=[Tag.HUBSPOT_CORE, Tag.HUBSPOT_BASIC],
-        actions=[
-            Action.HUBSPOT_CREATE_CONTACT_OBJECT_WITH_PROPERTIES, 
-            Action.HUBSPOT_CREATE_COMPANY_OBJECT, 
-            Action.HUBSPOT_SEARCH_CONTACTS_BY_CRITERIA, 
-            Action.HUBSPOT_SEARCH_COMPANY_OBJECTS,
-            Action.HUBSPOT_CREATE_NEW_DEAL_OBJECT,
-            Action.HUBSPOT_SEARCH_DEALS_BY_CRITERIA,
-            Action.HUBSPOT_READ_PROPERTY_GROUPS_FOR_OBJECT_TYPE,
-            Action.HUBSPOT_LIST_ASSOCIATION_TYPES,
-            Action.HUBSPOT_CREATE_BATCH_OF_OBJECTS,
-        ],
-    )
-    
-    return Toolset(
-        name="Composio Toolset",
-        tools=[
-            Tool(
-                name=tool['function']['name'],
-                description=tool['function']['description'],
-                parameters=tool['function']['parameters'],
-                handler=lambda arguments, tool=tool: toolset.execute_action(action=tool["function"]["name"], params=json.loads(arguments))
-            )
-            for tool in tools
-        ]
-    )
-    
-
 def load_tasks(slice: Optional[slice] = None) -> List[Task]:
     base_dir = os.path.dirname(os.path.abspath(__file__))
     tasks_file = os.path.join(base_dir, "./data/tasks.jsonl")
@@ -114,85 +45,315 @@ def load_tasks(slice: Optional[slice] = None) -> List[Task]:
         tasks = tasks[slice]
     return tasks
 
-def solve_task(*, file: TextIO, task: Task, toolset: Toolset, model: Model, trials_count: int, seed: Optional[int] = None):
-    agent = CRMAgent(
-        model=model,
-        tools=toolset
+def timeout_result(*, result: Optional[SolveResult], task: Task, model: Model, trial_idx: int, trials_count: int, deadline: Deadline) -> SolveResult:
+    result = result or SolveResult(model=model, task=task, messages=[], info={})
+    result.trial_idx = trial_idx
+    result.trials_count = trials_count
+    result.info["stop_reason"] = "timeout"
+    result.error = f"Trial exceeded its deadline of {deadline.seconds}s"
+    result.verdict = Verdict(
+        verdict=False,
+        reasoning="Trial timed out",
+        confidence=1.0
     )
+    return result
 
-    for i in range(1, trials_count+1):
-        try:
-            print(f"🛠️ Task {task.name} {i}/{trials_count}")
+def budget_result(*, result: SolveResult, trial_idx: int, trials_count: int) -> SolveResult:
+    result.trial_idx = trial_idx
+    result.trials_count = trials_count
+    result.error = "Trial stopped by the budget governor"
+    result.verdict = Verdict(
+        verdict=False,
+        reasoning="Trial ran out of budget",
+        confidence=1.0
+    )
+    return result
+
+def error_result(*, result: Optional[SolveResult], task: Task, model: Model, trial_idx: int, trials_count: int, error: str, infra: bool) -> SolveResult:
+    # keep the partial transcript of a trial that got that far
+    result = result or SolveResult(model=model, task=task, messages=[], info={})
+    result.trial_idx = trial_idx
+    result.trials_count = trials_count
+    result.info["stop_reason"] = "infra_error" if infra else "error"
+    result.error = error
+    result.verdict = Verdict(
+        verdict=False,
+        reasoning="Infrastructure error during task execution" if infra else "Error during task execution",
+        confidence=1.0
+    )
+    return result
+
+def run_trial(*, agent: CRMAgent, task: Task, model: Model, trial_idx: int, trials_count: int, seed: Optional[int] = None, judge: Optional[Judge] = None, trial_timeout: Optional[float] = None) -> SolveResult:
+    METRICS.trial_started()
+    # calls abandoned at the last deadline could write into this trial's CRM after the reset
+    still_running = drain_abandoned()
+    if still_running:
+        print(f"⚠️ {still_running} abandoned tool calls still running, they may change the CRM during this trial")
+    deadline = Deadline(trial_timeout) if trial_timeout else None
+    result = None
+    resumer = None
+    try:
+        with deadline_scope(deadline), budget_scope(agent.tools.name, task.name) as budget, resume_scope() as resumer:
+            print(f"🛠️ Task {task.name} {trial_idx}/{trials_count}")
 
             print("🧹 Resetting CRM...")
-            reset_hubspot()
+            with METRICS.stage("reset"):
+                reset = reset_hubspot()
+            if reset["left"]:
+                # records that survived the reset would show up in the agent's searches and the judge's dump
+                METRICS.trial_finished(outcome="infra_error")
+                left = ", ".join(f"{count} {object_type}" for object_type, count in reset["left"].items())
+                result = error_result(result=None, task=task, model=model, trial_idx=trial_idx, trials_count=trials_count, error=f"Reset left {left}", infra=True)
+                result.info["reset_left"] = reset["left"]
+                print(f"🔌 Failed attempt: {result.error}")
+                return result
+            # the trial's dumps only look for what changed after the reset
+            seed_change_feed(reset)
+            with METRICS.stage("index_wait"):
+                index_wait = wait_for_search_index(reset["created"])
+            if not index_wait["ready"]:
+                print(f"⏳ Search index still missing {', '.join(index_wait['pending'])} after {index_wait['seconds']}s")
 
-            result = agent.solve(task=task, seed=seed)            
-            result.trial_idx = i
+            with METRICS.stage("solve"), fault_scope(f"{task.name}:{trial_idx}") as faults, tool_cache_scope(agent.tools) as tool_cache:
+                result = agent.solve(task=task, seed=seed)            
+            result.trial_idx = trial_idx
             result.trials_count = trials_count
+            result.info["index_wait"] = index_wait
+            if still_running:
+                result.info["abandoned_calls_running"] = still_running
+            if faults:
+                result.info["faults"] = faults.info()
+            if tool_cache:
+                result.info["tool_cache"] = tool_cache.info()
+            if deadline:
+                result.info["deadline"] = {"seconds": deadline.seconds, "elapsed": round(deadline.elapsed(), 3)}
+            if resumer.resumes:
+                result.info["resume"] = resumer.info()
+
+            if result.info.get("stop_reason") == "timeout":
+                print(f"⏱️ Timed out after {deadline.seconds}s")
+                METRICS.trial_finished(outcome="timeout", tool_calls=result.info.get("tool_calls", 0), tool_errors=result.info.get("tool_errors", 0))
+                return timeout_result(result=result, task=task, model=model, trial_idx=trial_idx, trials_count=trials_count, deadline=deadline)
+
+            if result.info.get("stop_reason") == "budget":
+                result.info["budget"] = budget.info()
+                print(f"💸 Out of {result.info['budget'].get('cap', 'sweep')} budget, not evaluating")
+                METRICS.trial_finished(outcome="budget", tool_calls=result.info.get("tool_calls", 0), tool_errors=result.info.get("tool_errors", 0))
+                return budget_result(result=result, trial_idx=trial_idx, trials_count=trials_count)
+
+            if result.info.get("stop_reason") in ("error", "infra_error"):
+                infra = result.info["stop_reason"] == "infra_error"
+                print(f"{'🔌' if infra else '❌'} Failed attempt: {result.error}")
+                METRICS.trial_finished(outcome=result.info["stop_reason"], tool_calls=result.info.get("tool_calls", 0), tool_errors=result.info.get("tool_errors", 0))
+                return error_result(result=result, task=task, model=model, trial_idx=trial_idx, trials_count=trials_count, error=result.error, infra=infra)
 
             print("🗂️ Dumping CRM state...")
-            result.crm_state = dump_hubspot()
+            with METRICS.stage("dump"):
+                # the records the agent wrote are read past the lagging search index by the change feed
+                touched = touched_ids(result.messages)
+                result.crm_state = resumable("dump", lambda: dump_hubspot(scope=task.crm_scope, touched=touched))
 
             print("🧪 Evaluating task...")
-            result = evaluate_task(result=result)
+            with METRICS.stage("evaluate"):
+                result = evaluate_task(result=result, judge=judge)
+            if budget:
+                result.info["budget"] = budget.info()
+                budget.record(result.verdict.verdict)
+            result.info["fingerprint"] = cell_fingerprint(agent, task, judge=judge, trial_timeout=trial_timeout)
 
             print(f"🔨 Verdict: {'👍' if result.verdict.verdict else '👎'}")
             print(f"      Reasoning: {result.verdict.reasoning}")
             print(f"      Confidence: {result.verdict.confidence}")
 
+            METRICS.trial_finished(
+                outcome="passed" if result.verdict.verdict else "failed",
+                tool_calls=result.info.get("tool_calls", 0),
+                tool_errors=result.info.get("tool_errors", 0),
+            )
+            return result
+    except Exception as e:
+        if deadline and is_deadline_timeout(e):
+            print(f"⏱️ Timed out after {deadline.seconds}s")
+            METRICS.trial_finished(outcome="timeout")
+            return timeout_result(result=result, task=task, model=model, trial_idx=trial_idx, trials_count=trials_count, deadline=deadline)
+
+        infra = is_infra_error(e)
+        print(f"{'🔌' if infra else '❌'} Failed attempt: {e}")
+        METRICS.record_error(e)
+        METRICS.trial_finished(outcome="infra_error" if infra else "error")
+        result = error_result(result=result, task=task, model=model, trial_idx=trial_idx, trials_count=trials_count, error=str(e), infra=infra)
+        if resumer and resumer.resumes:
+            result.info["resume"] = resumer.info()
+        return result
+    finally:
+        print(progress_line(METRICS.snapshot()))
+
+def solve_task(*, file: TextIO, task: Task, agent: CRMAgent, model: Model, trials_count: int, seed: Optional[int] = None, judge: Optional[Judge] = None, trial_timeout: Optional[float] = None, reused: Optional[List[str]] = None):
+    reused = reused or []
+    file.writelines(reused)
+    for i in range(len(reused)+1, trials_count+1):
+        result = run_trial(agent=agent, task=task, model=model, trial_idx=i, trials_count=trials_count, seed=seed, judge=judge, trial_timeout=trial_timeout)
+        with METRICS.stage("write"):
             write_result_to_file(file=file, result=result)
-        except Exception as e:
-            print(f"❌ Failed attempt: {e}")
-            result = SolveResult(
+
+def solve_adaptive(*, toolsets: List[Toolset], tasks: List[Task], model: Model, scheduler: AdaptiveScheduler, seed: Optional[int] = None, judge: Optional[Judge] = None, tool_top_k: Optional[int] = None, stream: bool = False, trial_timeout: Optional[float] = None):
+    """
+    Runs trials one at a time, always for the (toolset, task) cell whose success rate
+    is the most uncertain, until every cell is settled or reaches `--trials`.
+    """
+    with ExitStack() as stack:
+        files = {}
+        agents = {}
+        for toolset in toolsets:
+            files[toolset.name] = stack.enter_context(open_results_file(toolset))
+            agents[toolset.name] = CRMAgent(model=model, tools=toolset, tool_top_k=tool_top_k, stream=stream)
+            for task in tasks:
+                scheduler.add_cell((toolset.name, task.name))
+        # upper bound, settled cells stop early
+        METRICS.plan(len(scheduler.cells) * scheduler.max_trials)
+
+        tasks_by_name = {task.name: task for task in tasks}
+        refused = set()
+        while (cell := scheduler.next_cell(exclude=refused)) is not None:
+            toolset_name, task_name = cell.key
+            if not admit_trial(toolset_name, task_name):
+                refused.add(cell.key)
+                continue
+            print(f"🎯 {toolset_name}: {cell.successes}/{cell.trials} passed so far")
+            result = run_trial(
+                agent=agents[toolset_name],
+                task=tasks_by_name[task_name],
                 model=model,
-                task=task,
-                messages=[],
-                info={},
-                success=False,
-                trial_idx=i,
-                trials_count=trials_count,
-                error=str(e),
-                verdict=Verdict(
-                    verdict=False,
-                    reasoning="Error during task execution",
-                    confidence=1.0
-                )
+                trial_idx=cell.trials + cell.excluded + 1,
+                trials_count=scheduler.max_trials,
+                seed=seed,
+                judge=judge,
+                trial_timeout=trial_timeout,
             )
-            write_result_to_file(file=file, result=result)
+            if excluded_from_pass_k(result.info):
+                # an outage or another cell's budget, says nothing about the success rate
+                scheduler.record_excluded(cell.key)
+                if scheduler.is_given_up(cell):
+                    print(f"🔌 Giving up {toolset_name} / {task_name} after {cell.excluded} trials left out of pass^k")
+                else:
+                    METRICS.plan(1)
+            else:
+                scheduler.record(cell.key, bool(result.verdict and result.verdict.verdict))
+            result.info["adaptive"] = scheduler.describe(cell)
+            with METRICS.stage("write"):
+                write_result_to_file(file=files[toolset_name], result=result)
+
+        for cell in scheduler.cells.values():
+            print(f"📊 {cell.key[0]} / {cell.key[1]}: {cell.successes}/{cell.trials} in {scheduler.describe(cell)['interval']}")
+
+def solve_rounds(*, toolsets: List[Toolset], tasks: List[Task], model: Model, trials_count: int, seed: Optional[int] = None, judge: Optional[Judge] = None, tool_top_k: Optional[int] = None, stream: bool = False, trial_timeout: Optional[float] = None, changed_only: bool = False):
+    """
+    Runs the first trial of every (toolset, task) cell, then the second and so on, so a
+    sweep cut short by its budget still covers every cell.
+    """
+    with ExitStack() as stack:
+        files = {}
+        agents = {}
+        reused = {}
+        for toolset in toolsets:
+            baseline = load_baseline(results_file_path(toolset.name)) if changed_only else {}
+            files[toolset.name] = stack.enter_context(open_results_file(toolset))
+            agents[toolset.name] = CRMAgent(model=model, tools=toolset, tool_top_k=tool_top_k, stream=stream)
+            for task in tasks:
+                lines = reuse_results(baseline, agents[toolset.name], task, trials_count, judge=judge, trial_timeout=trial_timeout) if baseline else []
+                files[toolset.name].writelines(lines)
+                reused[(toolset.name, task.name)] = len(lines)
+        METRICS.plan(len(toolsets) * len(tasks) * trials_count - sum(reused.values()))
+
+        for i in range(1, trials_count+1):
+            for toolset in toolsets:
+                for task in tasks:
+                    if i <= reused[(toolset.name, task.name)]:
+                        continue
+                    if not admit_trial(toolset.name, task.name):
+                        continue
+                    result = run_trial(agent=agents[toolset.name], task=task, model=model, trial_idx=i, trials_count=trials_count, seed=seed, judge=judge, trial_timeout=trial_timeout)
+                    with METRICS.stage("write"):
+                        write_result_to_file(file=files[toolset.name], result=result)
+
+def solve_sharded(*, toolsets: List[Toolset], tasks: List[Task], model: Model, trials_count: int, seed: Optional[int] = None, shard: Optional[Shard] = None, queue: Optional[WorkQueue] = None, worker_id: Optional[str] = None, judge: Optional[Judge] = None, tool_top_k: Optional[int] = None, stream: bool = False, trial_timeout: Optional[float] = None):
+    """
+    Runs this runner's part of the sweep: a static `shard` slice of the trial items, or
+    items leased one by one from a shared `queue`. Results go to per-shard files that
+    `merge.py` combines.
+    """
+    toolsets_by_name = {results_file_name(toolset.name): toolset for toolset in toolsets}
+    tasks_by_name = {task.name: task for task in tasks}
+    items = enumerate_trials(toolsets_by_name.keys(), tasks_by_name.keys(), trials_count)
+    if shard:
+        items = shard.select(items)
+    if current_governor():
+        # every cell's first trials before any cell's later ones, so a budget cut leaves even coverage
+        items.sort(key=lambda item: item.trial_idx)
 
-def evaluate_task(result: SolveResult) -> SolveResult:
-    evaluator = Evaluator()
-    verdict = evaluator.eval(result=result)
+    worker_id = worker_id or default_worker_id()
+    shard_name = shard.name if shard else worker_id
+
+    with ExitStack() as stack:
+        files = {
+            name: stack.enter_context(open_shard_results_file(name, shard_name, append=queue is not None))
+            for name in toolsets_by_name
+        }
+        agents = {
+            name: CRMAgent(model=model, tools=toolset, tool_top_k=tool_top_k, stream=stream)
+            for name, toolset in toolsets_by_name.items()
+        }
+
+        def run_item(item: TrialItem):
+            if not admit_trial(toolsets_by_name[item.toolset].name, item.task):
+                return
+            result = run_trial(
+                agent=agents[item.toolset],
+                task=tasks_by_name[item.task],
+                model=model,
+                trial_idx=item.trial_idx,
+                trials_count=item.trials_count,
+                seed=seed,
+                judge=judge,
+                trial_timeout=trial_timeout,
+            )
+            with METRICS.stage("write"):
+                write_result_to_file(file=files[item.toolset], result=result)
+            files[item.toolset].flush()
+
+        if queue is None:
+            METRICS.plan(len(items))
+            print(f"🧩 Shard {shard_name}: {len(items)} trials")
+            for item in items:
+                run_item(item)
+            return
+
+        queue.enqueue(items)
+        # upper bound, other runners take part of the queue
+        METRICS.plan(len(items))
+        try:
+            while (item := queue.lease(worker_id, list(toolsets_by_name))) is not None:
+                try:
+                    with Heartbeat(queue, item, worker_id):
+                        run_item(item)
+                except BaseException:
+                    queue.release(item, worker_id)
+                    raise
+                queue.complete(item, worker_id)
+        finally:
+            queue.release_portal(worker_id)
+        print(f"🧩 Queue drained: {queue.stats()}")
+
+def evaluate_task(result: SolveResult, judge: Optional[Judge] = None) -> SolveResult:
+    evaluator = judge or Evaluator()
+    verdict, judge_info = evaluator.decide(result=result)
     result.verdict = verdict
+    result.info["judge"] = judge_info
+    METRICS.record_judge(judge_info)
     return result
 
-def open_results_file(toolset: Toolset) -> TextIO:
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    toolset_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in toolset.name.lower())
-    results_file = os.path.join(base_dir, f"./results/{toolset_name}.jsonl")
-    results_dir = os.path.dirname(results_file)
-
-    # Create results directory if it doesn't exist
-    if not os.path.exists(results_dir):
-        os.makedirs(results_dir)
-    
-    # Backup existing file if it exists
-    if os.path.exists(results_file):
-        backup_index = 1
-        backup_file = os.path.join(base_dir, f"./results/{toolset_name}_{backup_index}.jsonl")
-        while os.path.exists(backup_file):
-            backup_index += 1
-            backup_file = os.path.join(base_dir, f"./results/{toolset_name}_{backup_index}.jsonl")
-        os.rename(results_file, backup_file)
-    
-    return open(results_file, "w")
-
-def write_result_to_file(file: TextIO, result: SolveResult):
-    file.write(json.dumps(result.model_dump()) + "\n") 
-        
 def test_agent():
-    toolset = create_superface_toolset()
+    toolset = create_toolset("superface")
     task = Task(name="Test Task", prompt="Create contact Test User test@example.net")
     agent = CRMAgent(
         model=Model.GPT_4o,
@@ -205,23 +366,36 @@ def dump_hubspot_state():
     hubspot_state = dump_hubspot()
     print(f"HubSpot State: {hubspot_state}")
 
-def run(*, toolsets: List[Toolset], trials_count: int, model = Model.GPT_4o, seed: Optional[int] = None):    
+def run(*, toolsets: List[Toolset], trials_count: int, model = Model.GPT_4o, seed: Optional[int] = None, scheduler: Optional[AdaptiveScheduler] = None, shard: Optional[Shard] = None, queue: Optional[WorkQueue] = None, worker_id: Optional[str] = None, judge: Optional[Judge] = None, tool_top_k: Optional[int] = None, stream: bool = False, trial_timeout: Optional[float] = None, changed_only: bool = False):    
+    METRICS.start()
     tasks = load_tasks()
+    if scheduler:
+        solve_adaptive(toolsets=toolsets, tasks=tasks, model=model, scheduler=scheduler, seed=seed, judge=judge, tool_top_k=tool_top_k, stream=stream, trial_timeout=trial_timeout)
+        return
+    if shard or queue:
+        solve_sharded(toolsets=toolsets, tasks=tasks, model=model, trials_count=trials_count, seed=seed, shard=shard, queue=queue, worker_id=worker_id, judge=judge, tool_top_k=tool_top_k, stream=stream, trial_timeout=trial_timeout)
+        return
+    if current_governor():
+        solve_rounds(toolsets=toolsets, tasks=tasks, model=model, trials_count=trials_count, seed=seed, judge=judge, tool_top_k=tool_top_k, stream=stream, trial_timeout=trial_timeout, changed_only=changed_only)
+        return
+
+    agents = {}
+    reused = {}
+    for toolset in toolsets:
+        agents[toolset.name] = CRMAgent(model=model, tools=toolset, tool_top_k=tool_top_k, stream=stream)
+        # read before the results file is rotated to a backup
+        baseline = load_baseline(results_file_path(toolset.name)) if changed_only else {}
+        for task in tasks:
+            reused[(toolset.name, task.name)] = reuse_results(baseline, agents[toolset.name], task, trials_count, judge=judge, trial_timeout=trial_timeout) if baseline else []
+    METRICS.plan(len(toolsets) * len(tasks) * trials_count - sum(len(lines) for lines in reused.values()))
+
     for toolset in toolsets:
         print(f"Running tasks for toolset: {toolset.name}")
         with open_results_file(toolset) as file:
             for task in tasks:
-                solve_task(task=task, toolset=toolset, model=model, trials_count=trials_count, seed=seed, file=file)                
-
-toolset_creators = {
-    "superface": create_superface_toolset,
-    "superface_specialist": create_superface_specialiasts_toolset,
-    "superface_dynamic_specialist": create_superface_dynamic_specialists_toolset,
-    "composio": create_composio_toolset,
-    'vibecode': create_vibecode_toolset,
-}
+                solve_task(task=task, agent=agents[toolset.name], model=model, trials_count=trials_count, seed=seed, file=file, judge=judge, trial_timeout=trial_timeout, reused=reused[(toolset.name, task.name)])
 
-toolset_options = list(toolset_creators.keys())
+toolset_options = toolset_names()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run CRM Tools Benchmark")
@@ -244,12 +418,314 @@ if __name__ == "__main__":
         default=None,
         help="Specify the seed (default: None)"
     )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Stop sampling a task once its success rate is settled, using --trials as the per-task maximum"
+    )
+    parser.add_argument(
+        "--min-trials",
+        type=int,
+        default=3,
+        help="Minimum number of trials per task in adaptive mode (default: 3)"
+    )
+    parser.add_argument(
+        "--ci-width",
+        type=float,
+        default=0.5,
+        help="Credible interval width at which a task counts as settled in adaptive mode (default: 0.5)"
+    )
+    parser.add_argument(
+        "--credibility",
+        type=float,
+        default=0.9,
+        help="Credibility of the interval used by adaptive mode (default: 0.9)"
+    )
+    parser.add_argument(
+        "--max-excluded",
+        type=int,
+        default=3,
+        help="Trials per task that may end in an infra error or an outside budget stop before adaptive mode gives the task up (default: 3)"
+    )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default=None,
+        help="Run only shard i of N of the trials, in format i/N (default: all trials)"
+    )
+    parser.add_argument(
+        "--queue",
+        type=str,
+        default=None,
+        help="Take trials from a shared SQLite work queue at this path (default: no queue)"
+    )
+    parser.add_argument(
+        "--worker-id",
+        type=str,
+        default=None,
+        help="Name of this runner in the work queue (default: hostname-pid)"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        default=None,
+        help="Periodically write sweep metrics to this file, Prometheus text format for .prom, JSON otherwise (default: none)"
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=5.0,
+        help="Seconds between metrics file updates (default: 5)"
+    )
+    parser.add_argument(
+        "--inline-results",
+        action="store_true",
+        help="Keep messages and CRM state inline in results files instead of the results/blobs store"
+    )
+    parser.add_argument(
+        "--trial-timeout",
+        type=float,
+        default=None,
+        help="Deadline in seconds for a whole trial, from reset to evaluation (default: none)"
+    )
+    parser.add_argument(
+        "--cheap-judge",
+        type=str,
+        choices=[m.value for m in Model],
+        default=None,
+        help="Judge with this model first and escalate only its low-confidence verdicts (default: single judge)"
+    )
+    parser.add_argument(
+        "--judge-confidence",
+        type=float,
+        default=0.8,
+        help="Lowest confidence of the cheap judge accepted without escalation (default: 0.8)"
+    )
+    parser.add_argument(
+        "--judge-escalation",
+        type=str,
+        choices=["strong", "vote"],
+        default="strong",
+        help="Escalate to the strong judge, or to a majority vote of cheap judges with the strong judge breaking ties (default: strong)"
+    )
+    parser.add_argument(
+        "--judge-votes",
+        type=int,
+        default=3,
+        help="Number of cheap judges voting with --judge-escalation vote (default: 3)"
+    )
+    parser.add_argument(
+        "--judge-audit-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of accepted cheap verdicts also checked by the strong judge to measure agreement (default: 0)"
+    )
+    parser.add_argument(
+        "--incremental-dump",
+        action="store_true",
+        help="Dump only records changed since the previous dump and merge them into a local mirror of the CRM"
+    )
+    parser.add_argument(
+        "--tool-top-k",
+        type=int,
+        default=None,
+        help="Send only the k tools that best match the task, plus a find_tools tool to ask for more (default: all tools)"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream agent completions and start each tool call as soon as its arguments are complete"
+    )
+    parser.add_argument(
+        "--tool-cache",
+        action="store_true",
+        help="Serve repeated read-only tool calls within a trial from a cache that writes invalidate per object type"
+    )
+    parser.add_argument(
+        "--step-retries",
+        type=int,
+        default=DEFAULT_MAX_RETRIES,
+        help=f"Resumes per trial from the last completed step after transient errors like 429s, 5xx and timeouts, 0 to fail right away (default: {DEFAULT_MAX_RETRIES})"
+    )
+    parser.add_argument(
+        "--faults",
+        type=str,
+        default=None,
+        help="Inject faults into the agent's HubSpot requests and tool calls, e.g. 'latency=lognormal:0.2:0.8,429=0.05,5xx=0.02' (default: none)"
+    )
+    parser.add_argument(
+        "--fault-seed",
+        type=int,
+        default=0,
+        help="Seed of the fault schedule, the same seed injects the same faults into the same trials (default: 0)"
+    )
+    parser.add_argument(
+        "--budget-usd",
+        type=float,
+        default=None,
+        help="Estimated LLM dollars the whole sweep may spend, agent and judge together (default: no cap)"
+    )
+    parser.add_argument(
+        "--budget-tokens",
+        type=int,
+        default=None,
+        help="LLM tokens the whole sweep may use (default: no cap)"
+    )
+    parser.add_argument(
+        "--toolset-budget-usd",
+        type=float,
+        default=None,
+        help="Estimated LLM dollars each toolset may spend (default: no cap)"
+    )
+    parser.add_argument(
+        "--toolset-budget-tokens",
+        type=int,
+        default=None,
+        help="LLM tokens each toolset may use (default: no cap)"
+    )
+    parser.add_argument(
+        "--trial-budget-usd",
+        type=float,
+        default=None,
+        help="Estimated LLM dollars a single trial may spend before the agent is stopped (default: no cap)"
+    )
+    parser.add_argument(
+        "--trial-budget-tokens",
+        type=int,
+        default=None,
+        help="LLM tokens a single trial may use before the agent is stopped (default: no cap)"
+    )
+    parser.add_argument(
+        "--budget-soft-limit",
+        type=float,
+        default=0.8,
+        help="Fraction of the sweep or toolset budget after which cells with settled results get no more trials (default: 0.8)"
+    )
+    parser.add_argument(
+        "--budget-min-trials",
+        type=int,
+        default=2,
+        help="Trials a cell needs, all with the same verdict, to count as settled near the budget (default: 2)"
+    )
+    parser.add_argument(
+        "--changed-only",
+        action="store_true",
+        help="Copy results of cells whose inputs didn't change since the previous results file instead of running them again"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample the stacks of all threads during the sweep and write flamegraphs, collapsed stacks and a Chrome trace to profiles/"
+    )
+    parser.add_argument(
+        "--profile-interval",
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help=f"Seconds between profiler samples (default: {DEFAULT_INTERVAL})"
+    )
     args = parser.parse_args()
 
-    selected_toolsets = [toolset_creators[toolset]() for toolset in args.toolsets]
+    shard = None
+    if args.shard:
+        try:
+            shard = Shard.parse(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.adaptive and (shard or args.queue):
+        parser.error("--adaptive can't be combined with --shard or --queue")
+    if args.changed_only and (args.adaptive or shard or args.queue):
+        parser.error("--changed-only can't be combined with --adaptive, --shard or --queue")
+
+    fault_plan = None
+    if args.faults:
+        try:
+            fault_plan = FaultPlan.parse(args.faults, seed=args.fault_seed)
+        except ValueError as e:
+            parser.error(str(e))
+
+    queue = None
+    worker_id = args.worker_id or default_worker_id()
+    if args.queue:
+        queue = WorkQueue(args.queue)
+        try:
+            # every trial resets the portal, two workers on one portal wipe each other's trials
+            queue.claim_portal(worker_id, portal_fingerprint())
+        except ValueError as e:
+            parser.error(str(e))
+
+    selected_toolsets = [create_toolset(toolset) for toolset in args.toolsets]
+
+    scheduler = None
+    if args.adaptive:
+        scheduler = AdaptiveScheduler(
+            min_trials=args.min_trials,
+            max_trials=args.trials,
+            ci_width=args.ci_width,
+            credibility=args.credibility,
+            max_excluded=args.max_excluded,
+        )
+
+    judge = None
+    if args.cheap_judge:
+        judge = CascadingEvaluator(
+            cheap_model=Model(args.cheap_judge),
+            min_confidence=args.judge_confidence,
+            escalation=args.judge_escalation,
+            votes=args.judge_votes,
+            audit_rate=args.judge_audit_rate,
+            seed=args.seed,
+        )
 
-    run(
-        toolsets=selected_toolsets,
-        trials_count=args.trials,
-        seed=args.seed
+    if not args.inline_results:
+        set_blob_store(BlobStore())
+
+    budget_caps = dict(
+        sweep_usd=args.budget_usd,
+        sweep_tokens=args.budget_tokens,
+        toolset_usd=args.toolset_budget_usd,
+        toolset_tokens=args.toolset_budget_tokens,
+        trial_usd=args.trial_budget_usd,
+        trial_tokens=args.trial_budget_tokens,
     )
+    governor = None
+    if any(cap is not None for cap in budget_caps.values()):
+        governor = BudgetGovernor(**budget_caps, soft_limit=args.budget_soft_limit, min_trials=args.budget_min_trials)
+        install_budget(governor)
+
+    if args.incremental_dump:
+        use_change_feed(CrmMirror())
+
+    if args.tool_cache:
+        install_tool_cache()
+
+    configure_resume(max_retries=args.step_retries)
+
+    if fault_plan:
+        install_fault_injection(fault_plan)
+        print(f"💥 Injecting faults: {fault_plan.describe()}")
+    install_http_metrics(METRICS)
+    profiler = None
+    if args.profile:
+        profiler = SamplingProfiler(interval=args.profile_interval)
+        METRICS.stage_hooks.append(profiler.stage)
+    with profiler or nullcontext(), MetricsExporter(METRICS, args.metrics_file, interval=args.metrics_interval) if args.metrics_file else nullcontext():
+        run(
+            toolsets=selected_toolsets,
+            trials_count=args.trials,
+            seed=args.seed,
+            scheduler=scheduler,
+            shard=shard,
+            queue=queue,
+            worker_id=worker_id,
+            judge=judge,
+            tool_top_k=args.tool_top_k,
+            stream=args.stream,
+            trial_timeout=args.trial_timeout,
+            changed_only=args.changed_only
+        )
+    if governor:
+        print(governor.summary())
+    if profiler:
+        print(profiler.summary())
+        for path in profiler.save("run"):
+            print(f"   {path}")
@@ -0,0 +1,142 @@
+"""
+Sequential stopping rules for adaptive trial allocation.
+
+Every (toolset, task) cell keeps a Beta posterior over its success rate, starting
+from a uniform Beta(1, 1) prior. A cell is settled once the equal-tailed credible
+interval of that posterior is narrower than the configured width. Unsettled cells
+are scheduled widest-interval first, so the trial budget goes where it buys the
+most information.
+"""
+
+from math import comb
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+PRIOR_ALPHA = 1
+PRIOR_BETA = 1
+
+def beta_cdf(x: float, a: int, b: int) -> float:
+    """
+    Regularized incomplete beta function for integer parameters.
+    I_x(a, b) equals P(Binomial(a + b - 1, x) >= a).
+    """
+    n = a + b - 1
+    return sum(comb(n, j) * x**j * (1 - x)**(n - j) for j in range(a, n + 1))
+
+def beta_quantile(q: float, a: int, b: int, *, tolerance: float = 1e-6) -> float:
+    """
+    Inverse of `beta_cdf` found by bisection.
+    """
+    lo, hi = 0.0, 1.0
+    while hi - lo > tolerance:
+        mid = (lo + hi) / 2
+        if beta_cdf(mid, a, b) < q:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+def posterior_params(successes: int, trials: int) -> Tuple[int, int]:
+    return PRIOR_ALPHA + successes, PRIOR_BETA + trials - successes
+
+def credible_interval(successes: int, trials: int, *, credibility: float = 0.9) -> Tuple[float, float]:
+    """
+    Equal-tailed credible interval of the success rate posterior.
+    """
+    a, b = posterior_params(successes, trials)
+    tail = (1 - credibility) / 2
+    return beta_quantile(tail, a, b), beta_quantile(1 - tail, a, b)
+
+def expected_pass_hat_k(successes: int, trials: int, k: int) -> float:
+    """
+    Posterior expectation of p^k, used for pass^k when fewer than k trials were run.
+    """
+    a, b = posterior_params(successes, trials)
+    value = 1.0
+    for i in range(k):
+        value *= (a + i) / (a + b + i)
+    return value
+
+class AdaptiveCell:
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.trials = 0
+        self.successes = 0
+        self.excluded = 0 # trials that said nothing about the agent, see `excluded_from_pass_k`
+
+    def record(self, success: bool):
+        self.trials += 1
+        self.successes += 1 if success else 0
+
+    def interval(self, credibility: float) -> Tuple[float, float]:
+        return credible_interval(self.successes, self.trials, credibility=credibility)
+
+    def __repr__(self):
+        return f"AdaptiveCell(key={self.key}, successes={self.successes}, trials={self.trials})"
+
+class AdaptiveScheduler:
+    """
+    Decides which cell should run the next trial, or None once every cell is
+    settled or has used up `max_trials`. Trials left out of pass^k don't count
+    towards the posterior; a cell is given up after `max_excluded` of them, so an
+    outage can't keep a cell running.
+    """
+
+    def __init__(self, *, min_trials: int, max_trials: int, ci_width: float, credibility: float = 0.9, max_excluded: int = 3):
+        self.min_trials = min(min_trials, max_trials)
+        self.max_trials = max_trials
+        self.max_excluded = max_excluded
+        self.ci_width = ci_width
+        self.credibility = credibility
+        self.cells: Dict[Hashable, AdaptiveCell] = {}
+
+    def add_cell(self, key: Hashable) -> AdaptiveCell:
+        cell = AdaptiveCell(key)
+        self.cells[key] = cell
+        return cell
+
+    def interval_width(self, cell: AdaptiveCell) -> float:
+        lower, upper = cell.interval(self.credibility)
+        return upper - lower
+
+    def is_given_up(self, cell: AdaptiveCell) -> bool:
+        return cell.excluded >= self.max_excluded
+
+    def is_settled(self, cell: AdaptiveCell) -> bool:
+        if cell.trials >= self.max_trials or self.is_given_up(cell):
+            return True
+        if cell.trials < self.min_trials:
+            return False
+        return self.interval_width(cell) <= self.ci_width
+
+    def next_cell(self, *, exclude: Set[Hashable] = frozenset()) -> Optional[AdaptiveCell]:
+        cells = [cell for cell in self.cells.values() if cell.key not in exclude and not self.is_given_up(cell)]
+        # Warm up every cell to `min_trials` first, in insertion order
+        for cell in cells:
+            if cell.trials < self.min_trials:
+                return cell
+
+        open_cells: List[AdaptiveCell] = [c for c in cells if not self.is_settled(c)]
+        if not open_cells:
+            return None
+        return max(open_cells, key=self.interval_width)
+
+    def record(self, key: Hashable, success: bool) -> AdaptiveCell:
+        cell = self.cells[key]
+        cell.record(success)
+        return cell
+
+    def record_excluded(self, key: Hashable) -> AdaptiveCell:
+        cell = self.cells[key]
+        cell.excluded += 1
+        return cell
+
+    def describe(self, cell: AdaptiveCell) -> Dict[str, Any]:
+        lower, upper = cell.interval(self.credibility)
+        return {
+            "successes": cell.successes,
+            "trials": cell.trials,
+            "excluded": cell.excluded,
+            "interval": [round(lower, 4), round(upper, 4)],
+            "credibility": self.credibility,
+            "settled": self.is_settled(cell),
+        }
@@ -0,0 +1,236 @@
+"""
+Micro-benchmarks of the harness's own overhead, run against local mocks.
+
+Every benchmark has a setup step, which is not measured, and returns the callable
+that is timed. Wall time is the best of several repeats; peak memory comes from a
+separate run under tracemalloc.
+"""
+
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+from unittest import mock
+
+from .fake_hubspot import FakeHubSpot
+from .shared import CrmState, CrmStateEngagements, Model, SolveResult, Task, Verdict
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../benchmarks/baseline.json")
+
+TASK_NAMES = ["create_lead", "update_lead_status", "create_deal", "create_engagement", "search_contact", "close_deal"]
+
+type Setup = Callable[[ExitStack], Callable[[], Any]]
+
+class Benchmark:
+    def __init__(self, name: str, scale: int, setup: Setup):
+        self.name = name
+        self.scale = scale
+        self.setup = setup
+
+    @property
+    def id(self) -> str:
+        return f"{self.name}[{self.scale}]"
+
+def measure(benchmark: Benchmark, *, repeat: int = 5) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        with ExitStack() as stack:
+            fn = benchmark.setup(stack)
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+
+    with ExitStack() as stack:
+        fn = benchmark.setup(stack)
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "seconds": round(min(timings), 6),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+# === Fixtures ===
+
+def fake_hubspot(stack: ExitStack, size: int, object_types: Optional[List[str]] = None) -> FakeHubSpot:
+    hubspot = FakeHubSpot()
+    hubspot.seed(size, object_types)
+    stack.enter_context(hubspot.patch())
+    # Rate limit pauses would dominate every timing
+    stack.enter_context(mock.patch("time.sleep", lambda seconds: None))
+    return hubspot
+
+def make_crm_state(size: int) -> CrmState:
+    def records(object_type: str) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": str(i),
+                "properties": {"name": f"{object_type} {i}", "email": f"{object_type}_{i}@example.com", "hs_lead_status": None},
+                "createdAt": "2025-01-01T00:00:00.000Z",
+                "updatedAt": "2025-01-01T00:00:00.000Z",
+                "archived": False,
+            }
+            for i in range(size)
+        ]
+    return CrmState(
+        contacts=records("contacts"),
+        companies=records("companies"),
+        deals=records("deals"),
+        engagements=CrmStateEngagements(
+            emails=records("emails"),
+            notes=records("notes"),
+            calls=records("calls"),
+            meetings=records("meetings"),
+            tasks=records("tasks"),
+        ),
+    )
+
+def make_solve_result(task_name: str, *, trial_idx: int, trials_count: int, verdict: bool, crm_state: Optional[CrmState] = None) -> SolveResult:
+    return SolveResult(
+        task=Task(name=task_name, prompt=f"Prompt of {task_name}", outcome=f"Outcome of {task_name}"),
+        model=Model.GPT_4o,
+        messages=[
+            {"role": "system", "content": "You are a CRM agent. You can interact with HubSpot."},
+            {"role": "user", "content": f"Prompt of {task_name}"},
+            {"role": "assistant", "content": None, "tool_calls": [{"id": "call_1", "type": "function", "function": {"name": "contacts", "arguments": "{\"operation\": \"search\"}"}}]},
+            {"role": "tool", "tool_call_id": "call_1", "content": "{\"results\": []}"},
+            {"role": "assistant", "content": "Done.", "tool_calls": None},
+        ],
+        info={},
+        trial_idx=trial_idx,
+        trials_count=trials_count,
+        crm_state=crm_state,
+        verdict=Verdict(reasoning="Outcome met.", verdict=verdict, confidence=0.9),
+    )
+
+def write_results_file(stack: ExitStack, lines: int) -> str:
+    tmp_dir = stack.enter_context(tempfile.TemporaryDirectory())
+    path = os.path.join(tmp_dir, "results.jsonl")
+    trials_count = -(-lines // len(TASK_NAMES))
+    template = make_solve_result(TASK_NAMES[0], trial_idx=1, trials_count=trials_count, verdict=True, crm_state=make_crm_state(3)).model_dump()
+    with open(path, "w") as f:
+        for i in range(lines):
+            task_name = TASK_NAMES[i % len(TASK_NAMES)]
+            result = {
+                **template,
+                "task": {"name": task_name, "prompt": f"Prompt of {task_name}", "outcome": f"Outcome of {task_name}"},
+                "trial_idx": i // len(TASK_NAMES) + 1,
+                "verdict": {**template["verdict"], "verdict": i % 3 != 0},
+            }
+            f.write(json.dumps(result) + "\n")
+    return path
+
+def make_pass_k_result(rows: int) -> Dict[str, Dict[str, Dict[int, float]]]:
+    toolsets = ["superface", "composio", "vibecode"]
+    per_toolset = max(rows // len(toolsets), 1)
+    return {
+        toolset: {f"task_{i}": {k: round(1 / k, 4) for k in range(1, 11)} for i in range(per_toolset)}
+        for toolset in toolsets
+    }
+
+# === Benchmarks ===
+
+def bench_reset_hubspot(records: int) -> Benchmark:
+    def setup(stack: ExitStack):
+        from .reset_hubspot import reset_hubspot
+        fake_hubspot(stack, records)
+        return reset_hubspot
+    return Benchmark("reset_hubspot", records, setup)
+
+def bench_dump_hubspot(records: int) -> Benchmark:
+    def setup(stack: ExitStack):
+        from .dump_hubspot import dump_hubspot
+        fake_hubspot(stack, records)
+        return dump_hubspot
+    return Benchmark("dump_hubspot", records, setup)
+
+def bench_evaluator_prompt(records: int) -> Benchmark:
+    def setup(stack: ExitStack):
+        from .evaluator import Evaluator
+        verdict = Verdict(reasoning="Outcome met.", verdict=True, confidence=0.9).model_dump_json()
+        response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=verdict))])
+        stack.enter_context(mock.patch("litellm.completion", lambda **kwargs: response))
+        result = make_solve_result("create_lead", trial_idx=1, trials_count=1, verdict=True, crm_state=make_crm_state(records))
+        return lambda: Evaluator().eval(result=result)
+    return Benchmark("evaluator_prompt", records, setup)
+
+def bench_calculate_pass_k(lines: int) -> Benchmark:
+    def setup(stack: ExitStack):
+        from .processing.pass_k import calculate_pass_k
+        path = write_results_file(stack, lines)
+        return lambda: calculate_pass_k(path)
+    return Benchmark("calculate_pass_k", lines, setup)
+
+def bench_create_csv_pass_k(lines: int) -> Benchmark:
+    def setup(stack: ExitStack):
+        from .processing.pass_k import create_csv_pass_k
+        data = make_pass_k_result(lines)
+        return lambda: create_csv_pass_k(data, run_id="run_0")
+    return Benchmark("create_csv_pass_k", lines, setup)
+
+def bench_csv_to_markdown(lines: int) -> Benchmark:
+    def setup(stack: ExitStack):
+        from .processing.pass_k import create_csv_pass_k
+        from .processing.utils import csv_to_markdown
+        csv_content = create_csv_pass_k(make_pass_k_result(lines), run_id="run_0")
+        return lambda: csv_to_markdown(csv_content)
+    return Benchmark("csv_to_markdown", lines, setup)
+
+RECORD_BENCHMARKS = [bench_reset_hubspot, bench_dump_hubspot, bench_evaluator_prompt]
+LINE_BENCHMARKS = [bench_calculate_pass_k, bench_create_csv_pass_k, bench_csv_to_markdown]
+
+def collect_benchmarks(*, records: List[int], lines: List[int], only: Optional[List[str]] = None) -> List[Benchmark]:
+    benchmarks = [factory(scale) for factory in RECORD_BENCHMARKS for scale in records]
+    benchmarks += [factory(scale) for factory in LINE_BENCHMARKS for scale in lines]
+    if only:
+        benchmarks = [b for b in benchmarks if b.name in only]
+    return benchmarks
+
+# === Baseline ===
+
+def load_baseline(path: str = BASELINE_FILE) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_baseline(measurements: Dict[str, Dict[str, float]], path: str = BASELINE_FILE):
+    baseline = load_baseline(path)
+    baseline.update(measurements)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(json.dumps(dict(sorted(baseline.items())), indent=2) + "\n")
+
+def find_regressions(
+    measurements: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    *,
+    threshold: float,
+    memory_threshold: float,
+    min_seconds: float = 0.02,
+    min_kb: float = 64,
+) -> List[str]:
+    """
+    Lists benchmarks that got slower than `threshold` or used more memory than
+    `memory_threshold` (relative), ignoring differences below `min_seconds` and `min_kb`.
+    """
+    regressions = []
+    for benchmark_id, measured in measurements.items():
+        base = baseline.get(benchmark_id)
+        if not base:
+            continue
+        slower = measured["seconds"] - base["seconds"]
+        if slower > min_seconds and measured["seconds"] > base["seconds"] * (1 + threshold):
+            regressions.append(f"{benchmark_id}: {base['seconds']:.4f}s -> {measured['seconds']:.4f}s")
+        grew = measured["peak_kb"] - base["peak_kb"]
+        if grew > min_kb and measured["peak_kb"] > base["peak_kb"] * (1 + memory_threshold):
+            regressions.append(f"{benchmark_id}: {base['peak_kb']:.1f}KB -> {measured['peak_kb']:.1f}KB peak memory")
+    return regressions
@@ -0,0 +1,217 @@
+"""
+Content-addressed store for the heavy fields of trial results.
+
+Values are serialized as canonical JSON, compressed with zstd and saved under their
+SHA-256. A whole CRM dump never repeats, every reset gives the records new ids and
+timestamps, so `crm_state` is stored as one blob per object type with those volatile
+fields moved out into a manifest, a blob of its own. An object type the trial didn't
+change is then stored once across trials and runs, while its ids and timestamps take a
+fraction of the space. Transcripts are stored the same way, one blob per message with
+the tool call ids and the record ids and timestamps in JSON tool responses moved out, so
+prompts and the tool calls and responses that repeat across trials are stored once.
+The results line keeps the fields empty and records the references in
+`SolveResult.blobs`; readers resolve them only when they need the content.
+"""
+
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import zstandard
+from .shared import CrmState, SolveResult
+
+BLOB_FIELDS = ["messages", "crm_state"]
+# set per trial by HubSpot, split off so the rest of a record dedupes across trials
+VOLATILE_RECORD_FIELDS = ["id", "createdAt", "updatedAt", "associations"]
+VOLATILE_PROPERTIES = ["hs_object_id", "createdate", "hs_createdate", "lastmodifieddate", "hs_lastmodifieddate"]
+# keys of the same in JSON tool responses, whose records come as HubSpot returns them
+VOLATILE_JSON_KEYS = {"id", "createdAt", "updatedAt", "archivedAt", *VOLATILE_PROPERTIES}
+ENGAGEMENT_TYPES = ["emails", "notes", "calls", "meetings", "tasks"]
+BLOBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../results/blobs")
+
+class BlobStore:
+    def __init__(self, root: str = BLOBS_DIR, *, level: int = 10):
+        self.root = root
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        self.decompressor = zstandard.ZstdDecompressor()
+        self._get = lru_cache(maxsize=4096)(self._read)
+
+    def path(self, ref: str) -> str:
+        digest = ref.split(":", 1)[1]
+        return os.path.join(self.root, digest[:2], f"{digest[2:]}.json.zst")
+
+    def put(self, value: Any) -> str:
+        content = json.dumps(value, sort_keys=True, separators=(",", ":")).encode()
+        ref = f"sha256:{hashlib.sha256(content).hexdigest()}"
+        path = self.path(ref)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(self.compressor.compress(content))
+            os.replace(tmp_path, path)
+        return ref
+
+    def _read(self, ref: str) -> Any:
+        with open(self.path(ref), "rb") as f:
+            return json.loads(self.decompressor.decompress(f.read()))
+
+    def get(self, ref: str) -> Any:
+        return self._get(ref)
+
+def split_record(record: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    (volatile fields, the rest) of a CRM record.
+    """
+    volatile = {key: record[key] for key in VOLATILE_RECORD_FIELDS if key in record}
+    body = {key: value for key, value in record.items() if key not in VOLATILE_RECORD_FIELDS}
+    properties = record.get("properties")
+    if isinstance(properties, dict):
+        volatile_properties = {name: properties[name] for name in VOLATILE_PROPERTIES if name in properties}
+        if volatile_properties:
+            volatile["volatile_properties"] = volatile_properties
+            body["properties"] = {name: value for name, value in properties.items() if name not in volatile_properties}
+    return volatile, body
+
+def join_record(volatile: Dict[str, Any], body: Dict[str, Any]) -> Dict[str, Any]:
+    record = {**body, **{key: value for key, value in volatile.items() if key != "volatile_properties"}}
+    if "volatile_properties" in volatile:
+        record["properties"] = {**body.get("properties", {}), **volatile["volatile_properties"]}
+    return record
+
+def put_records(records: List[Dict[str, Any]], store: BlobStore) -> Dict[str, Any]:
+    split = [split_record(record) for record in records]
+    return {"ref": store.put([body for _, body in split]), "volatile": [volatile for volatile, _ in split]}
+
+def get_records(chunk: Dict[str, Any], store: BlobStore) -> List[Dict[str, Any]]:
+    return [join_record(volatile, body) for volatile, body in zip(chunk["volatile"], store.get(chunk["ref"]))]
+
+def map_crm_state(crm_state: Dict[str, Any], fn: Callable[[Any], Any]) -> Dict[str, Any]:
+    mapped = {object_type: fn(crm_state.get(object_type) or []) for object_type in ["contacts", "companies", "deals"]}
+    engagements = crm_state.get("engagements") or {}
+    mapped["engagements"] = {object_type: fn(engagements.get(object_type) or []) for object_type in ENGAGEMENT_TYPES}
+    return mapped
+
+def put_crm_state(crm_state: Dict[str, Any], store: BlobStore) -> str:
+    return store.put({"chunks": map_crm_state(crm_state, lambda records: put_records(records, store))})
+
+def get_crm_state(ref: str, store: BlobStore) -> Dict[str, Any]:
+    """
+    Reassembles a chunked CRM state, and reads states stored before chunking as they are.
+    """
+    value = store.get(ref)
+    if "chunks" not in value:
+        return value
+    return map_crm_state(value["chunks"], lambda chunk: get_records(chunk, store))
+
+def split_json(content: str) -> Optional[Tuple[str, List[Any]]]:
+    """
+    (template, volatile values) of a JSON tool response: the values of the keys in
+    `VOLATILE_JSON_KEYS` are replaced by null in the template and listed in order. None
+    when the content isn't JSON or wouldn't come back byte for byte.
+    """
+    try:
+        value = json.loads(content)
+    except ValueError:
+        return None
+    if not isinstance(value, (dict, list)):
+        return None
+    values: List[Any] = []
+    def strip(node: Any) -> Any:
+        if isinstance(node, dict):
+            stripped = {}
+            for key, child in node.items():
+                if key in VOLATILE_JSON_KEYS:
+                    values.append(child)
+                    stripped[key] = None
+                else:
+                    stripped[key] = strip(child)
+            return stripped
+        if isinstance(node, list):
+            return [strip(child) for child in node]
+        return node
+    template = json.dumps(strip(value))
+    if not values or join_json(template, values) != content:
+        return None
+    return template, values
+
+def join_json(template: str, values: List[Any]) -> str:
+    remaining = iter(values)
+    def fill(node: Any) -> Any:
+        if isinstance(node, dict):
+            return {key: next(remaining) if key in VOLATILE_JSON_KEYS else fill(child) for key, child in node.items()}
+        if isinstance(node, list):
+            return [fill(child) for child in node]
+        return node
+    return json.dumps(fill(json.loads(template)))
+
+def split_message(message: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    (volatile fields, the rest) of a transcript message: the tool call ids, and the record
+    ids and timestamps in a JSON tool response.
+    """
+    volatile: Dict[str, Any] = {}
+    body = dict(message)
+    if "tool_call_id" in body:
+        volatile["tool_call_id"] = body.pop("tool_call_id")
+    if body.get("tool_calls"):
+        volatile["tool_call_ids"] = [call.get("id") for call in body["tool_calls"]]
+        body["tool_calls"] = [{key: value for key, value in call.items() if key != "id"} for call in body["tool_calls"]]
+    if isinstance(body.get("content"), str):
+        split = split_json(body["content"])
+        if split:
+            body["content"], volatile["content_values"] = split
+    return volatile, body
+
+def join_message(volatile: Dict[str, Any], body: Dict[str, Any]) -> Dict[str, Any]:
+    message = dict(body)
+    if "tool_call_id" in volatile:
+        message["tool_call_id"] = volatile["tool_call_id"]
+    if "tool_call_ids" in volatile:
+        message["tool_calls"] = [{**call, "id": call_id} for call, call_id in zip(message["tool_calls"], volatile["tool_call_ids"])]
+    if "content_values" in volatile:
+        message["content"] = join_json(message["content"], volatile["content_values"])
+    return message
+
+def put_messages(messages: List[Dict[str, Any]], store: BlobStore) -> str:
+    chunks = []
+    for message in messages:
+        volatile, body = split_message(message)
+        chunks.append({"ref": store.put(body), "volatile": volatile})
+    return store.put({"messages": chunks})
+
+def get_messages(ref: str, store: BlobStore) -> List[Dict[str, Any]]:
+    """
+    Reassembles a chunked transcript, and reads transcripts stored whole as they are.
+    """
+    value = store.get(ref)
+    if isinstance(value, list):
+        return value
+    return [join_message(chunk["volatile"], store.get(chunk["ref"])) for chunk in value["messages"]]
+
+def externalize(data: Dict[str, Any], store: BlobStore) -> Dict[str, Any]:
+    """
+    Moves the heavy fields of a dumped `SolveResult` into the store.
+    """
+    blobs = dict(data.get("blobs") or {})
+    for field in BLOB_FIELDS:
+        value = data.get(field)
+        if value:
+            blobs[field] = put_crm_state(value, store) if field == "crm_state" else put_messages(value, store)
+            data[field] = [] if field == "messages" else None
+    data["blobs"] = blobs or None
+    return data
+
+def resolve_blobs(result: SolveResult, store: BlobStore) -> SolveResult:
+    """
+    Loads externalized fields back into the result.
+    """
+    if not result.blobs:
+        return result
+    if "messages" in result.blobs:
+        result.messages = get_messages(result.blobs["messages"], store)
+    if "crm_state" in result.blobs:
+        result.crm_state = CrmState.model_validate(get_crm_state(result.blobs["crm_state"], store))
+    result.blobs = None
+    return result
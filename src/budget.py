@@ -0,0 +1,214 @@
+"""
+Spend caps for sweeps.
+
+Every completion of the agent and the judge is metered with `meter_usage`: its tokens
+and the dollar cost estimated from litellm's price map go to the sweep metrics and, when
+a `BudgetGovernor` is installed, to the running trial, its toolset and the sweep. The
+governor caps each of the three, in dollars, tokens or both:
+
+- `check_budget` runs before every agent step. When the trial, its toolset or the sweep
+  is over its cap, the agent stops and the trial is recorded as failed with
+  `info.stop_reason` set to `budget` and the cap in `info.budget.cap`, without
+  evaluation. Only trials stopped by their own cap count towards pass^k, the toolset
+  and sweep caps say nothing about the agent.
+- `admit_trial` runs before every trial. No trial starts once its toolset or the sweep
+  is out of budget, and past `soft_limit` of either cap, cells that already have
+  `min_trials` unanimous results are skipped; more trials of those barely move pass^k.
+"""
+
+import contextvars
+import math
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+from .metrics import METRICS
+
+class BudgetExceeded(Exception):
+    def __init__(self, reason: str, cap: str):
+        super().__init__(reason)
+        self.cap = cap # sweep, toolset or trial
+
+class Spend:
+    def __init__(self):
+        self.tokens = 0
+        self.usd = 0.0
+
+    def add(self, tokens: int, usd: float):
+        self.tokens += tokens
+        self.usd += usd
+
+    def info(self) -> Dict[str, Any]:
+        return {"tokens": self.tokens, "usd": round(self.usd, 6)}
+
+class BudgetGovernor:
+    def __init__(
+        self,
+        *,
+        sweep_usd: Optional[float] = None,
+        sweep_tokens: Optional[int] = None,
+        toolset_usd: Optional[float] = None,
+        toolset_tokens: Optional[int] = None,
+        trial_usd: Optional[float] = None,
+        trial_tokens: Optional[int] = None,
+        soft_limit: float = 0.8,
+        min_trials: int = 2,
+    ):
+        self.caps: Dict[str, Tuple[Optional[float], Optional[int]]] = {
+            "sweep": (sweep_usd, sweep_tokens),
+            "toolset": (toolset_usd, toolset_tokens),
+            "trial": (trial_usd, trial_tokens),
+        }
+        self.soft_limit = soft_limit
+        self.min_trials = min_trials
+        self.lock = threading.Lock()
+        self.sweep = Spend()
+        self.toolsets: Dict[str, Spend] = {}
+        self.cells: Dict[Tuple[str, str], List[int]] = {} # trials, passed
+        self.skipped: Dict[str, int] = {}
+
+    def used(self, level: str, spend: Spend) -> float:
+        """
+        Fraction of the tighter of the level's caps that `spend` used up, 0 without caps.
+        """
+        usd_cap, tokens_cap = self.caps[level]
+        fractions = [0.0]
+        if usd_cap is not None:
+            fractions.append(spend.usd / usd_cap if usd_cap > 0 else math.inf)
+        if tokens_cap is not None:
+            fractions.append(spend.tokens / tokens_cap if tokens_cap > 0 else math.inf)
+        return max(fractions)
+
+    def over(self, toolset: str, trial: Optional[Spend] = None) -> Optional[Tuple[str, str]]:
+        """
+        The spent cap and why, None within budget.
+        """
+        if self.used("sweep", self.sweep) >= 1:
+            return "sweep", "sweep budget spent"
+        if self.used("toolset", self.toolsets.get(toolset, Spend())) >= 1:
+            return "toolset", f"{toolset} budget spent"
+        if trial is not None and self.used("trial", trial) >= 1:
+            return "trial", "trial budget spent"
+        return None
+
+    def is_low_value(self, toolset: str, task: str) -> bool:
+        trials, passed = self.cells.get((toolset, task), (0, 0))
+        return trials >= self.min_trials and passed in (0, trials)
+
+    def admit(self, toolset: str, task: str) -> bool:
+        with self.lock:
+            over = self.over(toolset)
+            reason = over[1] if over else None
+            pressure = max(self.used("sweep", self.sweep), self.used("toolset", self.toolsets.get(toolset, Spend())))
+            if reason is None and pressure >= self.soft_limit and self.is_low_value(toolset, task):
+                reason = f"{pressure:.0%} of budget spent and results settled"
+            if reason:
+                self.skipped[toolset] = self.skipped.get(toolset, 0) + 1
+        if reason:
+            print(f"💸 Skipping {toolset} / {task}: {reason}")
+            METRICS.record_budget_skip()
+            return False
+        return True
+
+    def charge(self, toolset: str, tokens: int, usd: float):
+        with self.lock:
+            self.sweep.add(tokens, usd)
+            self.toolsets.setdefault(toolset, Spend()).add(tokens, usd)
+
+    def record(self, toolset: str, task: str, passed: bool):
+        with self.lock:
+            cell = self.cells.setdefault((toolset, task), [0, 0])
+            cell[0] += 1
+            cell[1] += 1 if passed else 0
+
+    def summary(self) -> str:
+        usd_cap, tokens_cap = self.caps["sweep"]
+        caps = " of ".join(filter(None, [
+            f"${self.sweep.usd:.2f}",
+            f"${usd_cap:.2f}" if usd_cap is not None else None,
+        ]))
+        lines = [f"💰 Spent {caps}, {self.sweep.tokens} tokens{f' of {tokens_cap}' if tokens_cap is not None else ''}"]
+        for toolset, spend in self.toolsets.items():
+            skipped = self.skipped.get(toolset, 0)
+            lines.append(f"   {toolset}: ${spend.usd:.2f}, {spend.tokens} tokens{f', {skipped} trials skipped' if skipped else ''}")
+        return "\n".join(lines)
+
+class TrialBudget:
+    """
+    Spend of one trial, by role
+    """
+
+    def __init__(self, governor: BudgetGovernor, toolset: str, task: str):
+        self.governor = governor
+        self.toolset = toolset
+        self.task = task
+        self.spend = Spend()
+        self.roles: Dict[str, Spend] = {}
+        self.cap: Optional[str] = None # the cap that stopped the trial
+
+    def charge(self, role: str, tokens: int, usd: float):
+        with self.governor.lock:
+            self.spend.add(tokens, usd)
+            self.roles.setdefault(role, Spend()).add(tokens, usd)
+        self.governor.charge(self.toolset, tokens, usd)
+
+    def check(self):
+        with self.governor.lock:
+            over = self.governor.over(self.toolset, self.spend)
+        if over:
+            self.cap = over[0]
+            raise BudgetExceeded(over[1], over[0])
+
+    def record(self, passed: bool):
+        self.governor.record(self.toolset, self.task, passed)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            **self.spend.info(),
+            "by_role": {role: spend.info() for role, spend in self.roles.items()},
+            **({"cap": self.cap} if self.cap else {}),
+        }
+
+_governor: Optional[BudgetGovernor] = None
+_trial: contextvars.ContextVar[Optional[TrialBudget]] = contextvars.ContextVar("trial_budget", default=None)
+
+def install_budget(governor: BudgetGovernor):
+    global _governor
+    _governor = governor
+
+def current_governor() -> Optional[BudgetGovernor]:
+    return _governor
+
+def budget_scope(toolset: str, task: str):
+    """
+    Charges the completions made inside to one trial, when a governor is installed.
+    """
+    if _governor is None:
+        return nullcontext(None)
+    return _scope(TrialBudget(_governor, toolset, task))
+
+@contextmanager
+def _scope(trial: TrialBudget):
+    token = _trial.set(trial)
+    try:
+        yield trial
+    finally:
+        _trial.reset(token)
+
+def admit_trial(toolset: str, task: str) -> bool:
+    return _governor is None or _governor.admit(toolset, task)
+
+def meter_usage(step: Dict[str, Any], *, role: str):
+    """
+    Charges one completion's usage, as returned by `step_usage`.
+    """
+    tokens = step["prompt_tokens"] + step["completion_tokens"]
+    usd = step.get("cost_usd", 0.0)
+    METRICS.record_llm_usage(role, tokens, usd)
+    trial = _trial.get()
+    if trial is not None:
+        trial.charge(role, tokens, usd)
+
+def check_budget():
+    trial = _trial.get()
+    if trial is not None:
+        trial.check()
@@ -0,0 +1,341 @@
+"""
+Incremental CRM dump.
+
+`CrmMirror` keeps a local copy of the CRM and renders the same `CrmState` as
+`dump_hubspot` from it. Every trial starts by resetting the portal, and `seed` builds the
+copy from the records `reset_hubspot` created, as HubSpot returned them, and the
+associations it made, so a trial's dump costs no listing at all. The trial starts at the
+server time of the reset's last write, and its dumps ask the search endpoint only for
+records created or modified since then, one request per object type when nothing
+changed, and read the associations of those in one batch per association type. Types
+with fewer than `LIST_LIMIT` records are listed instead, with their associations that
+is a single request, which no search beats.
+
+Without a seed, e.g. outside of trials, the first dump of a type pages through all of
+its records, and later dumps search for what changed since the previous dump and compare
+the total count with the mirror to notice deletions; only when the counts differ are the
+ids listed.
+
+Search is eventually consistent and lags seconds behind writes, so the records the trial
+touched, as `dump_hubspot(touched=...)` passes them, are read again through batch read,
+which sees writes right away: their latest version replaces what search returned, and
+mirrored ones batch read doesn't find anymore were deleted. That is also how deletions
+are noticed in a seeded trial, the agent can only delete records by id. Syncs without a
+seed reach `SYNC_OVERLAP_SECONDS` further back than the previous one, a search result
+older than the mirrored record never replaces it, and changes that are only visible in
+associations of unmodified records are picked up through the reverse side of modified
+records.
+"""
+
+import copy
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+import requests
+from .deadline import is_deadline_timeout, request_timeout
+from .dump_hubspot import BASE_URL, HEADERS, OBJECT_TYPES, associations_map, get, get_all_objects, scope_properties
+from .shared import CrmScope, CrmState, CrmStateEngagements
+
+SYNC_OVERLAP_SECONDS = 60
+LIST_LIMIT = 100
+SEARCH_LIMIT = 100
+SEARCH_MAX_RESULTS = 10000 # HubSpot search doesn't page past this
+BATCH_READ_LIMIT = 1000
+OBJECT_BATCH_READ_LIMIT = 100
+
+# contacts keep their modification time in a property of their own
+MODIFIED_PROPERTIES = {"contacts": "lastmodifieddate"}
+ALWAYS_RETURNED_PROPERTIES = {"hs_object_id", "createdate", "hs_lastmodifieddate", "lastmodifieddate"}
+
+def post(endpoint, body):
+    """
+    Perform a POST request to the HubSpot API and handle errors.
+    """
+    url = f"{BASE_URL}{endpoint}"
+    try:
+        response = requests.post(url, headers=HEADERS, json=body, timeout=request_timeout())
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException as e:
+        if is_deadline_timeout(e):
+            raise
+        print(f"Error posting data to {endpoint}: {e}")
+        return None
+
+def singular(object_type: str) -> str:
+    return object_type[:-1]
+
+def linked_ids(record: Dict[str, Any], to_type: str) -> Set[str]:
+    association = (record.get("associations") or {}).get(to_type) or {}
+    return {str(item["id"]) for item in association.get("results", [])}
+
+def set_linked_ids(object_type: str, record: Dict[str, Any], to_type: str, ids: Iterable[str]):
+    ids = sorted(set(ids), key=lambda i: (len(i), i))
+    associations = record.setdefault("associations", {})
+    if ids:
+        associations[to_type] = {
+            "results": [{"id": i, "type": f"{singular(object_type)}_to_{singular(to_type)}"} for i in ids]
+        }
+    else:
+        associations.pop(to_type, None)
+    if not associations:
+        record.pop("associations")
+
+def modified_at(object_type: str, record: Dict[str, Any]) -> str:
+    # ISO 8601 in UTC, compares in order as text
+    properties = record.get("properties") or {}
+    return properties.get(MODIFIED_PROPERTIES.get(object_type, "hs_lastmodifieddate")) or record.get("updatedAt") or ""
+
+class SyncFailed(Exception):
+    pass
+
+class CrmMirror:
+    def __init__(self):
+        self.records: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.properties: Dict[str, List[str]] = {}
+        self.synced_at: Dict[str, float] = {}
+        self.since: Dict[str, int] = {} # seeded object type -> start of the trial, ms since epoch
+        self.full_loads = 0
+        self.syncs = 0
+        self.seeds = 0
+
+    def seed(self, reset: Dict[str, Any]):
+        """
+        Replaces the mirror with the records a `reset_hubspot` result created. A create
+        response carries every property the create set or HubSpot defaulted, so the seeded
+        records serve any property list.
+        """
+        # the Date header has whole seconds, the last write may be up to a second past it
+        since = int((reset["finished_at"] + 1) * 1000)
+        self.records = {}
+        self.properties = {}
+        self.synced_at = {}
+        self.since = {}
+        for object_type, items in reset["records"].items():
+            records = {}
+            for item in items:
+                record = copy.deepcopy(item)
+                record.pop("associations", None)
+                record.setdefault("properties", {}).setdefault("hs_object_id", str(record["id"]))
+                records[str(record["id"])] = record
+            self.records[object_type] = records
+            self.properties[object_type] = []
+            self.since[object_type] = since
+        for from_type, from_id, to_type, to_id in reset["associations"]:
+            for a_type, a_id, b_type, b_id in [(from_type, str(from_id), to_type, str(to_id)), (to_type, str(to_id), from_type, str(from_id))]:
+                record = self.records.get(a_type, {}).get(a_id)
+                if record is not None and b_type in associations_map.get(a_type, []):
+                    set_linked_ids(a_type, record, b_type, linked_ids(record, b_type) | {b_id})
+        self.seeds += 1
+
+    def dump(self, scope: Optional[CrmScope] = None, touched: Optional[Set[str]] = None) -> CrmState:
+        """
+        `touched` are ids of records the trial created, changed or deleted, of any type.
+        """
+        if scope is None:
+            scope = {object_type: [] for object_type in OBJECT_TYPES}
+
+        objects = {}
+        for object_type in OBJECT_TYPES:
+            if object_type not in scope:
+                objects[object_type] = []
+                continue
+            properties = scope_properties(object_type, scope[object_type])
+            missing = [name for name in properties if name not in self.properties.get(object_type, [])]
+            if object_type in self.since:
+                # seeded records have every property, only changed records are read with these
+                self.properties[object_type] = sorted({*self.properties[object_type], *properties})
+                missing = []
+            # a type that fits in one page is listed with its associations in one request, no sync is cheaper
+            if object_type not in self.records or missing or len(self.records[object_type]) < LIST_LIMIT:
+                self.load(object_type, sorted({*self.properties.get(object_type, []), *properties}))
+            else:
+                try:
+                    self.sync(object_type, touched or set())
+                except SyncFailed as e:
+                    print(f"Incremental dump of {object_type} failed, loading all: {e}")
+                    self.load(object_type, self.properties[object_type])
+            objects[object_type] = self.render(object_type, properties)
+
+        return CrmState(
+            contacts=objects["contacts"],
+            companies=objects["companies"],
+            deals=objects["deals"],
+            engagements=CrmStateEngagements(
+                emails=objects["emails"],
+                notes=objects["notes"],
+                calls=objects["calls"],
+                meetings=objects["meetings"],
+                tasks=objects["tasks"],
+            ),
+        )
+
+    def render(self, object_type: str, properties: List[str]) -> List[Dict[str, Any]]:
+        keep = {*properties, *ALWAYS_RETURNED_PROPERTIES}
+        rendered = []
+        for record_id in sorted(self.records[object_type], key=lambda i: (len(i), i)):
+            record = copy.deepcopy(self.records[object_type][record_id])
+            values = record.get("properties", {})
+            # like HubSpot, properties asked for are returned also when empty
+            record["properties"] = {
+                **{name: values.get(name) for name in properties},
+                **{name: value for name, value in values.items() if name in keep},
+            }
+            rendered.append(record)
+        return rendered
+
+    # === Loading ===
+
+    def load(self, object_type: str, properties: List[str]):
+        started = time.time()
+        self.records[object_type] = {str(record["id"]): record for record in get_all_objects(object_type, properties)}
+        self.properties[object_type] = properties
+        self.synced_at[object_type] = started
+        self.since.pop(object_type, None)
+        self.full_loads += 1
+
+    def sync(self, object_type: str, touched: Set[str]):
+        started = time.time()
+        seeded = object_type in self.since
+        since = self.since[object_type] if seeded else int((self.synced_at[object_type] - SYNC_OVERLAP_SECONDS) * 1000)
+        modified_property = MODIFIED_PROPERTIES.get(object_type, "hs_lastmodifieddate")
+        changed = self.search(object_type, [
+            {"filters": [{"propertyName": modified_property, "operator": "GTE", "value": str(since)}]},
+            {"filters": [{"propertyName": "createdate", "operator": "GTE", "value": str(since)}]},
+        ])
+
+        records = self.records[object_type]
+        touched_ids = sorted(touched, key=lambda i: (len(i), i))
+        found = self.batch_read(object_type, touched_ids) if touched_ids else []
+        found_ids = {str(record["id"]) for record in found}
+        # batch read has the latest version of what it found
+        changed = [record for record in changed if str(record["id"]) not in found_ids]
+        if changed or found:
+            # one association read for the search hits and the touched records together
+            associations = self.read_associations(object_type, [record["id"] for record in changed + found])
+            for record in changed:
+                record_id = str(record["id"])
+                if record_id in records and modified_at(object_type, record) < modified_at(object_type, records[record_id]):
+                    # search still has an older version than the one read before
+                    continue
+                self.replace(object_type, record, associations)
+            for record in found:
+                self.replace(object_type, record, associations)
+        for record_id in touched_ids:
+            if record_id in records and record_id not in found_ids:
+                self.relink(object_type, record_id, records.pop(record_id), None)
+
+        # a lagging count only costs listing the ids, which is consistent
+        if not seeded and self.count(object_type) != len(records):
+            ids = self.list_ids(object_type)
+            for record_id in set(records) - ids:
+                self.relink(object_type, record_id, records.pop(record_id), None)
+            if ids - set(records):
+                raise SyncFailed(f"{len(ids - set(records))} records missing from search results")
+
+        self.synced_at[object_type] = started
+        self.syncs += 1
+
+    def replace(self, object_type: str, record: Dict[str, Any], associations: Dict[str, Dict[str, List[str]]]):
+        record_id = str(record["id"])
+        for to_type in associations_map.get(object_type, []):
+            set_linked_ids(object_type, record, to_type, associations.get(to_type, {}).get(record_id, []))
+        self.relink(object_type, record_id, self.records[object_type].get(record_id), record)
+        self.records[object_type][record_id] = record
+
+    def relink(self, object_type: str, record_id: str, old: Optional[Dict[str, Any]], new: Optional[Dict[str, Any]]):
+        """
+        Updates the reverse side of changed associations in the mirrored records of the other types.
+        """
+        for to_type in associations_map.get(object_type, []):
+            if object_type not in associations_map.get(to_type, []) or to_type not in self.records:
+                continue
+            before = linked_ids(old, to_type) if old else set()
+            after = linked_ids(new, to_type) if new else set()
+            for to_id in before ^ after:
+                linked = self.records[to_type].get(to_id)
+                if linked is None:
+                    continue
+                ids = linked_ids(linked, object_type)
+                ids = ids | {record_id} if to_id in after else ids - {record_id}
+                set_linked_ids(to_type, linked, object_type, ids)
+
+    # === HubSpot requests ===
+
+    def search(self, object_type: str, filter_groups: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        results = []
+        after = None
+        while True:
+            body = {
+                "filterGroups": filter_groups,
+                "properties": self.properties[object_type],
+                "limit": SEARCH_LIMIT,
+            }
+            if after:
+                body["after"] = after
+            data = post(f"/crm/v3/objects/{object_type}/search", body)
+            if data is None:
+                raise SyncFailed("search request failed")
+            if data.get("total", 0) > SEARCH_MAX_RESULTS:
+                raise SyncFailed(f"{data['total']} changed records, more than search returns")
+            results.extend(data.get("results", []))
+            if not data.get("paging") or not data["paging"].get("next"):
+                return results
+            after = data["paging"]["next"]["after"]
+
+    def batch_read(self, object_type: str, ids: List[str]) -> List[Dict[str, Any]]:
+        results = []
+        for i in range(0, len(ids), OBJECT_BATCH_READ_LIMIT):
+            body = {
+                "properties": self.properties[object_type],
+                "inputs": [{"id": record_id} for record_id in ids[i:i+OBJECT_BATCH_READ_LIMIT]],
+            }
+            try:
+                response = requests.post(f"{BASE_URL}/crm/v3/objects/{object_type}/batch/read", headers=HEADERS, json=body, timeout=request_timeout())
+                if response.status_code == 404:
+                    # none of the ids is a record of this type
+                    continue
+                response.raise_for_status()
+            except requests.RequestException as e:
+                if is_deadline_timeout(e):
+                    raise
+                raise SyncFailed(f"batch read failed: {e}")
+            # 207 lists the ids that weren't found in `errors`
+            results.extend(response.json().get("results", []))
+        return results
+
+    def count(self, object_type: str) -> int:
+        data = post(f"/crm/v3/objects/{object_type}/search", {"properties": ["hs_object_id"], "limit": 1})
+        if data is None:
+            raise SyncFailed("count request failed")
+        return data.get("total", 0)
+
+    def list_ids(self, object_type: str) -> Set[str]:
+        ids = set()
+        after = None
+        while True:
+            params = {"limit": LIST_LIMIT, "properties": ["hs_object_id"]}
+            if after:
+                params["after"] = after
+            data = get(f"/crm/v3/objects/{object_type}", params)
+            if not data:
+                raise SyncFailed("listing ids failed")
+            ids.update(str(record["id"]) for record in data.get("results", []))
+            if not data.get("paging") or not data["paging"].get("next"):
+                return ids
+            after = data["paging"]["next"]["after"]
+
+    def read_associations(self, object_type: str, ids: List[str]) -> Dict[str, Dict[str, List[str]]]:
+        """
+        to type -> record id -> associated ids
+        """
+        associations: Dict[str, Dict[str, List[str]]] = {}
+        for to_type in associations_map.get(object_type, []):
+            linked = associations.setdefault(to_type, {})
+            for i in range(0, len(ids), BATCH_READ_LIMIT):
+                inputs = [{"id": str(record_id)} for record_id in ids[i:i+BATCH_READ_LIMIT]]
+                data = post(f"/crm/v4/associations/{object_type}/{to_type}/batch/read", {"inputs": inputs})
+                if data is None:
+                    raise SyncFailed("reading associations failed")
+                for result in data.get("results", []):
+                    linked[str(result["from"]["id"])] = [str(item["toObjectId"]) for item in result.get("to", [])]
+        return associations
@@ -0,0 +1,51 @@
+import json
+import os
+from composio_openai import ComposioToolSet, Action
+from .shared import Tool, ToolAccess, Toolset
+
+# reads and writes of the actions below, for the tool cache
+COMPOSIO_ACCESS = {
+    "HUBSPOT_CREATE_CONTACT_OBJECT_WITH_PROPERTIES": ToolAccess(write=True, object_types=["contacts"]),
+    "HUBSPOT_CREATE_COMPANY_OBJECT": ToolAccess(write=True, object_types=["companies"]),
+    "HUBSPOT_SEARCH_CONTACTS_BY_CRITERIA": ToolAccess(write=False, object_types=["contacts"]),
+    "HUBSPOT_SEARCH_COMPANY_OBJECTS": ToolAccess(write=False, object_types=["companies"]),
+    "HUBSPOT_CREATE_NEW_DEAL_OBJECT": ToolAccess(write=True, object_types=["deals"]),
+    "HUBSPOT_SEARCH_DEALS_BY_CRITERIA": ToolAccess(write=False, object_types=["deals"]),
+    "HUBSPOT_READ_PROPERTY_GROUPS_FOR_OBJECT_TYPE": ToolAccess(write=False, object_types=["properties"]),
+    "HUBSPOT_LIST_ASSOCIATION_TYPES": ToolAccess(write=False, object_types=["association_types"]),
+    "HUBSPOT_CREATE_BATCH_OF_OBJECTS": ToolAccess(write=True), # any object type
+}
+
+def create_composio_toolset() -> Toolset:
+    toolset = ComposioToolSet(api_key=os.getenv("COMPOSIO_API_KEY"))
+
+    tools = toolset.get_tools(
+        # filtering by tags doesn't work: https://github.com/ComposioHQ/composio/issues/1548
+        # apps=[App.HUBSPOT],
+        # tags=[Tag.HUBSPOT_CORE, Tag.HUBSPOT_BASIC],
+        actions=[
+            Action.HUBSPOT_CREATE_CONTACT_OBJECT_WITH_PROPERTIES, 
+            Action.HUBSPOT_CREATE_COMPANY_OBJECT, 
+            Action.HUBSPOT_SEARCH_CONTACTS_BY_CRITERIA, 
+            Action.HUBSPOT_SEARCH_COMPANY_OBJECTS,
+            Action.HUBSPOT_CREATE_NEW_DEAL_OBJECT,
+            Action.HUBSPOT_SEARCH_DEALS_BY_CRITERIA,
+            Action.HUBSPOT_READ_PROPERTY_GROUPS_FOR_OBJECT_TYPE,
+            Action.HUBSPOT_LIST_ASSOCIATION_TYPES,
+            Action.HUBSPOT_CREATE_BATCH_OF_OBJECTS,
+        ],
+    )
+    
+    return Toolset(
+        name="Composio Toolset",
+        tools=[
+            Tool(
+                name=tool['function']['name'],
+                description=tool['function']['description'],
+                parameters=tool['function']['parameters'],
+                handler=lambda arguments, tool=tool: toolset.execute_action(action=tool["function"]["name"], params=json.loads(arguments))
+            )
+            for tool in tools
+        ],
+        classify=lambda tool_name, arguments: COMPOSIO_ACCESS.get(tool_name),
+    )
@@ -1,67 +1,201 @@
 import json
 import os
-from litellm import completion
 from typing import Any, Dict, List, Optional
-from .shared import Agent, Model, Tool, SolveResult
+from .budget import BudgetExceeded, check_budget, meter_usage
+from .deadline import DEFAULT_LLM_TIMEOUT, call_with_deadline, is_deadline_timeout, request_timeout
+from .fault_injection import call_tool
+from .metrics import METRICS
+from .resume import NotResumable, is_infra_error, resumable, run_once
+from .shared import Agent, Model, Tool, Toolset, SolveResult
+from .streaming import ToolPipeline, summarize_streaming
+from .tool_cache import cached_tool_call
+from .tool_retrieval import ToolSelection
+from .trajectory_monitor import TrajectoryMonitor
+from .usage import step_usage, summarize_usage
+
+def canonicalize(value: Any) -> Any:
+    """
+    Rebuilds a JSON-like value with keys in sorted order, so it serializes to the same bytes every time.
+    """
+    if isinstance(value, dict):
+        return {key: canonicalize(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return [canonicalize(item) for item in value]
+    return value
 
 class CRMAgent(Agent):
     instructions = (
         "You are a CRM agent. You can interact with HubSpot."
     )
 
-    def __init__(self, *, model: Model, tools: list[Tool]):
+    def __init__(self, *, model: Model, tools: list[Tool], tool_top_k: Optional[int] = None, stream: bool = False):
         self.model = model
         self.tools = tools
+        self.tool_top_k = tool_top_k
+        self.stream = stream
+
+    def tool_schemas(self, tools: Optional[List[Tool]] = None) -> List[Dict[str, Any]]:
+        """
+        Tool schemas sorted by name with canonical key order. Together with the fixed system
+        message this keeps the request prefix byte-stable across steps and trials, which is
+        what provider-side prompt caching matches on.
+        """
+        return [
+            canonicalize(t.json_schema_dump())
+            for t in sorted(self.tools if tools is None else tools, key=lambda t: t.name)
+        ]
+
+    def run_tool(self, selection: Optional[ToolSelection], tool_name: str, tool_args: str) -> Any:
+        if selection:
+            tool = selection.lookup(tool_name)
+        else:
+            tool = next(
+                (t for t in self.tools if t.name == tool_name), None
+            )
+        if not tool:
+            raise ValueError(f"Tool {tool_name} not found")
+        return cached_tool_call(tool_name, tool_args, lambda: call_with_deadline(call_tool, tool, tool_args))
+
+    def stream_completion(self, request: Dict[str, Any], selection: Optional[ToolSelection]):
+        """
+        Streams one completion while its tool calls start, returns the response and the pipeline.
+        """
+        from litellm import completion, stream_chunk_builder
+
+        # tool calls start while the rest of the completion is still streaming
+        pipeline = ToolPipeline(lambda name, args: self.run_tool(selection, name, args))
+        try:
+            with pipeline:
+                chunks = []
+                for chunk in completion(**request, timeout=request_timeout(DEFAULT_LLM_TIMEOUT), stream=True, stream_options={"include_usage": True}):
+                    chunks.append(chunk)
+                    if chunk.choices:
+                        pipeline.feed(chunk.choices[0].delta.tool_calls)
+                pipeline.finish()
+        except Exception as e:
+            if pipeline.spans and not is_deadline_timeout(e):
+                # a started tool call may have changed the CRM, requesting the step again could repeat it
+                raise NotResumable(f"Stream failed after its tool calls started: {type(e).__name__}: {e}") from e
+            raise
+        return stream_chunk_builder(chunks, messages=request["messages"]), pipeline
+
+    def is_read_only(self, tool_name: str, tool_args: str) -> bool:
+        """
+        Whether a failed call can safely run again: reads the toolset classifies as such,
+        and local tools like find_tools that don't touch the CRM.
+        """
+        if not any(tool.name == tool_name for tool in self.tools):
+            return True
+        access = self.tools.access(tool_name, tool_args) if isinstance(self.tools, Toolset) else None
+        return access is not None and not access.write
 
     def solve(self, task, *, max_num_steps = 30, seed: Optional[int] = None) -> SolveResult:
+        # litellm takes seconds to import, so it's loaded on first use instead of with the CLIs
+        from litellm import completion
+
         messages: List[Dict[str, Any]] = [
             { "role": "system", "content": CRMAgent.instructions },
             { "role": "user", "content": task.prompt }
         ]
 
-        tools = [t.json_schema_dump() for t in self.tools]
+        all_tools = self.tool_schemas()
+        selection = None
+        if self.tool_top_k and len(self.tools) > self.tool_top_k:
+            # expose only the tools matching the task, the model can ask for more
+            selection = ToolSelection(self.tools, query=task.prompt, top_k=self.tool_top_k, model=self.model.value)
+        usage: List[Dict[str, int]] = []
+        streamed: List[Dict[str, Any]] = []
+        monitor = TrajectoryMonitor()
+        stop_reason = "max_steps"
+        error = None
 
-        for _ in range(max_num_steps):
-            res = completion(
-                model=self.model,
-                messages=messages,
-                tools=tools,
-                store=os.getenv("OPENAI_STORE_COMPLETIONS", "false").lower() in ("true", "1", "yes"),
-                seed=seed,
-            )
-            
-            msg = res.choices[0].message.model_dump()
-            messages.append(msg)
+        try:
+            for _ in range(max_num_steps):
+                check_budget()
+                tools = self.tool_schemas(selection.available()) if selection else all_tools
+                if selection:
+                    selection.record_step(tools, all_tools)
+                request = dict(
+                    model=self.model,
+                    messages=messages,
+                    tools=tools,
+                    store=os.getenv("OPENAI_STORE_COMPLETIONS", "false").lower() in ("true", "1", "yes"),
+                    seed=seed,
+                )
 
-            # TODO: Calculate cost of each step
+                # a resumed completion is requested again with the same messages and a fresh timeout
+                pipeline = None
+                if self.stream:
+                    res, pipeline = resumable("completion", lambda: self.stream_completion(request, selection))
+                else:
+                    res = resumable("completion", lambda: completion(**request, timeout=request_timeout(DEFAULT_LLM_TIMEOUT)))
+            
+                msg = res.choices[0].message.model_dump()
+                messages.append(msg)
+                step = step_usage(res, self.model.value)
+                usage.append(step)
+                meter_usage(step, role="agent")
 
-            if msg.get("tool_calls"):
-                for tool_call in msg["tool_calls"]:
-                    tool_name = tool_call["function"]["name"]
-                    tool_args = tool_call["function"]["arguments"]
+                if msg.get("tool_calls"):
+                    call_fingerprints = []
+                    for i, tool_call in enumerate(msg["tool_calls"]):
+                        tool_name = tool_call["function"]["name"]
+                        tool_args = tool_call["function"]["arguments"]
 
-                    tool = next(
-                        (t for t in self.tools if t.name == tool_name), None
-                    )
-                    if tool:
-                        tool_response = tool.run(tool_args)
+                        run_directly = lambda: self.run_tool(selection, tool_name, tool_args)
+                        # the pipeline skips the calls after a failure, those and resumed ones run directly
+                        run_call = (lambda: pipeline.response(i)) if pipeline and pipeline.ran(i) else run_directly
+                        if self.is_read_only(tool_name, tool_args):
+                            tool_response = resumable(f"tool {tool_name}", run_call, fallback=run_directly)
+                        else:
+                            # a write may have been applied before it failed, running it again could duplicate it
+                            tool_response = run_once(f"tool {tool_name}", run_call)
+                        call_fingerprints.append(monitor.observe_tool_call(tool_name, tool_args, tool_response))
 
                         messages.append({
                             "role": "tool",
                             "tool_call_id": tool_call["id"],
                             "content": json.dumps(tool_response),
                         })
-                    else:
-                        raise ValueError(f"Tool {tool_name} not found")
 
+                    if pipeline:
+                        streamed.append(pipeline.info())
+                    if monitor.observe_step(call_fingerprints):
+                        # the trajectory stopped making progress, end the trial early
+                        stop_reason = monitor.stop_reason
+                        break
+
+                else:
+                    if pipeline:
+                        streamed.append(pipeline.info())
+                    # no more tool calls exiting
+                    stop_reason = "completed"
+                    break
+        except BudgetExceeded:
+            # keep the partial transcript, the trial is recorded as over budget
+            stop_reason = "budget"
+        except Exception as e:
+            if is_deadline_timeout(e):
+                # keep the partial transcript, the trial is recorded as timed out
+                stop_reason = "timeout"
             else:
-                # no more tool calls exiting
-                break
+                # keep the partial transcript, transient errors left after resuming are infra errors
+                stop_reason = "infra_error" if is_infra_error(e) else "error"
+                error = f"{type(e).__name__}: {e}"
+                METRICS.record_error(e)
 
         return SolveResult(
             task=task,
             model=self.model,            
             seed=seed,
             messages=messages,
-            info={}
+            error=error,
+            info={
+                **monitor.info(),
+                "stop_reason": stop_reason,
+                "usage": summarize_usage(usage),
+                "tool_top_k": self.tool_top_k,
+                **({"tool_retrieval": selection.info()} if selection else {}),
+                **({"streaming": summarize_streaming(streamed)} if self.stream else {}),
+            }
         )
@@ -0,0 +1,176 @@
+"""
+Compact text form of a CRM state for the evaluator prompt.
+
+Every record is one line, `contacts#101 email=jane@example.com firstname=Jane -> companies#7 deals#12`,
+with null properties, timestamps and other metadata left out. Records are grouped by
+object type and sorted by id, so the same state always renders the same text. The output
+is kept under a token budget: records touched by the agent's tool calls go in first,
+then records associated with them, then the rest, taking from each type in turn; dropped
+records are counted per type.
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from .shared import CrmState
+
+DEFAULT_CRM_BUDGET_TOKENS = 8000
+CHARS_PER_TOKEN = 3 # conservative estimate, ids and emails tokenize poorly
+MAX_VALUE_CHARS = 300
+
+OBJECT_TYPES = ["contacts", "companies", "deals", "emails", "notes", "calls", "meetings", "tasks"]
+OMITTED_PROPERTIES = {"hs_object_id", "createdate", "hs_createdate", "lastmodifieddate", "hs_lastmodifieddate"}
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def state_records(crm_state: CrmState) -> Dict[str, List[Dict[str, Any]]]:
+    engagements = crm_state.engagements
+    return {
+        "contacts": crm_state.contacts,
+        "companies": crm_state.companies,
+        "deals": crm_state.deals,
+        "emails": engagements.emails,
+        "notes": engagements.notes,
+        "calls": engagements.calls,
+        "meetings": engagements.meetings,
+        "tasks": engagements.tasks,
+    }
+
+def id_sort_key(record_id: str) -> Tuple[int, Any]:
+    return (0, int(record_id)) if record_id.isdigit() else (1, record_id)
+
+def render_value(value: Any) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    if len(value) > MAX_VALUE_CHARS:
+        value = value[:MAX_VALUE_CHARS] + "…"
+    if not value or re.search(r"[\s=\"]", value):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+def associated_ids(record: Dict[str, Any]) -> Dict[str, List[str]]:
+    linked = {}
+    for to_type, association in sorted((record.get("associations") or {}).items()):
+        ids = {str(item["id"]) for item in association.get("results", [])}
+        if ids:
+            linked[to_type] = sorted(ids, key=id_sort_key)
+    return linked
+
+def render_record(object_type: str, record: Dict[str, Any]) -> str:
+    parts = [f"{object_type}#{record['id']}"]
+    for name, value in sorted((record.get("properties") or {}).items()):
+        if value is None or value == "" or name in OMITTED_PROPERTIES:
+            continue
+        parts.append(f"{name}={render_value(value)}")
+    linked = associated_ids(record)
+    if linked:
+        parts.append("->")
+        parts.extend(f"{to_type}#{','.join(ids)}" for to_type, ids in linked.items())
+    return " ".join(parts)
+
+ID_KEY = re.compile(r"(^|_)ids?$|Ids?$") # id, ids, contact_id, hs_object_id, toObjectId, ...
+
+def is_record_id(value: Any) -> bool:
+    return (isinstance(value, int) and not isinstance(value, bool)) or (isinstance(value, str) and value.isdigit())
+
+def collect_ids(value: Any, ids: Set[str], depth: int = 0):
+    if isinstance(value, str):
+        # tool arguments and responses are JSON, sometimes encoded twice
+        if depth < 3 and value.lstrip()[:1] in ("{", "[", '"'):
+            try:
+                collect_ids(json.loads(value), ids, depth + 1)
+            except json.JSONDecodeError:
+                pass
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if ID_KEY.search(str(key)):
+                for candidate in item if isinstance(item, list) else [item]:
+                    if is_record_id(candidate):
+                        ids.add(str(candidate))
+            collect_ids(item, ids, depth)
+    elif isinstance(value, list):
+        for item in value:
+            collect_ids(item, ids, depth)
+
+def touched_ids(tool_calls: Iterable[Any]) -> Set[str]:
+    """
+    Record ids in the `id`, `ids` and `*_id` fields of the tool calls' arguments and
+    responses, e.g. `contact_id` or `results[].id`. Other numbers, like phone numbers,
+    amounts or dates, aren't ids.
+    """
+    ids: Set[str] = set()
+    for item in tool_calls:
+        collect_ids(item, ids)
+    return ids
+
+def render_crm_state(
+    crm_state: Optional[CrmState],
+    *,
+    budget_tokens: int = DEFAULT_CRM_BUDGET_TOKENS,
+    touched: Optional[Set[str]] = None,
+) -> str:
+    if crm_state is None:
+        return "null"
+    touched = touched or set()
+    records = state_records(crm_state)
+
+    # priority 0 - touched by tool calls, 1 - associated with a touched record, 2 - the rest
+    linked_to_touched: Set[Tuple[str, str]] = set()
+    for object_type in OBJECT_TYPES:
+        for record in records[object_type]:
+            if str(record["id"]) in touched:
+                for to_type, ids in associated_ids(record).items():
+                    linked_to_touched.update((to_type, i) for i in ids)
+
+    # within a priority take records from every type in turn, so one large type can't crowd out the others
+    candidates = []
+    for type_ix, object_type in enumerate(OBJECT_TYPES):
+        ranks = {0: 0, 1: 0, 2: 0}
+        for record in sorted(records[object_type], key=lambda r: id_sort_key(str(r["id"]))):
+            record_id = str(record["id"])
+            if record_id in touched:
+                priority = 0
+            elif (object_type, record_id) in linked_to_touched:
+                priority = 1
+            else:
+                priority = 2
+            candidates.append((priority, ranks[priority], type_ix, id_sort_key(record_id), object_type, record))
+            ranks[priority] += 1
+    candidates.sort(key=lambda c: c[:3])
+
+    # reserve room for the omission notes
+    remaining = budget_tokens - estimate_tokens("... 000000 more records omitted") * len(OBJECT_TYPES)
+    kept: Dict[str, List[Tuple[Any, str]]] = {object_type: [] for object_type in OBJECT_TYPES}
+    omitted: Dict[str, int] = {object_type: 0 for object_type in OBJECT_TYPES}
+    for _, _, _, sort_key, object_type, record in candidates:
+        line = render_record(object_type, record)
+        cost = estimate_tokens(line)
+        if cost <= remaining:
+            kept[object_type].append((sort_key, line))
+            remaining -= cost
+        else:
+            omitted[object_type] += 1
+
+    lines = []
+    for object_type in OBJECT_TYPES:
+        lines.extend(line for _, line in sorted(kept[object_type]))
+        if omitted[object_type]:
+            lines.append(f"... {omitted[object_type]} more {object_type} omitted")
+    return "\n".join(lines) if lines else "(empty)"
+
+def render_tool_calls(tool_calls: List[Dict[str, Any]]) -> str:
+    """
+    One line per tool call, `name {"arg":...}`.
+    """
+    lines = []
+    for tool_call in tool_calls:
+        function = tool_call.get("function") or {}
+        arguments = function.get("arguments")
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments)
+            except json.JSONDecodeError:
+                pass
+        lines.append(f"{function.get('name')} {json.dumps(arguments, sort_keys=True, separators=(',', ':'), ensure_ascii=False)}")
+    return "\n".join(lines)
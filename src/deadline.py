@@ -0,0 +1,123 @@
+"""
+Per-trial deadlines.
+
+A trial runs inside `deadline_scope(Deadline(seconds))`. Code that talks to the network
+asks `request_timeout()` for its timeout, which is the per-request default capped by
+the time left in the trial, and raises `TrialTimeout` once nothing is left. Without an
+active deadline requests still get the default timeout, so a hung connection can't
+stall a sweep.
+
+Tool calls abandoned at a deadline keep running in the background and could write into
+the CRM after the next trial's reset, so `drain_abandoned` waits for them first.
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional
+from .profiler import inherit_stage
+
+DEFAULT_REQUEST_TIMEOUT = 30.0
+DEFAULT_LLM_TIMEOUT = 120.0
+ABANDONED_WAIT_SECONDS = 2 * DEFAULT_REQUEST_TIMEOUT
+
+class TrialTimeout(Exception):
+    pass
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self):
+        if self.expired():
+            raise TrialTimeout(f"Trial exceeded its deadline of {self.seconds}s")
+
+_current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("current_deadline", default=None)
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]):
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+def check_deadline():
+    deadline = current_deadline()
+    if deadline:
+        deadline.check()
+
+def request_timeout(default: float = DEFAULT_REQUEST_TIMEOUT) -> float:
+    """
+    Timeout for the next blocking call, never longer than what's left of the trial.
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return default
+    deadline.check()
+    return min(default, deadline.remaining())
+
+def is_deadline_timeout(error: BaseException) -> bool:
+    """
+    True for `TrialTimeout`, and for timeouts of HTTP or LLM calls whose timeout was cut
+    short by the trial deadline.
+    """
+    if isinstance(error, TrialTimeout):
+        return True
+    deadline = current_deadline()
+    is_timeout = isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+    return is_timeout and deadline is not None and deadline.expired()
+
+_executor = ThreadPoolExecutor(thread_name_prefix="deadline")
+_abandoned: List[Future] = []
+_abandoned_lock = threading.Lock()
+
+def call_with_deadline(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Runs `fn` and gives up waiting for it when the trial deadline passes. Used for calls
+    into SDKs that don't take a timeout; the abandoned call finishes in the background.
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return fn(*args, **kwargs)
+    deadline.check()
+    context = contextvars.copy_context()
+    future = _executor.submit(context.run, inherit_stage, fn, *args, **kwargs)
+    try:
+        return future.result(timeout=deadline.remaining())
+    except FutureTimeoutError:
+        with _abandoned_lock:
+            _abandoned.append(future)
+        raise TrialTimeout(f"Trial exceeded its deadline of {deadline.seconds}s")
+
+def drain_abandoned(timeout: float = ABANDONED_WAIT_SECONDS) -> int:
+    """
+    Waits up to `timeout` for the calls abandoned at earlier deadlines, returns how many
+    are still running.
+    """
+    with _abandoned_lock:
+        _abandoned[:] = [future for future in _abandoned if not future.done()]
+        pending = list(_abandoned)
+    if not pending:
+        return 0
+    print(f"⏳ Waiting for {len(pending)} tool calls abandoned at a deadline")
+    wait(pending, timeout=timeout)
+    with _abandoned_lock:
+        _abandoned[:] = [future for future in _abandoned if not future.done()]
+        return len(_abandoned)
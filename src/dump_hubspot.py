@@ -1,6 +1,8 @@
 import os
+from typing import Any, Dict, List, Optional, Set
 import requests
-from .shared import CrmState, CrmStateEngagements
+from .deadline import is_deadline_timeout, request_timeout
+from .shared import CrmScope, CrmState, CrmStateEngagements
 
 # 🔧 CONFIGURATION
 HUBSPOT_API_KEY = os.getenv("HUBSPOT_API_KEY")
@@ -10,7 +12,10 @@ HEADERS = {
 }
 BASE_URL = "https://api.hubapi.com"
 
-properties_map = {
+OBJECT_TYPES = ["contacts", "companies", "deals", "emails", "notes", "calls", "meetings", "tasks"]
+
+# dumped when property discovery fails
+fallback_properties_map = {
     "contacts": ["email", "firstname", "lastname", "phone", "lifecyclestage", "hs_lead_status"],
     "companies": ["name", "domain", "industry", "numberofemployees", "annualrevenue"],
     "deals": [
@@ -18,69 +23,157 @@ properties_map = {
         "createdate", "hs_forecast_amount", "hs_projected_amount_in_home_currency", 
         "hs_deal_stage_probability", "hs_closed_amount_in_home_currency"
     ],
-    "emails": ["hs_email_direction", "hs_email_status", "hs_email_subject", "hs_email_from", "hs_email_to"],
+    "emails": ["hs_email_direction", "hs_email_status", "hs_email_subject", "hs_email_text", "hs_email_from", "hs_email_to"],
     "notes": ["hs_note_body", "hs_createdate", "hs_lastmodifieddate"],
-    "calls": ["hs_call_status", "hs_call_duration", "hs_call_start_time", "hs_call_end_time", "hs_call_direction"],
-    "meetings": ["hs_meeting_title", "hs_meeting_start_time", "hs_meeting_end_time", "hs_meeting_outcome"],
-    "tasks": ["hs_task_status", "hs_body_preview", "hs_task_priority", "hs_task_due_date", "hs_task_assigned_to"],
+    "calls": ["hs_call_title", "hs_call_body", "hs_call_status", "hs_call_duration", "hs_call_start_time", "hs_call_end_time", "hs_call_direction"],
+    "meetings": ["hs_meeting_title", "hs_meeting_body", "hs_meeting_start_time", "hs_meeting_end_time", "hs_meeting_outcome"],
+    "tasks": ["hs_task_subject", "hs_task_status", "hs_body_preview", "hs_task_priority", "hs_task_due_date", "hs_task_assigned_to"],
 }
 
+# a portal's writable form fields run into the hundreds per type
+MAX_DEFAULT_PROPERTIES = 50
+
 associations_map = {
     "contacts": ["deals", "companies"],
     "companies": ["contacts", "deals"],
     "deals": ["contacts", "companies"],
 }
 
-def dump_hubspot():
+_mirror = None
+
+def use_change_feed(mirror):
     """
-    Dumps the current state of HubSpot data into list of HubSpotState class
+    Serve dumps from `mirror` (see src/change_feed.py), or fetch everything again when None.
     """
+    global _mirror
+    _mirror = mirror
 
-    # Get all contacts
-    contacts = get_all_objects("contacts")
-    # Get all companies
-    companies = get_all_objects("companies")
-    # Get all deals
-    deals = get_all_objects("deals")
-    # Get all engagements
-    engagements = CrmStateEngagements(
-        emails=get_all_objects("emails"),
-        notes=get_all_objects("notes"),
-        calls=get_all_objects("calls"),
-        meetings=get_all_objects("meetings"),
-        tasks=get_all_objects("tasks"),
-    )
+def seed_change_feed(reset: Dict[str, Any]):
+    """
+    Starts the change feed mirror from the records `reset_hubspot` created, when there is one.
+    """
+    if _mirror is not None:
+        _mirror.seed(reset)
+
+def dump_hubspot(scope: Optional[CrmScope] = None, touched: Optional[Set[str]] = None):
+    """
+    Dumps the current state of HubSpot data into list of HubSpotState class.
+
+    With `scope`, only the object types it lists are fetched, with the listed properties,
+    or with the type's default properties when the list is empty. Other types are left empty.
+    `touched` ids of records the trial wrote are read again by the change feed mirror,
+    a full dump already reads everything.
+    """
+    if _mirror is not None:
+        return _mirror.dump(scope, touched)
+    if scope is None:
+        scope = {object_type: [] for object_type in OBJECT_TYPES}
+    for object_type in scope:
+        if object_type not in OBJECT_TYPES:
+            print(f"Unknown object type {object_type} in CRM scope, skipping")
+
+    objects = {
+        object_type: get_all_objects(object_type, scope_properties(object_type, scope[object_type])) if object_type in scope else []
+        for object_type in OBJECT_TYPES
+    }
 
     hubspot_state = CrmState(
-        contacts=contacts,
-        companies=companies,
-        deals=deals,
-        engagements=engagements,
+        contacts=objects["contacts"],
+        companies=objects["companies"],
+        deals=objects["deals"],
+        engagements=CrmStateEngagements(
+            emails=objects["emails"],
+            notes=objects["notes"],
+            calls=objects["calls"],
+            meetings=objects["meetings"],
+            tasks=objects["tasks"],
+        ),
     )
 
     return hubspot_state
 
+_properties_cache: Dict[str, List[Dict[str, Any]]] = {}
+
+def discover_properties(object_type: str) -> List[Dict[str, Any]]:
+    """
+    Property definitions of the object type, fetched once per process
+    """
+    if object_type not in _properties_cache:
+        try:
+            definitions = get(f"/crm/v3/properties/{object_type}").get("results", [])
+        except requests.RequestException as e:
+            if is_deadline_timeout(e):
+                raise
+            # the fallback properties still give a usable dump
+            return []
+        if not definitions:
+            # don't cache failures
+            return []
+        _properties_cache[object_type] = definitions
+    return _properties_cache[object_type]
+
+def clear_properties_cache():
+    _properties_cache.clear()
+
+def default_properties(object_type: str) -> List[str]:
+    """
+    Properties dumped for types a task scopes without naming properties: the discovered
+    ones a user or the agent can set, i.e. not hidden, calculated or read-only and shown
+    on record forms or custom. Custom ones come first, then HubSpot's form order, at
+    most `MAX_DEFAULT_PROPERTIES`.
+    """
+    definitions = discover_properties(object_type)
+    if not definitions:
+        return list(fallback_properties_map.get(object_type, []))
+    writable = [
+        definition for definition in definitions
+        if not definition.get("hidden")
+        and not definition.get("calculated")
+        and not (definition.get("modificationMetadata") or {}).get("readOnlyValue")
+        and (definition.get("formField") or not definition.get("hubspotDefined"))
+    ]
+    writable.sort(key=lambda definition: (
+        bool(definition.get("hubspotDefined")),
+        # -1 is HubSpot's "no position"
+        definition.get("displayOrder", -1) if definition.get("displayOrder", -1) >= 0 else float("inf"),
+        definition["name"],
+    ))
+    return sorted(definition["name"] for definition in writable[:MAX_DEFAULT_PROPERTIES])
+
+_warned_properties = set()
+
+def scope_properties(object_type: str, properties: List[str]) -> List[str]:
+    if not properties:
+        return default_properties(object_type)
+    known = {definition["name"] for definition in discover_properties(object_type)}
+    unknown = [name for name in properties if known and name not in known and (object_type, name) not in _warned_properties]
+    if unknown:
+        print(f"Properties {', '.join(unknown)} of {object_type} are not defined in HubSpot")
+        _warned_properties.update((object_type, name) for name in unknown)
+    return properties
+
 def get(endpoint, params=None):
     """
-    Perform a GET request to the HubSpot API and handle errors.
+    Perform a GET request to the HubSpot API and raise its errors, a dump cut short must
+    not pass for an empty CRM.
     """
     url = f"{BASE_URL}{endpoint}"
     try:
-        response = requests.get(url, headers=HEADERS, params=params)
+        response = requests.get(url, headers=HEADERS, params=params, timeout=request_timeout())
         response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
         print(f"Error fetching data from {endpoint}: {e}")
-        return {}
+        raise
 
-def get_all_objects(object_type):
+def get_all_objects(object_type, properties=None):
     """
     Get all objects for the given object type
     """
     endpoint = f"/crm/v3/objects/{object_type}"
     objects = []
     after = None
-    properties = properties_map.get(object_type, [])
+    properties = properties if properties is not None else default_properties(object_type)
     associations = associations_map.get(object_type, [])
     while True:
         params = {
@@ -1,18 +1,45 @@
+import contextvars
 import json
-from litellm import completion
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 from pydantic import ValidationError
+from .crm_render import DEFAULT_CRM_BUDGET_TOKENS, render_crm_state, render_tool_calls, touched_ids
+from .budget import meter_usage
+from .deadline import DEFAULT_LLM_TIMEOUT, request_timeout
+from .profiler import inherit_stage
 from .shared import SolveResult, Model, Verdict
+from .usage import step_usage
 
 class Evaluator:
+    def __init__(self, *, model: Model = Model.GPT_4o, crm_budget_tokens: int = DEFAULT_CRM_BUDGET_TOKENS, temperature: float = 0):
+        self.model = model
+        self.crm_budget_tokens = crm_budget_tokens
+        self.temperature = temperature
+
+    def config(self) -> Dict[str, Any]:
+        return {"model": self.model.value, "crm_budget_tokens": self.crm_budget_tokens, "temperature": self.temperature}
+
+    def decide(self, result: SolveResult) -> Tuple[Verdict, Dict[str, Any]]:
+        verdict = self.eval(result)
+        return verdict, {"tier": "single", "model": self.model.value, "escalated": False}
+
     def eval(self, result: SolveResult) -> Verdict:
         outcome = result.task.outcome
-        crm_state = result.crm_state.model_dump_json(indent=2) if result.crm_state else "null"
         tool_calls = []
+        tool_responses = []
         for message in result.messages:
             if message['role'] == "assistant" and message['tool_calls']:
                 for tool_call in message['tool_calls']:
                     tool_calls.append(tool_call)
-        tool_calls = json.dumps(tool_calls, indent=2)
+            elif message['role'] == "tool":
+                tool_responses.append(message['content'])
+        crm_state = render_crm_state(
+            result.crm_state,
+            budget_tokens=self.crm_budget_tokens,
+            touched=touched_ids([*tool_calls, *tool_responses]),
+        )
+        tool_calls = render_tool_calls(tool_calls)
         final_response = result.messages[-1]['content']
 
         messages = [
@@ -22,6 +49,7 @@ class Evaluator:
                     "You are an evaluator."
                     "Based on the provided CRM STATE and OUTCOME DEFINITION, decide if the outcome is met.",
                     "CRM STATE has highest priority.",
+                    "CRM STATE lists one record per line as `type#id property=value ... -> associated_type#id,id`, records not relevant to the task may be omitted.",
                     "TOOL CALLS contains actions made to reach CRM STATE." 
                     "Use FINAL RESPONSE and TOOL CALLS to help to decide when not certain from CRM STATE.",
                 ])
@@ -41,12 +69,15 @@ class Evaluator:
             }
         ]
 
+        from litellm import completion
         response = completion(
-            model=Model.GPT_4o,
+            model=self.model,
             messages=messages,
-            temperature=0,
-            response_format=Verdict
+            temperature=self.temperature,
+            response_format=Verdict,
+            timeout=request_timeout(DEFAULT_LLM_TIMEOUT)
         )
+        meter_usage(step_usage(response, self.model.value), role="judge")
         
         try:
             result = response.choices[0].message.content
@@ -54,7 +85,101 @@ class Evaluator:
             return verdict
         except ValidationError as e:
             print(f"Error validating response: {e}")
-            return Verdict(reasoning="Error validating response", verdict=False, confidence=1.0)
+            return Verdict(reasoning="Error validating response", verdict=False, confidence=0.0)
         except Exception as e:
             print(f"Error: {e}")
-            return Verdict(reasoning="Error during evaluation", verdict=False, confidence=1.0)
+            return Verdict(reasoning="Error during evaluation", verdict=False, confidence=0.0)
+
+def verdict_summary(model: Model, verdict: Verdict) -> Dict[str, Any]:
+    return {"model": model.value, "verdict": verdict.verdict, "confidence": verdict.confidence}
+
+class CascadingEvaluator:
+    """
+    Judges with a cheap model first and accepts its verdict when its confidence is at
+    least `min_confidence`. Less confident verdicts are escalated:
+
+    - `strong`: the strong model decides
+    - `vote`: `votes` cheap samples at `vote_temperature` run in parallel and the majority
+      decides, the strong model breaks ties
+
+    `audit_rate` is the fraction of accepted cheap verdicts that are also checked by the
+    strong model, without changing the outcome, so agreement is measured on confident
+    verdicts too. `decide` returns the verdict with a record of which tier decided.
+    """
+
+    def __init__(
+        self,
+        *,
+        cheap_model: Model = Model.GPT_4o_MINI,
+        strong_model: Model = Model.GPT_4o,
+        min_confidence: float = 0.8,
+        escalation: str = "strong",
+        votes: int = 3,
+        vote_temperature: float = 0.7,
+        audit_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        if escalation not in ("strong", "vote"):
+            raise ValueError(f"Unknown escalation {escalation}, expected strong or vote")
+        self.cheap = Evaluator(model=cheap_model)
+        self.strong = Evaluator(model=strong_model)
+        self.voter = Evaluator(model=cheap_model, temperature=vote_temperature)
+        self.min_confidence = min_confidence
+        self.escalation = escalation
+        self.votes = votes
+        self.audit_rate = audit_rate
+        self.random = random.Random(seed)
+
+    def config(self) -> Dict[str, Any]:
+        return {
+            "cheap": self.cheap.config(),
+            "strong": self.strong.config(),
+            "voter": self.voter.config(),
+            "min_confidence": self.min_confidence,
+            "escalation": self.escalation,
+            "votes": self.votes,
+            "audit_rate": self.audit_rate,
+        }
+
+    def eval(self, result: SolveResult) -> Verdict:
+        return self.decide(result)[0]
+
+    def decide(self, result: SolveResult) -> Tuple[Verdict, Dict[str, Any]]:
+        cheap_verdict = self.cheap.eval(result)
+        info: Dict[str, Any] = {"verdicts": [verdict_summary(self.cheap.model, cheap_verdict)]}
+
+        if cheap_verdict.confidence >= self.min_confidence:
+            info.update(tier="cheap", model=self.cheap.model.value, escalated=False)
+            if self.random.random() < self.audit_rate:
+                strong_verdict = self.strong.eval(result)
+                info["verdicts"].append(verdict_summary(self.strong.model, strong_verdict))
+                info["audited"] = True
+                info["agreement"] = strong_verdict.verdict == cheap_verdict.verdict
+            return cheap_verdict, info
+
+        if self.escalation == "vote":
+            votes = self.sample_votes(result)
+            info["verdicts"].extend(verdict_summary(self.voter.model, vote) for vote in votes)
+            passed = sum(1 for vote in votes if vote.verdict)
+            failed = len(votes) - passed
+            if passed != failed:
+                majority = passed > failed
+                verdict = max((vote for vote in votes if vote.verdict == majority), key=lambda vote: vote.confidence)
+                info.update(tier="vote", model=self.voter.model.value, escalated=True, agreement=majority == cheap_verdict.verdict)
+                return verdict, info
+
+        strong_verdict = self.strong.eval(result)
+        info["verdicts"].append(verdict_summary(self.strong.model, strong_verdict))
+        info.update(tier="strong", model=self.strong.model.value, escalated=True, agreement=strong_verdict.verdict == cheap_verdict.verdict)
+        return strong_verdict, info
+
+    def sample_votes(self, result: SolveResult) -> List[Verdict]:
+        with ThreadPoolExecutor(max_workers=self.votes, thread_name_prefix="judge-vote") as executor:
+            # copy the context for each vote, so the trial deadline applies to them
+            futures = [
+                executor.submit(contextvars.copy_context().run, inherit_stage, self.voter.eval, result)
+                for _ in range(self.votes)
+            ]
+            return [future.result() for future in futures]
+
+type Judge = Evaluator | CascadingEvaluator
@@ -0,0 +1,375 @@
+"""
+In-memory stand-in for the parts of the HubSpot CRM API the harness and toolsets use.
+
+`FakeHubSpot.patch()` mounts the fake as the transport adapter for HubSpot URLs in every
+`requests` session, so reset, dump and toolset handlers run offline and at any data
+scale, while the send hooks of src/http_hooks.py (metrics, fault injection) still apply.
+"""
+
+import calendar
+import json
+import re
+import time
+from contextlib import contextmanager
+from email.utils import formatdate
+from itertools import count
+from typing import Any, Dict, List, Optional, Tuple
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+BASE_URL = "https://api.hubapi.com"
+
+OBJECT_TYPES = ["contacts", "companies", "deals", "emails", "notes", "calls", "meetings", "tasks"]
+# query parameters HubSpot reads as lists, repeated or comma-separated
+LIST_PARAMS = {"properties", "associations"}
+SYSTEM_PROPERTIES = {"createdate", "hs_lastmodifieddate", "lastmodifieddate", "hs_object_id"}
+# contacts keep their modification time in a property of their own
+MODIFIED_PROPERTIES = {"contacts": "lastmodifieddate"}
+# defined in every portal, on top of the properties found in stored records
+STANDARD_PROPERTIES = {
+    "contacts": ["email", "firstname", "lastname", "phone", "company", "jobtitle", "lifecyclestage", "hs_lead_status"],
+    "companies": ["name", "domain", "industry", "numberofemployees", "annualrevenue", "lifecyclestage"],
+    "deals": ["dealname", "amount", "dealstage", "pipeline", "closedate"],
+    "emails": ["hs_email_direction", "hs_email_status", "hs_email_subject", "hs_email_text", "hs_timestamp"],
+    "notes": ["hs_note_body", "hs_timestamp"],
+    "calls": ["hs_call_title", "hs_call_body", "hs_call_status", "hs_call_duration", "hs_call_direction", "hs_timestamp"],
+    "meetings": ["hs_meeting_title", "hs_meeting_body", "hs_meeting_start_time", "hs_meeting_end_time", "hs_meeting_outcome", "hs_timestamp"],
+    "tasks": ["hs_task_subject", "hs_task_body", "hs_task_status", "hs_task_priority", "hs_timestamp"],
+}
+
+def comparable(value: Any) -> Any:
+    """
+    Numbers and dates compare as numbers, dates as milliseconds since epoch like in HubSpot filters.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return calendar.timegm(time.strptime(str(value)[:19], "%Y-%m-%dT%H:%M:%S")) * 1000.0
+    except ValueError:
+        return str(value)
+
+class FakeResponse:
+    def __init__(self, status_code: int, payload: Any = None, headers: Optional[Dict[str, str]] = None, text: Optional[str] = None):
+        self.status_code = status_code
+        self.payload = payload
+        self.headers = headers or {}
+        self._text = text
+        self.ok = status_code < 400
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(self.payload) if self.payload is not None else ""
+        return self._text
+
+    def json(self):
+        if self.payload is None:
+            return json.loads(self.text) if self.text else {}
+        return self.payload
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error for fake HubSpot", response=self)
+
+class FakeAdapter(BaseAdapter):
+    def __init__(self, hubspot: "FakeHubSpot"):
+        super().__init__()
+        self.hubspot = hubspot
+
+    def send(self, request, **kwargs) -> requests.Response:
+        url = urlparse(request.url)
+        params: Dict[str, Any] = {}
+        for name, values in parse_qs(url.query).items():
+            if name in LIST_PARAMS:
+                params[name] = [item for value in values for item in value.split(",")]
+            else:
+                params[name] = values[-1]
+        body = request.body
+        if isinstance(body, bytes):
+            body = body.decode()
+        fake = self.hubspot.request(request.method, request.url.split("?", 1)[0], params=params, json=json.loads(body) if body else None)
+
+        response = requests.Response()
+        response.status_code = fake.status_code
+        response.headers = CaseInsensitiveDict({"Content-Type": "application/json", "Date": formatdate(usegmt=True), **fake.headers})
+        response._content = fake.text.encode()
+        response.url = request.url
+        response.request = request
+        response.reason = "OK" if fake.ok else "Error"
+        response.encoding = "utf-8"
+        return response
+
+    def close(self):
+        pass
+
+class FakeHubSpot:
+    def __init__(self):
+        self.objects: Dict[str, Dict[str, Dict[str, Any]]] = {object_type: {} for object_type in OBJECT_TYPES}
+        self.ids = count(1)
+        self.requests_count: Dict[Tuple[str, str], int] = {}
+
+    # === Data ===
+
+    def add(self, object_type: str, properties: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+        record = {
+            "id": str(next(self.ids)),
+            "properties": {
+                **properties,
+                "createdate": now,
+                MODIFIED_PROPERTIES.get(object_type, "hs_lastmodifieddate"): now,
+            },
+            "createdAt": now,
+            "updatedAt": now,
+            "archived": False,
+            "associations": {},
+        }
+        self.objects.setdefault(object_type, {})[record["id"]] = record
+        return record
+
+    def seed(self, size: int, object_types: Optional[List[str]] = None):
+        """
+        Adds `size` records of every object type, e.g. for benchmarks at different scales.
+        """
+        for object_type in object_types or OBJECT_TYPES:
+            for i in range(size):
+                self.add(object_type, {"name": f"{object_type} {i}", "email": f"{object_type}_{i}@example.com"})
+
+    def touch(self, object_type: str, record: Dict[str, Any]):
+        now = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+        record["properties"][MODIFIED_PROPERTIES.get(object_type, "hs_lastmodifieddate")] = now
+        record["updatedAt"] = now
+
+    def associate(self, from_type: str, from_id: str, to_type: str, to_id: str):
+        # like HubSpot, changing associations updates the association counts and so the modification time
+        for a_type, a_id, b_type, b_id in [(from_type, from_id, to_type, to_id), (to_type, to_id, from_type, from_id)]:
+            record = self.objects.get(a_type, {}).get(a_id)
+            if record is not None:
+                record["associations"].setdefault(b_type, set()).add(b_id)
+                self.touch(a_type, record)
+
+    def count(self, object_type: str) -> int:
+        return len(self.objects.get(object_type, {}))
+
+    def serialize(self, object_type: str, record: Dict[str, Any], properties: Optional[List[str]] = None, associations: Optional[List[str]] = None) -> Dict[str, Any]:
+        result = {key: value for key, value in record.items() if key != "associations"}
+        if properties:
+            # like HubSpot, the system properties come back whether asked for or not
+            result["properties"] = {
+                **{name: value for name, value in record["properties"].items() if name in SYSTEM_PROPERTIES},
+                "hs_object_id": record["id"],
+                **{name: record["properties"].get(name) for name in properties},
+            }
+        if associations:
+            linked = {}
+            for to_type in associations:
+                ids = sorted(record["associations"].get(to_type, set()))
+                if ids:
+                    linked[to_type] = {"results": [{"id": i, "type": f"{object_type[:-1]}_to_{to_type[:-1]}"} for i in ids]}
+            if linked:
+                result["associations"] = linked
+        return result
+
+    # === HTTP ===
+
+    def request(self, method: str, url: str, *, params: Optional[Dict[str, Any]] = None, json: Any = None, **kwargs) -> FakeResponse:
+        method = method.upper()
+        path = urlparse(url).path
+        key = (method, re.sub(r"/\d+", "/{id}", path))
+        self.requests_count[key] = self.requests_count.get(key, 0) + 1
+        return self.route(method, path, params or {}, json)
+
+    def total_requests(self) -> int:
+        return sum(self.requests_count.values())
+
+    @contextmanager
+    def patch(self):
+        """
+        Serves requests to HubSpot URLs from this fake.
+        """
+        adapter = FakeAdapter(self)
+        get_adapter = requests.Session.get_adapter
+
+        def get_fake_adapter(session, url):
+            return adapter if url.startswith(BASE_URL) else get_adapter(session, url)
+
+        with mock.patch.object(requests.Session, "get_adapter", get_fake_adapter):
+            yield self
+
+    def route(self, method: str, path: str, params: Dict[str, Any], body: Any) -> FakeResponse:
+        parts = [part for part in path.split("/") if part]
+
+        # /crm/v3/properties/{type}
+        if parts[:3] == ["crm", "v3", "properties"] and len(parts) == 4 and method == "GET":
+            return FakeResponse(200, {"results": self.list_properties(parts[3])})
+
+        # /crm/v3/objects/{type}/...
+        if parts[:3] == ["crm", "v3", "objects"] and len(parts) >= 4:
+            object_type, rest = parts[3], parts[4:]
+            if object_type not in self.objects:
+                return FakeResponse(400, {"status": "error", "message": f"Unknown object type {object_type}"})
+            store = self.objects[object_type]
+
+            if not rest and method == "GET":
+                return FakeResponse(200, self.list_objects(object_type, params))
+            if not rest and method == "POST":
+                return FakeResponse(201, self.serialize(object_type, self.add(object_type, (body or {}).get("properties", {}))))
+            if rest == ["search"] and method in ("POST", "GET"):
+                return FakeResponse(200, self.search(object_type, body or {}))
+            if rest == ["batch", "archive"] and method == "POST":
+                for item in (body or {}).get("inputs", []):
+                    self.archive(object_type, str(item["id"]))
+                return FakeResponse(204)
+            if rest == ["batch", "read"] and method == "POST":
+                properties = (body or {}).get("properties")
+                ids = [str(item["id"]) for item in (body or {}).get("inputs", [])]
+                found = [self.serialize(object_type, store[i], properties) for i in ids if i in store]
+                missing = [i for i in ids if i not in store]
+                payload = {"status": "COMPLETE", "results": found}
+                if missing:
+                    payload["errors"] = [{"status": "error", "category": "OBJECT_NOT_FOUND", "context": {"ids": missing}}]
+                return FakeResponse(207 if missing else 200, payload)
+            if rest == ["batch", "create"] and method == "POST":
+                created = [self.add(object_type, item.get("properties", {})) for item in (body or {}).get("inputs", [])]
+                return FakeResponse(201, {"status": "COMPLETE", "results": [self.serialize(object_type, r) for r in created]})
+            if len(rest) == 1:
+                record = store.get(rest[0])
+                if record is None:
+                    return FakeResponse(404, {"status": "error", "message": "Object not found"})
+                if method == "GET":
+                    return FakeResponse(200, self.serialize(object_type, record))
+                if method == "PATCH":
+                    record["properties"].update((body or {}).get("properties", {}))
+                    self.touch(object_type, record)
+                    return FakeResponse(200, self.serialize(object_type, record))
+                if method == "DELETE":
+                    self.archive(object_type, rest[0])
+                    return FakeResponse(204)
+            # /crm/v3/objects/{type}/{id}/associations/{to_type}/{to_id}/{association_type}
+            if len(rest) == 5 and rest[1] == "associations" and method == "PUT":
+                self.associate(object_type, rest[0], rest[2], rest[3])
+                return FakeResponse(200, {"id": rest[0]})
+
+        # /crm/v4/associations/{from_type}/{to_type}/batch/read
+        if parts[:3] == ["crm", "v4", "associations"] and parts[5:] == ["batch", "read"] and method == "POST":
+            return FakeResponse(200, self.read_associations(parts[3], parts[4], body or {}))
+
+        # /crm/v3/associations/{from_type}/{from_id}/to/{to_type}/{to_id}
+        if parts[:3] == ["crm", "v3", "associations"] and len(parts) == 8 and method == "PUT":
+            self.associate(parts[3], parts[4], parts[6], parts[7])
+            return FakeResponse(200, {})
+
+        return FakeResponse(404, {"status": "error", "message": f"Unknown route {method} {path}"})
+
+    def archive(self, object_type: str, object_id: str):
+        record = self.objects[object_type].pop(object_id, None)
+        if record is None:
+            return
+        for to_type, ids in record["associations"].items():
+            for to_id in ids:
+                linked = self.objects.get(to_type, {}).get(to_id)
+                if linked is not None:
+                    linked["associations"].get(object_type, set()).discard(object_id)
+                    self.touch(to_type, linked)
+
+    def read_associations(self, from_type: str, to_type: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        results = []
+        for item in body.get("inputs", []):
+            record = self.objects.get(from_type, {}).get(str(item["id"]))
+            ids = sorted(record["associations"].get(to_type, set()), key=int) if record else []
+            if ids:
+                results.append({
+                    "from": {"id": record["id"]},
+                    "to": [
+                        {"toObjectId": int(i), "associationTypes": [{"category": "HUBSPOT_DEFINED", "typeId": 1, "label": None}]}
+                        for i in ids
+                    ],
+                })
+        return {"status": "COMPLETE", "results": results}
+
+    def list_properties(self, object_type: str) -> List[Dict[str, Any]]:
+        names = sorted({
+            *STANDARD_PROPERTIES.get(object_type, []),
+            *SYSTEM_PROPERTIES,
+            *(name for record in self.objects.get(object_type, {}).values() for name in record["properties"]),
+        })
+        return [
+            {
+                "name": name,
+                "label": name,
+                "type": "string",
+                "groupName": f"{object_type[:-1]}information",
+                "hidden": False,
+                "calculated": False,
+                "formField": name not in SYSTEM_PROPERTIES,
+                "displayOrder": -1,
+                "hubspotDefined": True,
+                "modificationMetadata": {"archivable": True, "readOnlyDefinition": True, "readOnlyValue": name in SYSTEM_PROPERTIES},
+            }
+            for name in names
+        ]
+
+    def list_objects(self, object_type: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        limit = int(params.get("limit", 10))
+        after = int(params.get("after", 0) or 0)
+        records = list(self.objects[object_type].values())
+        page = records[after:after+limit]
+        data = {
+            "results": [
+                self.serialize(object_type, record, params.get("properties"), params.get("associations"))
+                for record in page
+            ]
+        }
+        if after + limit < len(records):
+            data["paging"] = {"next": {"after": str(after + limit)}}
+        return data
+
+    def search(self, object_type: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        def matches(record, flt) -> bool:
+            if flt.get("propertyName") == "hs_object_id":
+                actual = record["id"]
+            else:
+                actual = record["properties"].get(flt.get("propertyName"))
+            operator = flt.get("operator", "EQ")
+            if operator == "HAS_PROPERTY":
+                return actual is not None
+            if operator == "IN":
+                return str(actual) in [str(value) for value in flt.get("values", [])]
+            value = flt.get("value")
+            if actual is None:
+                return False
+            if operator == "EQ":
+                return str(actual).lower() == str(value).lower()
+            if operator == "NEQ":
+                return str(actual).lower() != str(value).lower()
+            if operator == "CONTAINS_TOKEN":
+                return str(value).strip("*").lower() in str(actual).lower()
+            if operator in ("GT", "GTE", "LT", "LTE"):
+                a, b = comparable(actual), comparable(value)
+                if type(a) is not type(b):
+                    a, b = str(actual), str(value)
+                return {"GT": a > b, "GTE": a >= b, "LT": a < b, "LTE": a <= b}[operator]
+            return False
+
+        groups = body.get("filterGroups") or []
+        query = str(body.get("query") or "").lower()
+        records = [
+            record for record in self.objects[object_type].values()
+            if (not groups or any(all(matches(record, flt) for flt in group.get("filters", [])) for group in groups))
+            and (not query or any(query in str(value).lower() for value in record["properties"].values()))
+        ]
+        limit = int(body.get("limit", 10))
+        after = int(body.get("after", 0) or 0)
+        page = records[after:after+limit]
+        data = {
+            "total": len(records),
+            "results": [self.serialize(object_type, record, body.get("properties")) for record in page],
+        }
+        if after + limit < len(records):
+            data["paging"] = {"next": {"after": str(after + limit)}}
+        return data
@@ -0,0 +1,232 @@
+"""
+Fault and latency injection for the agent's tool calls.
+
+A `FaultPlan` describes the adversity, e.g. `latency=lognormal:0.2:0.8,429=0.05,5xx=0.02`.
+`install_fault_injection` registers a send hook for HubSpot URLs, and the agent
+runs tools through `call_tool`; both only inject inside `fault_scope`, which run.py opens
+around the agent, so reset, dump and evaluation stay unaffected.
+
+Every decision is drawn from a generator seeded with the plan seed, the trial key and the
+number of the call within the trial, so the same trial sees the same faults on every run,
+whatever the order of other trials.
+"""
+
+import contextvars
+import hashlib
+import json
+import math
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional
+import requests
+from pydantic import BaseModel
+from requests.structures import CaseInsensitiveDict
+from .deadline import check_deadline, current_deadline
+from .http_hooks import FAULTS_ORDER, register_send_hook
+from .processing.pass_k import ROUND_TO_DECIMALS, ResultCounts, add_totals, feature_totals, register_counter
+
+HUBSPOT_URL = "https://api.hubapi.com"
+FAULT_COUNTS = ["http_429", "http_5xx", "truncated", "tool_errors"]
+
+class FaultPlan(BaseModel):
+    latency: str = "none" # HTTP latency: none, fixed:S, exp:MEAN or lognormal:MEDIAN:SIGMA, in seconds
+    rate_429: float = 0.0
+    retry_after: float = 1.0 # seconds in the Retry-After header of injected 429s
+    rate_5xx: float = 0.0
+    rate_truncate: float = 0.0 # responses cut off in the middle of the payload
+    tool_latency: str = "none" # added to every tool call, same format as latency
+    tool_error: float = 0.0 # tool calls answered with an error instead of running
+    seed: int = 0
+
+    @classmethod
+    def parse(cls, spec: str, *, seed: int = 0) -> "FaultPlan":
+        """
+        Parses `key=value,...` with keys latency, 429, retry_after, 5xx, truncate, tool_latency and tool_error.
+        """
+        aliases = {"429": "rate_429", "5xx": "rate_5xx", "truncate": "rate_truncate"}
+        values: Dict[str, Any] = {"seed": seed}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            key, _, value = item.partition("=")
+            key = aliases.get(key.strip(), key.strip())
+            if key not in cls.model_fields or key == "seed":
+                raise ValueError(f"Unknown fault {key}")
+            values[key] = value.strip()
+        plan = cls.model_validate(values)
+        for distribution in (plan.latency, plan.tool_latency):
+            sample_latency(distribution, random.Random(0))
+        return plan
+
+    def describe(self) -> str:
+        return ", ".join(f"{name}={value}" for name, value in self.model_dump().items() if value not in ("none", 0.0) and name != "seed")
+
+def sample_latency(distribution: str, rng: random.Random) -> float:
+    kind, *args = distribution.split(":")
+    try:
+        params = [float(arg) for arg in args]
+        if kind == "none":
+            return 0.0
+        if kind == "fixed":
+            return params[0]
+        if kind == "exp":
+            return rng.expovariate(1 / params[0])
+        if kind == "lognormal":
+            return rng.lognormvariate(math.log(params[0]), params[1])
+    except (ValueError, IndexError, ZeroDivisionError):
+        pass
+    raise ValueError(f"Invalid latency distribution {distribution}, expected none, fixed:S, exp:MEAN or lognormal:MEDIAN:SIGMA")
+
+class FaultState:
+    """
+    Faults injected into one trial
+    """
+
+    def __init__(self, plan: FaultPlan, key: str):
+        self.plan = plan
+        self.key = key
+        self.calls: Dict[str, int] = {}
+        self.counts: Dict[str, int] = {name: 0 for name in FAULT_COUNTS}
+        self.injected_seconds = 0.0
+        self.tool_call_seconds: List[float] = []
+
+    def rng(self, target: str) -> random.Random:
+        n = self.calls.get(target, 0)
+        self.calls[target] = n + 1
+        digest = hashlib.sha256(f"{self.plan.seed}:{self.key}:{target}:{n}".encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def delay(self, seconds: float):
+        if seconds <= 0:
+            return
+        deadline = current_deadline()
+        if deadline:
+            seconds = min(seconds, deadline.remaining())
+        self.injected_seconds += seconds
+        time.sleep(seconds)
+        check_deadline()
+
+    def info(self) -> Dict[str, Any]:
+        durations = sorted(self.tool_call_seconds)
+        def percentile(q: float) -> Optional[float]:
+            return round(durations[min(int(len(durations) * q), len(durations) - 1)], 4) if durations else None
+        return {
+            **self.counts,
+            "injected_seconds": round(self.injected_seconds, 3),
+            "tool_call_p50": percentile(0.5),
+            "tool_call_p95": percentile(0.95),
+            "tool_call_max": round(durations[-1], 4) if durations else None,
+        }
+
+_plan: Optional[FaultPlan] = None
+_state: contextvars.ContextVar[Optional[FaultState]] = contextvars.ContextVar("fault_state", default=None)
+
+def current_fault_plan() -> Optional[FaultPlan]:
+    return _plan
+
+def fault_scope(key: str):
+    """
+    Injects faults into the calls made inside, when injection is installed.
+    """
+    if _plan is None:
+        return nullcontext(None)
+    return _scope(FaultState(_plan, key))
+
+@contextmanager
+def _scope(state: FaultState):
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+def injected_response(request, status_code: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict({"Content-Type": "application/json", **(headers or {})})
+    response._content = json.dumps(payload).encode()
+    response.url = request.url
+    response.request = request
+    response.reason = "Injected fault"
+    response.encoding = "utf-8"
+    return response
+
+def install_fault_injection(plan: FaultPlan):
+    global _plan
+    _plan = plan
+
+    def inject_faults(request, send, **kwargs):
+        state = _state.get()
+        if state is None or not request.url.startswith(HUBSPOT_URL):
+            return send(request, **kwargs)
+
+        rng = state.rng("http")
+        state.delay(sample_latency(state.plan.latency, rng))
+        roll = rng.random()
+        if roll < state.plan.rate_429:
+            state.counts["http_429"] += 1
+            return injected_response(
+                request, 429,
+                {"status": "error", "message": "You have reached your secondly limit.", "category": "RATE_LIMITS"},
+                {"Retry-After": f"{state.plan.retry_after:g}"},
+            )
+        if roll < state.plan.rate_429 + state.plan.rate_5xx:
+            state.counts["http_5xx"] += 1
+            return injected_response(request, rng.choice([500, 502, 503, 504]), {"status": "error", "message": "Internal error"})
+
+        response = send(request, **kwargs)
+        if roll < state.plan.rate_429 + state.plan.rate_5xx + state.plan.rate_truncate and response.content:
+            state.counts["truncated"] += 1
+            response._content = response.content[:int(len(response.content) * rng.uniform(0.1, 0.9))]
+        return response
+
+    register_send_hook("faults", inject_faults, order=FAULTS_ORDER)
+
+def call_tool(tool, arguments: Any) -> Any:
+    """
+    Runs the tool with the injected latency and errors of the current scope, timing the call.
+    """
+    state = _state.get()
+    if state is None:
+        return tool.run(arguments)
+
+    started = time.monotonic()
+    try:
+        rng = state.rng(f"tool:{tool.name}")
+        state.delay(sample_latency(state.plan.tool_latency, rng))
+        if rng.random() < state.plan.tool_error:
+            state.counts["tool_errors"] += 1
+            return {"error": "Service temporarily unavailable, try again later"}
+        return tool.run(arguments)
+    finally:
+        state.tool_call_seconds.append(time.monotonic() - started)
+
+# === Results ===
+
+def count_faults(totals: Dict[str, int], passed: bool, faults: Dict[str, Any]):
+    add_totals(totals, trials=1, passed=1 if passed else 0, injected=sum(faults[name] for name in FAULT_COUNTS))
+    if faults.get("tool_call_p95") is not None:
+        totals["tool_call_p95_ms"] = max(totals.get("tool_call_p95_ms", 0), round(faults["tool_call_p95"] * 1000))
+        totals["tool_call_max_ms"] = max(totals.get("tool_call_max_ms", 0), round(faults["tool_call_max"] * 1000))
+
+register_counter("faults", count_faults)
+
+def fault_summary(counts: ResultCounts) -> Optional[Dict[str, float]]:
+    """
+    Pass rate and tool call tail latency of trials run with `--faults`, next to the pass rate of the other trials in the file.
+    """
+    totals = feature_totals(counts, "faults").values()
+    trials = sum(task_totals["trials"] for task_totals in totals)
+    if not trials:
+        return None
+    passed = sum(task_totals["passed"] for task_totals in totals)
+    clean_trials = sum(task_counts["n"] for task_counts in counts.values()) - trials
+    clean_passed = sum(task_counts["c"] for task_counts in counts.values()) - passed
+    return {
+        "trials": trials,
+        "pass_rate": round(passed / trials, ROUND_TO_DECIMALS),
+        "clean_trials": clean_trials,
+        "clean_pass_rate": round(clean_passed / clean_trials, ROUND_TO_DECIMALS) if clean_trials else None,
+        "faults_per_trial": round(sum(task_totals["injected"] for task_totals in totals) / trials, 2),
+        "worst_tool_call_p95_ms": max(task_totals.get("tool_call_p95_ms", 0) for task_totals in totals),
+        "worst_tool_call_max_ms": max(task_totals.get("tool_call_max_ms", 0) for task_totals in totals),
+    }
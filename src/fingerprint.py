@@ -0,0 +1,94 @@
+"""
+Input fingerprints of (toolset, task, model) cells, for regression runs.
+
+A cell's fingerprint hashes everything its trials depend on: the task's prompt, outcome
+and CRM scope from data/tasks.jsonl, the CRM fixtures the reset loads, the schemas of the
+toolset's tools and the tool retrieval setting, the agent instructions and the model, and
+the run settings that change results: the judge configuration, the fault plan, the tool
+cache, streaming and the trial timeout. Every evaluated trial records it in
+`info.fingerprint`.
+
+With `--changed-only` the previous results file of each toolset is the baseline: cells
+whose fingerprint has results there get them copied into the new results file instead of
+being run again, so processing still sees every cell and the new file is the baseline of
+the next run. Trials that errored, timed out or ran out of budget carry no fingerprint
+and are always run again.
+"""
+
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+from .crm_agent import CRMAgent, canonicalize
+from .evaluator import Evaluator, Judge
+from .fault_injection import current_fault_plan
+from .shared import Task
+from .tool_cache import tool_cache_installed
+
+FINGERPRINT_VERSION = 2
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
+FIXTURE_FILES = ["companies.jsonl", "contacts.jsonl", "deals.jsonl"]
+
+type Baseline = Dict[str, List[str]] # fingerprint -> result lines
+
+def digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(canonicalize(value), separators=(",", ":")).encode()).hexdigest()
+
+@lru_cache(maxsize=1)
+def fixtures_hash() -> str:
+    sha = hashlib.sha256()
+    for name in FIXTURE_FILES:
+        with open(os.path.join(DATA_DIR, name), "rb") as f:
+            sha.update(name.encode() + b"\0" + f.read() + b"\0")
+    return sha.hexdigest()
+
+def run_settings(agent: CRMAgent, judge: Optional[Judge], trial_timeout: Optional[float]) -> Dict[str, Any]:
+    plan = current_fault_plan()
+    return {
+        "judge": (judge or Evaluator()).config(),
+        "faults": plan.model_dump() if plan else None,
+        "tool_cache": tool_cache_installed(),
+        "stream": agent.stream,
+        "trial_timeout": trial_timeout,
+    }
+
+def cell_fingerprint(agent: CRMAgent, task: Task, *, judge: Optional[Judge] = None, trial_timeout: Optional[float] = None) -> str:
+    return digest({
+        "version": FINGERPRINT_VERSION,
+        "task": task.model_dump(),
+        "fixtures": fixtures_hash(),
+        "tools": digest({"schemas": agent.tool_schemas(), "top_k": agent.tool_top_k}),
+        "instructions": agent.instructions,
+        "model": agent.model.value,
+        "settings": run_settings(agent, judge, trial_timeout),
+    })
+
+def load_baseline(results_file: str) -> Baseline:
+    """
+    Result lines of a previous run by fingerprint, kept verbatim so blob references and
+    everything else carry over unchanged. Empty when the file doesn't exist.
+    """
+    baseline: Baseline = {}
+    if not os.path.exists(results_file):
+        return baseline
+    with open(results_file, "r") as f:
+        for line in f:
+            if not line.endswith("\n"):
+                # still being written by an interrupted run
+                break
+            if not line.strip():
+                continue
+            fingerprint = (json.loads(line).get("info") or {}).get("fingerprint")
+            if fingerprint:
+                baseline.setdefault(fingerprint, []).append(line)
+    return baseline
+
+def reuse_results(baseline: Baseline, agent: CRMAgent, task: Task, trials_count: int, *, judge: Optional[Judge] = None, trial_timeout: Optional[float] = None) -> List[str]:
+    """
+    Up to `trials_count` results of the cell from the baseline, when its inputs didn't change.
+    """
+    lines = baseline.get(cell_fingerprint(agent, task, judge=judge, trial_timeout=trial_timeout), [])[:trials_count]
+    if lines:
+        print(f"♻️ {agent.tools.name} / {task.name}: inputs unchanged, reusing {len(lines)} of {trials_count} trials")
+    return lines
@@ -0,0 +1,47 @@
+"""
+Hooks around every request sent through `requests`.
+
+Features that watch or change HTTP traffic, the sweep metrics and fault injection, don't
+patch `requests.Session.send` themselves, where the outcome would depend on which was
+installed last. They register a hook here instead and one wrapper runs them in a fixed
+order: the hook with the lowest `order` is outermost and sees what the inner ones return.
+A hook is called as `hook(request, send, **kwargs)` and passes the request on by calling
+`send(request, **kwargs)`, or returns a response of its own.
+"""
+
+import threading
+from typing import Any, Callable, List, Tuple
+import requests
+
+type Send = Callable[..., requests.Response]
+type Hook = Callable[..., requests.Response]
+
+# outermost first
+METRICS_ORDER = 0
+FAULTS_ORDER = 10
+
+_hooks: List[Tuple[int, str, Hook]] = []
+_lock = threading.Lock()
+_original_send = requests.Session.send
+
+def register_send_hook(name: str, hook: Hook, *, order: int):
+    """
+    Adds the hook, or replaces the one registered under the same name.
+    """
+    with _lock:
+        _hooks[:] = sorted([entry for entry in _hooks if entry[1] != name] + [(order, name, hook)], key=lambda entry: (entry[0], entry[1]))
+        requests.Session.send = _send
+
+def unregister_send_hook(name: str):
+    with _lock:
+        _hooks[:] = [entry for entry in _hooks if entry[1] != name]
+
+def _send(session: requests.Session, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+    hooks = [hook for _, _, hook in _hooks]
+
+    def call(i: int, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        if i == len(hooks):
+            return _original_send(session, request, **kwargs)
+        return hooks[i](request, lambda request, **kwargs: call(i + 1, request, **kwargs), **kwargs)
+
+    return call(0, request, **kwargs)
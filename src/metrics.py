@@ -0,0 +1,325 @@
+"""
+Live metrics of a running sweep.
+
+`METRICS` is updated by the trial loop in run.py. `MetricsExporter` periodically
+rewrites it to a file, in Prometheus text format for `.prom` files and as JSON
+otherwise, and `progress_line` renders a compact terminal view.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, ContextManager, Deque, Dict, List, Optional
+from .http_hooks import METRICS_ORDER, register_send_hook
+
+RATE_WINDOW_SECONDS = 300
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total, 4),
+            "avg_seconds": round(self.total / self.count, 4) if self.count else 0.0,
+            "max_seconds": round(self.max, 4),
+        }
+
+class SweepMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # entered around every stage, e.g. by the profiler
+        self.stage_hooks: List[Callable[[str], ContextManager]] = []
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = time.time()
+            self.planned = 0
+            self.in_flight = 0
+            self.outcomes: Dict[str, int] = {"passed": 0, "failed": 0, "error": 0, "infra_error": 0, "timeout": 0, "budget": 0}
+            self.finished_at: Deque[float] = deque()
+            self.stages: Dict[str, StageStats] = {}
+            self.llm_errors = 0
+            self.tool_calls = 0
+            self.tool_errors = 0
+            self.throttled = 0
+            self.http_responses: Dict[str, int] = {}
+            self.errors_by_type: Dict[str, int] = {}
+            self.judge_tiers: Dict[str, int] = {}
+            self.judge_comparisons: Dict[str, int] = {"agree": 0, "disagree": 0}
+            self.llm_tokens: Dict[str, int] = {}
+            self.llm_cost_usd: Dict[str, float] = {}
+            self.budget_skipped = 0
+            self.resumes = 0
+
+    # === Recording ===
+
+    def start(self):
+        """
+        Starts the clock of the elapsed time and the rate window, when the sweep starts
+        rather than at import.
+        """
+        with self.lock:
+            self.started_at = time.time()
+
+    def plan(self, trials: int):
+        with self.lock:
+            self.planned += trials
+
+    def trial_started(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def trial_finished(self, *, outcome: str, tool_calls: int = 0, tool_errors: int = 0):
+        now = time.time()
+        with self.lock:
+            self.in_flight -= 1
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            self.tool_calls += tool_calls
+            self.tool_errors += tool_errors
+            self.finished_at.append(now)
+            while self.finished_at and self.finished_at[0] < now - RATE_WINDOW_SECONDS:
+                self.finished_at.popleft()
+
+    @contextmanager
+    def stage(self, name: str):
+        with ExitStack() as hooks:
+            for hook in self.stage_hooks:
+                hooks.enter_context(hook(name))
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                elapsed = time.perf_counter() - started
+                with self.lock:
+                    self.stages.setdefault(name, StageStats()).observe(elapsed)
+
+    def record_error(self, error: BaseException):
+        name = type(error).__name__
+        module = type(error).__module__ or ""
+        status_code = getattr(error, "status_code", None)
+        with self.lock:
+            self.errors_by_type[name] = self.errors_by_type.get(name, 0) + 1
+            if module.startswith(("litellm", "openai")):
+                self.llm_errors += 1
+            if status_code == 429 or "RateLimit" in name:
+                self.throttled += 1
+
+    def record_resume(self, error: BaseException):
+        """
+        A trial resumed after a transient error instead of failing.
+        """
+        self.record_error(error)
+        with self.lock:
+            self.resumes += 1
+
+    def record_http_status(self, status_code: int):
+        with self.lock:
+            key = str(status_code)
+            self.http_responses[key] = self.http_responses.get(key, 0) + 1
+            if status_code == 429:
+                self.throttled += 1
+
+    def record_judge(self, judge_info: Dict[str, Any]):
+        """
+        Counts which judge tier decided and, when two tiers judged the same trial, whether they agreed.
+        """
+        with self.lock:
+            tier = judge_info.get("tier", "single")
+            self.judge_tiers[tier] = self.judge_tiers.get(tier, 0) + 1
+            if "agreement" in judge_info:
+                self.judge_comparisons["agree" if judge_info["agreement"] else "disagree"] += 1
+
+    def record_llm_usage(self, role: str, tokens: int, cost_usd: float):
+        """
+        Tokens and estimated dollars of one completion, by role (agent or judge).
+        """
+        with self.lock:
+            self.llm_tokens[role] = self.llm_tokens.get(role, 0) + tokens
+            self.llm_cost_usd[role] = self.llm_cost_usd.get(role, 0.0) + cost_usd
+
+    def record_budget_skip(self):
+        with self.lock:
+            # a skipped trial won't finish, take it out of the plan so the ETA holds
+            self.budget_skipped += 1
+            self.planned -= 1
+
+    # === Reading ===
+
+    def finished(self) -> int:
+        return sum(self.outcomes.values())
+
+    def trials_per_minute(self) -> float:
+        now = time.time()
+        window = min(RATE_WINDOW_SECONDS, now - self.started_at)
+        recent = sum(1 for t in self.finished_at if t >= now - RATE_WINDOW_SECONDS)
+        return recent / window * 60 if window > 0 else 0.0
+
+    def eta_seconds(self) -> Optional[float]:
+        remaining = self.planned - self.finished()
+        rate = self.trials_per_minute()
+        if remaining <= 0:
+            return 0.0
+        if rate <= 0:
+            return None
+        return remaining / rate * 60
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            eta = self.eta_seconds()
+            return {
+                "timestamp": time.time(),
+                "elapsed_seconds": round(time.time() - self.started_at, 2),
+                "planned_trials": self.planned,
+                "finished_trials": self.finished(),
+                "in_flight_trials": self.in_flight,
+                "outcomes": dict(self.outcomes),
+                "trials_per_minute": round(self.trials_per_minute(), 3),
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+                "stages": {name: stats.as_dict() for name, stats in self.stages.items()},
+                "llm_errors": self.llm_errors,
+                "tool_calls": self.tool_calls,
+                "tool_errors": self.tool_errors,
+                "tool_error_rate": round(self.tool_errors / self.tool_calls, 4) if self.tool_calls else 0.0,
+                "throttled": self.throttled,
+                "http_responses": dict(self.http_responses),
+                "errors_by_type": dict(self.errors_by_type),
+                "judge_tiers": dict(self.judge_tiers),
+                "judge_comparisons": dict(self.judge_comparisons),
+                "llm_tokens": dict(self.llm_tokens),
+                "llm_cost_usd": {role: round(cost, 6) for role, cost in self.llm_cost_usd.items()},
+                "budget_skipped_trials": self.budget_skipped,
+                "resumes": self.resumes,
+            }
+
+def to_prometheus(snapshot: Dict[str, Any], prefix: str = "crm_eval") -> str:
+    lines = []
+
+    def metric(name: str, kind: str, help: str, samples: Dict[str, Any]):
+        lines.append(f"# HELP {prefix}_{name} {help}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        for labels, value in samples.items():
+            lines.append(f"{prefix}_{name}{labels} {value if value is not None else 'NaN'}")
+
+    metric("planned_trials", "gauge", "Trials planned for the sweep", {"": snapshot["planned_trials"]})
+    metric("trials_total", "counter", "Finished trials by outcome", {
+        f'{{outcome="{outcome}"}}': count for outcome, count in snapshot["outcomes"].items()
+    })
+    metric("in_flight_trials", "gauge", "Trials currently running", {"": snapshot["in_flight_trials"]})
+    metric("trials_per_minute", "gauge", f"Finished trials per minute over the last {RATE_WINDOW_SECONDS}s", {"": snapshot["trials_per_minute"]})
+    metric("eta_seconds", "gauge", "Estimated seconds until all planned trials finish", {"": snapshot["eta_seconds"]})
+    metric("stage_seconds_sum", "counter", "Total seconds spent in a trial stage", {
+        f'{{stage="{name}"}}': stats["total_seconds"] for name, stats in snapshot["stages"].items()
+    })
+    metric("stage_seconds_count", "counter", "Number of times a trial stage ran", {
+        f'{{stage="{name}"}}': stats["count"] for name, stats in snapshot["stages"].items()
+    })
+    metric("stage_seconds_max", "gauge", "Longest run of a trial stage", {
+        f'{{stage="{name}"}}': stats["max_seconds"] for name, stats in snapshot["stages"].items()
+    })
+    metric("llm_errors_total", "counter", "Failed LLM calls", {"": snapshot["llm_errors"]})
+    metric("tool_calls_total", "counter", "Tool calls made by agents", {"": snapshot["tool_calls"]})
+    metric("tool_errors_total", "counter", "Tool calls that returned an error", {"": snapshot["tool_errors"]})
+    metric("throttled_total", "counter", "Responses throttled with 429", {"": snapshot["throttled"]})
+    metric("http_responses_total", "counter", "HTTP responses by status code", {
+        f'{{code="{code}"}}': count for code, count in snapshot["http_responses"].items()
+    })
+    metric("judge_decisions_total", "counter", "Verdicts by the judge tier that decided", {
+        f'{{tier="{tier}"}}': count for tier, count in snapshot["judge_tiers"].items()
+    })
+    metric("judge_comparisons_total", "counter", "Trials judged by two tiers, by whether they agreed", {
+        f'{{result="{result}"}}': count for result, count in snapshot["judge_comparisons"].items()
+    })
+    metric("llm_tokens_total", "counter", "LLM tokens used, by role", {
+        f'{{role="{role}"}}': count for role, count in snapshot["llm_tokens"].items()
+    })
+    metric("llm_cost_usd_total", "counter", "Estimated LLM cost in dollars, by role", {
+        f'{{role="{role}"}}': cost for role, cost in snapshot["llm_cost_usd"].items()
+    })
+    metric("budget_skipped_trials_total", "counter", "Trials skipped by the budget governor", {"": snapshot["budget_skipped_trials"]})
+    metric("resumes_total", "counter", "Completions, tool calls and dumps retried after transient errors", {"": snapshot["resumes"]})
+    return "\n".join(lines) + "\n"
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+def progress_line(snapshot: Dict[str, Any]) -> str:
+    outcomes = snapshot["outcomes"]
+    return (
+        f"📈 {snapshot['finished_trials']}/{snapshot['planned_trials']} trials"
+        f" | {snapshot['trials_per_minute']:.1f}/min"
+        f" | in-flight {snapshot['in_flight_trials']}"
+        f" | 👍 {outcomes.get('passed', 0)} 👎 {outcomes.get('failed', 0)} ❌ {outcomes.get('error', 0)} 🔌 {outcomes.get('infra_error', 0)} ⏱️ {outcomes.get('timeout', 0)}"
+        f" | 🔁 {snapshot['resumes']}"
+        f" | ${sum(snapshot['llm_cost_usd'].values()):.2f}"
+        f" | tool errors {snapshot['tool_error_rate']:.0%}"
+        f" | 429s {snapshot['throttled']}"
+        f" | ETA {format_duration(snapshot['eta_seconds'])}"
+    )
+
+class MetricsExporter:
+    """
+    Rewrites `path` every `interval` seconds in a background thread. The file is replaced
+    atomically so scrapers never read a partial write.
+    """
+
+    def __init__(self, metrics: "SweepMetrics", path: str, *, interval: float = 5.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def write(self):
+        snapshot = self.metrics.snapshot()
+        content = to_prometheus(snapshot) if self.path.endswith(".prom") else json.dumps(snapshot, indent=2) + "\n"
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, self.path)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def __enter__(self):
+        self.write()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+def install_http_metrics(metrics: "SweepMetrics"):
+    """
+    Counts the status code of every response sent through `requests`, including the ones
+    fault injection makes up.
+    """
+    def count_status(request, send, **kwargs):
+        response = send(request, **kwargs)
+        metrics.record_http_status(response.status_code)
+        return response
+
+    register_send_hook("metrics", count_status, order=METRICS_ORDER)
+
+METRICS = SweepMetrics()
@@ -1,10 +1,9 @@
-import json
-from math import comb
-from typing import List, Union
+from typing import Any, Callable, Optional, Union
 import csv
 import io
 
-from src.shared import SolveResult
+from src.adaptive import expected_pass_hat_k
+from src.results import read_results
 
 ROUND_TO_DECIMALS = 4
 AVG_LITERAL = '_across_tasks'
@@ -19,45 +18,121 @@ type ToolsetPassK = dict[
 
 type PassKResult = dict[ToolsetName, ToolsetPassK]
 
-def calculate_pass_k(results_file: str) -> ToolsetPassK:
-    with open(results_file, 'r') as f:
-        results: List[SolveResult] = [SolveResult.model_validate(json.loads(line)) for line in f.readlines()]
-
-    n_per_task: dict[str, int] = {} # n - number of trials
-    c_per_task: dict[str, int] = {} # c - number of successful trials
-    for result in results:
-        task_name = result.task.name
-        if task_name not in n_per_task:
-            n_per_task[task_name] = result.trials_count
-        if task_name not in c_per_task:
-            c_per_task[task_name] = 1 if result.verdict.verdict else 0
-        else:
-            c_per_task[task_name] += 1 if result.verdict.verdict else 0
+type TaskCounts = dict[str, Any] # n - number of trials, c - number of successful trials, k - highest k to report, the planned number of trials, trials left out of pass^k by `EXCLUDED_COUNTS`, and the totals of registered counters by info key
+type ResultCounts = dict[TaskName, TaskCounts]
+type Counter = Callable[[dict[str, int], bool, Any], None] # task totals, passed, the trial's info value
+
+EXCLUDED_COUNTS = {"infra_error": "infra_errors", "budget": "budget_stopped"} # reason -> task counts key
+
+# info key -> counter, registered by the modules of the features that fill the key in
+COUNTERS: dict[str, Counter] = {}
+
+def register_counter(info_key: str, counter: Counter):
+    """
+    Adds `info[info_key]` of every counted trial that has it to the task's totals under
+    the same key, so a feature can summarize its trials without a change here.
+    """
+    COUNTERS[info_key] = counter
+
+def add_totals(totals: dict[str, int], **values: int):
+    for name, value in values.items():
+        totals[name] = totals.get(name, 0) + value
+
+def feature_totals(counts: ResultCounts, info_key: str) -> dict[TaskName, dict[str, int]]:
+    return {task_name: task_counts[info_key] for task_name, task_counts in counts.items() if task_counts.get(info_key)}
+
+def excluded_from_pass_k(info: Optional[dict]) -> Optional[str]:
+    """
+    Why a trial says nothing about the agent and is left out of pass^k: an infra error,
+    or a stop by the sweep or toolset budget. None when it counts, trials stopped by
+    their own budget cap are failures.
+    """
+    info = info or {}
+    if info.get("stop_reason") == "infra_error":
+        return "infra_error"
+    if info.get("stop_reason") == "budget" and (info.get("budget") or {}).get("cap") != "trial":
+        return "budget"
+    return None
+
+def count_result(counts: ResultCounts, task_name: str, passed: bool, trials_count: int, info: Optional[dict] = None):
+    task_counts = counts.setdefault(task_name, {"n": 0, "c": 0, "k": 0})
+    excluded = excluded_from_pass_k(info)
+    if excluded:
+        key = EXCLUDED_COUNTS[excluded]
+        task_counts[key] = task_counts.get(key, 0) + 1
+        task_counts["k"] = max(task_counts["k"], trials_count or 0)
+        return
+    task_counts["n"] += 1
+    task_counts["c"] += 1 if passed else 0
+    task_counts["k"] = max(task_counts["k"], trials_count or 0, task_counts["n"])
+
+    for info_key, counter in COUNTERS.items():
+        value = (info or {}).get(info_key)
+        if value:
+            counter(task_counts.setdefault(info_key, {}), passed, value)
+
+def count_results(results_file: str) -> ResultCounts:
+    counts: ResultCounts = {}
+    for result in read_results(results_file):
+        count_result(counts, result.task.name, result.verdict.verdict, result.trials_count, result.info)
+    return counts
 
+def calculate_pass_k(results_file: str) -> ToolsetPassK:
+    return pass_k_from_counts(count_results(results_file))
+
+def excluded_summary(counts: ResultCounts) -> Optional[dict[str, Any]]:
+    """
+    Trials left out of pass^k per task, by reason: ended by transient errors after their
+    resumes ran out, or stopped by the sweep or toolset budget.
+    """
+    summary: dict[str, Any] = {}
+    for key in EXCLUDED_COUNTS.values():
+        tasks = {task_name: task_counts[key] for task_name, task_counts in counts.items() if task_counts.get(key)}
+        if tasks:
+            summary[key] = tasks
+    if not summary:
+        return None
+    return {"counted_trials": sum(task_counts["n"] for task_counts in counts.values()), **summary}
+
+def pass_k_from_counts(counts: ResultCounts) -> ToolsetPassK:
     # pass^k
     pass_hat_ks: dict[str, dict[int, float]] = {}
-    for task_name in n_per_task:
-        if task_name not in pass_hat_ks:
-            pass_hat_ks[task_name] = {}
-
-        n = n_per_task[task_name]
-        c = c_per_task[task_name]
-
-        for k in range(1, n+1):
-            pass_hat_k = comb(c, k) / comb(n, k)
+    for task_name, task_counts in counts.items():
+        if not task_counts["n"]:
+            # every trial of the task was left out, nothing to report
+            continue
+        pass_hat_ks[task_name] = {}
+
+        n = task_counts["n"]
+        c = task_counts["c"]
+
+        # comb(c, k) / comb(n, k) as a running product, the binomials themselves grow too large to compute for every k
+        ratio = 1.0
+        for k in range(1, task_counts["k"]+1):
+            if k <= n:
+                ratio *= max(c - k + 1, 0) / (n - k + 1)
+                pass_hat_k = ratio
+            else:
+                # Adaptive runs stop sampling settled tasks early, extrapolate from the posterior
+                pass_hat_k = expected_pass_hat_k(c, n, k)
             pass_hat_ks[task_name][k] = round(pass_hat_k, ROUND_TO_DECIMALS)
 
     # Calculate averages for each pass^k across all tasks
     n_of_tasks = len(pass_hat_ks)
+    # only k's reported for every task, tasks can differ when a run was interrupted
+    common_ks = set.intersection(*(set(d.keys()) for d in pass_hat_ks.values())) if pass_hat_ks else set()
     avgs_per_k = {
         k: round(sum(d[k] for d in pass_hat_ks.values()) / n_of_tasks, ROUND_TO_DECIMALS) 
-            for k in next(iter(pass_hat_ks.values()))
+            for k in sorted(common_ks)
     }
 
     pass_hat_ks[AVG_LITERAL] = avgs_per_k
     
     return pass_hat_ks
 
+def format_pass_k(averages: dict[int, float]) -> str:
+    return ", ".join(f"pass^{k} {value:.2f}" for k, value in averages.items())
+
 def create_csv_pass_k(results: PassKResult, *, run_id: str) -> str:
     # Collect all k's
     all_ks = set()
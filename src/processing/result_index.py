@@ -0,0 +1,88 @@
+"""
+Sidecar index for incremental processing of results files.
+
+`{results_file}.index.json` records how far the file has been read (a byte offset at a
+line boundary), the file's size, mtime and inode, a hash of its first bytes, and the
+per-task counts folded in so far, and the counters registered with `register_counter`
+that filled them in. The next run reads only the bytes after the offset. A file that
+shrank or was replaced by a different one, or an index counted with other counters, is
+read again from the beginning.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+from .pass_k import COUNTERS, ResultCounts, count_result
+
+INDEX_VERSION = 7
+HEAD_BYTES = 4096
+
+def index_path(results_file: str) -> str:
+    return f"{results_file}.index.json"
+
+def head_hash(f, length: int) -> str:
+    f.seek(0)
+    return hashlib.sha256(f.read(min(length, HEAD_BYTES))).hexdigest()
+
+def load_index(results_file: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(index_path(results_file), "r") as f:
+            index = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if index.get("version") != INDEX_VERSION or index.get("counters") != sorted(COUNTERS):
+        return None
+    return index
+
+def save_index(results_file: str, index: Dict[str, Any]):
+    path = index_path(results_file)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, path)
+
+def update_counts(results_file: str) -> ResultCounts:
+    """
+    Counts of the whole file, folding only the lines appended since the last call into
+    the indexed counts. A trailing line without a newline is still being written and is
+    left for the next call.
+    """
+    stat = os.stat(results_file)
+    index = load_index(results_file)
+
+    with open(results_file, "rb") as f:
+        if (
+            index is None
+            or index["inode"] != stat.st_ino
+            or stat.st_size < index["offset"]
+            or head_hash(f, index["offset"]) != index["head"]
+        ):
+            index = {"version": INDEX_VERSION, "counters": sorted(COUNTERS), "offset": 0, "head": None, "counts": {}}
+        elif index["size"] == stat.st_size and index["mtime"] == stat.st_mtime:
+            return index["counts"]
+
+        counts: ResultCounts = index["counts"]
+        offset = index["offset"]
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            count_result(counts, data["task"]["name"], data["verdict"]["verdict"], data.get("trials_count"), data.get("info"))
+
+        index.update(
+            offset=offset,
+            head=head_hash(f, offset),
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            inode=stat.st_ino,
+            counts=counts,
+        )
+
+    save_index(results_file, index)
+    return counts
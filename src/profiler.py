@@ -0,0 +1,292 @@
+"""
+Sampling profiler for whole sweeps.
+
+`SamplingProfiler` wakes up every `interval` seconds in a background thread and records
+the Python stack of every other thread, under the stage the thread is in (reset, solve,
+dump, evaluate, write, ...), so worker threads are covered too. Work handed to a pool
+thread through `contextvars.copy_context().run` is wrapped in `inherit_stage`, so tool
+calls run under a deadline or by the streaming pipeline count towards the stage that
+started them instead of `other`. A sample counts as on-CPU
+when the thread's CPU clock advanced by at least half the time since its previous sample;
+the rest is time spent blocked on I/O, the model or locks. The sampler needs the GIL to
+read the stacks, so a thread busy in Python is often caught at its next GIL release, e.g.
+the `time.sleep` or socket read after the work; read the CPU graph a frame or two up.
+Time in C extensions (pydantic-core, json) shows as self-time of the calling function.
+
+Stages are timed exactly, wall and thread CPU time, and `save` writes for each sweep:
+
+- `{name}.wall.folded` / `{name}.cpu.folded`: collapsed stacks, one `stage;frame;frame count`
+  line each, for flamegraph.pl, speedscope or inferno
+- `{name}.wall.svg` / `{name}.cpu.svg`: the same rendered as flamegraphs
+- `{name}.trace.json`: stage spans per thread in the Chrome trace event format, for
+  chrome://tracing or Perfetto
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from html import escape
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_INTERVAL = 0.01
+PROFILES_DIR = "profiles"
+OTHER_STAGE = "other"
+
+_stage: contextvars.ContextVar[Optional[Tuple["SamplingProfiler", str]]] = contextvars.ContextVar("profiler_stage", default=None)
+
+class StageTimes:
+    def __init__(self):
+        self.count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+
+class SamplingProfiler:
+    def __init__(self, *, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.wall_stacks: Dict[str, int] = {}
+        self.cpu_stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.sampling_seconds = 0.0
+        self.stage_times: Dict[str, StageTimes] = {}
+        self.thread_stages: Dict[int, List[str]] = {}
+        self.trace_events: List[Dict[str, Any]] = []
+        self._labels: Dict[Any, str] = {}
+        self._clocks: Dict[int, Optional[int]] = {}
+        self._last_cpu: Dict[int, Tuple[float, float]] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="profiler", daemon=True)
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+
+    # === Stages ===
+
+    @contextmanager
+    def stage(self, name: str):
+        tid = threading.get_ident()
+        stages = self.thread_stages.setdefault(tid, [])
+        stages.append(name)
+        token = _stage.set((self, name))
+        wall_started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_started
+            cpu = time.thread_time() - cpu_started
+            _stage.reset(token)
+            stages.pop()
+            with self.lock:
+                times = self.stage_times.setdefault(name, StageTimes())
+                times.count += 1
+                times.wall += wall
+                times.cpu += cpu
+                self.trace_events.append({
+                    "name": name,
+                    "ph": "X",
+                    "ts": round((wall_started - self.started_at) * 1e6),
+                    "dur": round(wall * 1e6),
+                    "pid": os.getpid(),
+                    "tid": tid,
+                    "args": {"cpu_ms": round(cpu * 1000, 3)},
+                })
+
+    # === Sampling ===
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped_at = time.perf_counter()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            started = time.perf_counter()
+            self._sample(own)
+            self.sampling_seconds += time.perf_counter() - started
+
+    def label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def thread_cpu(self, tid: int) -> Optional[float]:
+        if tid not in self._clocks:
+            try:
+                self._clocks[tid] = time.pthread_getcpuclockid(tid)
+            except (AttributeError, OSError):
+                self._clocks[tid] = None
+        clock = self._clocks[tid]
+        if clock is None:
+            return None
+        try:
+            return time.clock_gettime(clock)
+        except OSError:
+            # the thread ended
+            return None
+
+    def _sample(self, own: int):
+        now = time.perf_counter()
+        frames = sys._current_frames()
+        with self.lock:
+            for tid, frame in frames.items():
+                if tid == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self.label(frame.f_code))
+                    frame = frame.f_back
+                stages = self.thread_stages.get(tid)
+                stack.append(stages[-1] if stages else OTHER_STAGE)
+                key = ";".join(reversed(stack))
+                self.wall_stacks[key] = self.wall_stacks.get(key, 0) + 1
+
+                cpu = self.thread_cpu(tid)
+                previous = self._last_cpu.get(tid)
+                if cpu is not None:
+                    self._last_cpu[tid] = (now, cpu)
+                if cpu is not None and previous is not None and cpu - previous[1] >= (now - previous[0]) / 2:
+                    self.cpu_stacks[key] = self.cpu_stacks.get(key, 0) + 1
+            # thread ids are reused, a new thread must not inherit an old clock
+            for tid in [tid for tid in self._clocks if tid not in frames]:
+                del self._clocks[tid]
+                self._last_cpu.pop(tid, None)
+            self.samples += 1
+
+    # === Reports ===
+
+    def summary(self) -> str:
+        elapsed = (self.stopped_at or time.perf_counter()) - self.started_at
+        lines = [
+            f"🔬 {self.samples} samples every {self.interval * 1000:g}ms over {elapsed:.1f}s,"
+            f" sampling took {self.sampling_seconds / elapsed if elapsed else 0:.1%} of wall time",
+            f"   {'stage':<12} {'count':>6} {'wall':>9} {'cpu':>9} {'cpu/wall':>9}",
+        ]
+        for name, times in sorted(self.stage_times.items(), key=lambda item: -item[1].wall):
+            ratio = times.cpu / times.wall if times.wall else 0.0
+            lines.append(f"   {name:<12} {times.count:>6} {times.wall:>8.2f}s {times.cpu:>8.2f}s {ratio:>9.0%}")
+
+        # functions on top of on-CPU stacks
+        self_samples: Dict[str, int] = {}
+        for key, count in self.cpu_stacks.items():
+            leaf = key.rsplit(";", 1)[-1]
+            self_samples[leaf] = self_samples.get(leaf, 0) + count
+        total = sum(self_samples.values())
+        if total:
+            lines.append("   top on-CPU functions:")
+            for leaf, count in sorted(self_samples.items(), key=lambda item: -item[1])[:10]:
+                lines.append(f"   {count / total:>6.1%}  {leaf}")
+        return "\n".join(lines)
+
+    def trace(self) -> Dict[str, Any]:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": names.get(tid, str(tid))}}
+            for tid in {event["tid"] for event in self.trace_events}
+        ]
+        return {"traceEvents": metadata + self.trace_events, "displayTimeUnit": "ms"}
+
+    def save(self, prefix: str, directory: str = PROFILES_DIR) -> List[str]:
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{prefix}_{time.strftime('%Y%m%d_%H%M%S')}")
+        written = []
+        with self.lock:
+            for kind, stacks in (("wall", self.wall_stacks), ("cpu", self.cpu_stacks)):
+                path = f"{base}.{kind}.folded"
+                with open(path, "w") as f:
+                    f.writelines(f"{key} {count}\n" for key, count in sorted(stacks.items()))
+                written.append(path)
+                path = f"{base}.{kind}.svg"
+                with open(path, "w") as f:
+                    f.write(flamegraph_svg(stacks, title=f"{prefix} {kind} time, {self.interval * 1000:g}ms samples"))
+                written.append(path)
+            path = f"{base}.trace.json"
+            with open(path, "w") as f:
+                json.dump(self.trace(), f)
+            written.append(path)
+        return written
+
+# === Flamegraph ===
+
+FRAME_HEIGHT = 16
+SVG_WIDTH = 1200
+CHAR_WIDTH = 7
+
+def inherit_stage(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Runs `fn` under the profiler stage active in the current context. Meant for pool
+    threads running a context copied from the thread that submitted the work.
+    """
+    active = _stage.get()
+    if active is None:
+        return fn(*args, **kwargs)
+    profiler, name = active
+    stages = profiler.thread_stages.setdefault(threading.get_ident(), [])
+    stages.append(name)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        stages.pop()
+
+def frame_color(name: str) -> str:
+    # stable warm colors, so the same function looks the same in every graph
+    digest = hashlib.md5(name.encode()).digest()
+    return f"rgb({205 + digest[0] % 50},{digest[1] % 180 + 50},{digest[2] % 55})"
+
+def flamegraph_svg(stacks: Dict[str, int], *, title: str) -> str:
+    root: Dict[str, Any] = {"value": 0, "children": {}}
+    for key, count in stacks.items():
+        node = root
+        node["value"] += count
+        for name in key.split(";"):
+            node = node["children"].setdefault(name, {"value": 0, "children": {}})
+            node["value"] += count
+
+    def depth(node: Dict[str, Any]) -> int:
+        return 1 + max((depth(child) for child in node["children"].values()), default=0)
+
+    levels = depth(root) - 1
+    height = (levels + 2) * FRAME_HEIGHT
+    total = root["value"] or 1
+    rects = []
+
+    def layout(node: Dict[str, Any], x: float, level: int):
+        for name, child in sorted(node["children"].items()):
+            width = child["value"] / total * SVG_WIDTH
+            if width >= 0.5:
+                y = height - (level + 1) * FRAME_HEIGHT
+                fits = int((width - 4) / CHAR_WIDTH)
+                text = name if len(name) <= fits else (name[:fits - 2] + ".." if fits > 3 else "")
+                rects.append(
+                    f'<g><title>{escape(name)} ({child["value"]} samples, {child["value"] / total:.2%})</title>'
+                    f'<rect x="{x:.2f}" y="{y}" width="{width:.2f}" height="{FRAME_HEIGHT - 1}" fill="{frame_color(name)}"/>'
+                    f'<text x="{x + 2:.2f}" y="{y + FRAME_HEIGHT - 4}">{escape(text)}</text></g>'
+                )
+                layout(child, x, level + 1)
+            x += width
+
+    layout(root, 0.0, 0)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{SVG_WIDTH}" height="{height}" font-family="monospace" font-size="11">'
+        f'<text x="4" y="12">{escape(title)}, {root["value"]} samples</text>'
+        + "".join(rects)
+        + "</svg>\n"
+    )
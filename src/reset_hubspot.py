@@ -3,6 +3,8 @@ import requests
 import json
 import time
 import os
+from email.utils import parsedate_to_datetime
+from .deadline import current_deadline, request_timeout
 
 load_dotenv()
 
@@ -13,9 +15,22 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 BASE_URL = "https://api.hubapi.com"
+ENGAGEMENT_TYPES = ["emails", "notes", "calls", "meetings", "tasks"]
+ARCHIVE_BATCH_SIZE = 100
+SEARCH_PAGE_SIZE = 200
+SEARCH_MAX_RESULTS = 10000 # search doesn't page past this many results
 
 # === Utility Functions ===
 
+def server_time(response):
+    """
+    HubSpot's clock from the Date header of a response, in whole seconds, the local clock without one
+    """
+    try:
+        return parsedate_to_datetime(response.headers["Date"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+
 def get_all_ids(endpoint):
     url = f"{BASE_URL}{endpoint}"
     ids = []
@@ -24,37 +39,51 @@ def get_all_ids(endpoint):
         params = {"limit": 100}
         if after:
             params["after"] = after
-        response = requests.get(url, headers=HEADERS, params=params).json()
+        response = requests.get(url, headers=HEADERS, params=params, timeout=request_timeout()).json()
         ids.extend([item["id"] for item in response.get("results", [])])
         if not response.get("paging") or not response["paging"].get("next"):
             break
         after = response["paging"]["next"]["after"]
     return ids
 
-def delete_objects(endpoint, ids):
-    for object_id in ids:
-        del_url = f"{BASE_URL}{endpoint}/{object_id}"
-        requests.delete(del_url, headers=HEADERS)
+def archive_objects(object_type, ids):
+    """
+    Archives objects 100 at a time, which also removes their associations. Failed
+    batches are logged, listing the type again shows what's left.
+    """
+    for start in range(0, len(ids), ARCHIVE_BATCH_SIZE):
+        inputs = [{"id": object_id} for object_id in ids[start:start + ARCHIVE_BATCH_SIZE]]
+        url = f"{BASE_URL}/crm/v3/objects/{object_type}/batch/archive"
+        response = requests.post(url, headers=HEADERS, json={"inputs": inputs}, timeout=request_timeout())
+        if not response.ok:
+            print(f"⚠️ Archiving {len(inputs)} {object_type} failed: {response.status_code} {response.text[:200]}")
         time.sleep(0.1)  # avoid rate limits
 
 # === Reset Steps ===
 
-def delete_all_contacts():
-    contact_ids = get_all_ids("/crm/v3/objects/contacts")
-    delete_objects("/crm/v3/objects/contacts", contact_ids)
-
-def delete_all_companies():
-    company_ids = get_all_ids("/crm/v3/objects/companies")
-    delete_objects("/crm/v3/objects/companies", company_ids)
+def delete_all(object_type):
+    archive_objects(object_type, get_all_ids(f"/crm/v3/objects/{object_type}"))
 
-def delete_all_deals():
-    deal_ids = get_all_ids("/crm/v3/objects/deals")
-    delete_objects("/crm/v3/objects/deals", deal_ids)
+def delete_all_objects(object_types, attempts=3):
+    """
+    Archives every record of the object types, so neither the seeded records of earlier
+    trials nor what agents created pile up. Lists them again afterwards and retries
+    what's left, returns the counts still left after `attempts`, empty when all are gone.
+    """
+    left = {}
+    for _ in range(attempts):
+        for object_type in object_types:
+            delete_all(object_type)
+        left = {object_type: len(get_all_ids(f"/crm/v3/objects/{object_type}")) for object_type in object_types}
+        left = {object_type: count for object_type, count in left.items() if count}
+        if not left:
+            break
+        object_types = list(left)
+    return left
 
 def create_company(name, domain):
     data = {"properties": {"name": name, "domain": domain}}
-    response = requests.post(f"{BASE_URL}/crm/v3/objects/companies", headers=HEADERS, json=data).json()
-    return response.get("id")
+    return requests.post(f"{BASE_URL}/crm/v3/objects/companies", headers=HEADERS, json=data, timeout=request_timeout())
 
 def create_contact(name, email, lead_status):
     first, last = name.split(" ", 1)
@@ -66,8 +95,7 @@ def create_contact(name, email, lead_status):
             "hs_lead_status": lead_status
         }
     }
-    response = requests.post(f"{BASE_URL}/crm/v3/objects/contacts", headers=HEADERS, json=data).json()
-    return response.get("id")
+    return requests.post(f"{BASE_URL}/crm/v3/objects/contacts", headers=HEADERS, json=data, timeout=request_timeout())
 
 def create_deal(name, amount, stage):
     data = {
@@ -77,30 +105,36 @@ def create_deal(name, amount, stage):
             "dealstage": stage
         }
     }
-    response = requests.post(f"{BASE_URL}/crm/v3/objects/deals", headers=HEADERS, json=data).json()
-    return response.get("id")
+    return requests.post(f"{BASE_URL}/crm/v3/objects/deals", headers=HEADERS, json=data, timeout=request_timeout())
 
 def associate_contact_to_company(contact_id, company_id):
     url = f"{BASE_URL}/crm/v3/objects/contacts/{contact_id}/associations/companies/{company_id}/contact_to_company"
-    requests.put(url, headers=HEADERS)
+    return requests.put(url, headers=HEADERS, timeout=request_timeout())
 
 def associate_deal_to_company(deal_id, company_id):
     url = f"{BASE_URL}/crm/v3/objects/deals/{deal_id}/associations/companies/{company_id}/deal_to_company"
-    requests.put(url, headers=HEADERS)
+    return requests.put(url, headers=HEADERS, timeout=request_timeout())
 
 def associate_deal_to_contact(deal_id, contact_id):
     url = f"{BASE_URL}/crm/v3/objects/deals/{deal_id}/associations/contacts/{contact_id}/deal_to_contact"
-    requests.put(url, headers=HEADERS)
+    return requests.put(url, headers=HEADERS, timeout=request_timeout())
 
 # === Main ===
 
 def reset_hubspot(quiet=True):
+    """
+    Empties the portal and seeds the fixtures. Returns the ids created per object type,
+    the created records as HubSpot returned them, the associations between them, the
+    server time of the last write, and the counts of records that couldn't be archived,
+    empty when the reset is clean.
+    """
     if not quiet:
         print("🚨 Deleting existing data...")
-        
-    delete_all_contacts()
-    delete_all_companies()
-    delete_all_deals()
+
+    # engagements first, archiving them drops their associations to the rest
+    left = delete_all_objects([*ENGAGEMENT_TYPES, "contacts", "companies", "deals"])
+    if left:
+        print(f"⚠️ Records left after reset: {', '.join(f'{count} {object_type}' for object_type, count in left.items())}")
 
     if not quiet:
         print("📤 Loading initial data...")
@@ -120,27 +154,103 @@ def reset_hubspot(quiet=True):
     if not quiet:
         print("🏢 Creating companies...")
 
+    records = {"companies": [], "contacts": [], "deals": [], **{object_type: [] for object_type in ENGAGEMENT_TYPES}}
+    associations = []
+    finished_at = 0.0
+
+    def write(object_type, response):
+        nonlocal finished_at
+        finished_at = max(finished_at, server_time(response))
+        if object_type is None:
+            return None
+        record = response.json()
+        records[object_type].append(record)
+        return record.get("id")
+
+    def associate(from_type, from_id, to_type, to_id, response):
+        write(None, response)
+        associations.append([from_type, from_id, to_type, to_id])
+
     company_map = {}
     for c in companies_data:
-        company_id = create_company(c["name"], c["domain"])
+        company_id = write("companies", create_company(c["name"], c["domain"]))
         company_map[c["company_id"]] = company_id
 
     if not quiet:
         print("👤 Creating contacts and linking...")
 
     for contact in contacts_data:
-        contact_id = create_contact(contact["name"], contact["email"], contact["lead_status"])
+        contact_id = write("contacts", create_contact(contact["name"], contact["email"], contact["lead_status"]))
         hs_company_id = company_map[contact["company_id"]]
-        associate_contact_to_company(contact_id, hs_company_id)
+        associate("contacts", contact_id, "companies", hs_company_id, associate_contact_to_company(contact_id, hs_company_id))
 
     for deal in deals_data:
-        deal_id = create_deal(deal["name"], deal["amount"], deal["stage"])
+        deal_id = write("deals", create_deal(deal["name"], deal["amount"], deal["stage"]))
         hs_company_id = company_map[deal["company_id"]]
-        associate_deal_to_company(deal_id, hs_company_id)
-        associate_deal_to_contact(deal_id, contact_id)
+        associate("deals", deal_id, "companies", hs_company_id, associate_deal_to_company(deal_id, hs_company_id))
+        associate("deals", deal_id, "contacts", contact_id, associate_deal_to_contact(deal_id, contact_id))
 
     if not quiet:
         print("✔️ Reset complete!")
 
+    return {
+        # engagements are listed empty, so the search barrier also waits for them to be gone
+        "created": {object_type: [record.get("id") for record in items] for object_type, items in records.items()},
+        "records": records,
+        "associations": associations,
+        "finished_at": finished_at,
+        "left": left,
+    }
+
+# === Consistency Barrier ===
+
+def searchable_ids(object_type):
+    """
+    Ids the search index returns for the object type, None when there are more than search can page through
+    """
+    url = f"{BASE_URL}/crm/v3/objects/{object_type}/search"
+    ids = set()
+    after = None
+    while True:
+        data = {"properties": ["hs_object_id"], "limit": SEARCH_PAGE_SIZE}
+        if after:
+            data["after"] = after
+        response = requests.post(url, headers=HEADERS, json=data, timeout=request_timeout()).json()
+        if response.get("total", 0) > SEARCH_MAX_RESULTS:
+            return None
+        ids.update(str(item["id"]) for item in response.get("results", []))
+        if not response.get("paging") or not response["paging"].get("next"):
+            return ids
+        after = response["paging"]["next"]["after"]
+
+def wait_for_search_index(created, timeout=30.0, initial_delay=0.25, max_delay=4.0):
+    """
+    Polls search until it returns exactly the records created by the reset, with the
+    deleted ones gone, so the agent's first searches see the seeded CRM. Waits at most
+    `timeout` seconds, or what's left of the trial deadline.
+    """
+    started = time.monotonic()
+    deadline = current_deadline()
+    if deadline:
+        timeout = min(timeout, deadline.remaining())
+    pending = {object_type: {str(i) for i in ids if i} for object_type, ids in created.items()}
+    polls = 0
+    delay = initial_delay
+    while True:
+        polls += 1
+        for object_type in list(pending):
+            if searchable_ids(object_type) == pending[object_type]:
+                del pending[object_type]
+        elapsed = time.monotonic() - started
+        if not pending or elapsed + delay > timeout:
+            return {
+                "ready": not pending,
+                "seconds": round(elapsed, 3),
+                "polls": polls,
+                "pending": sorted(pending),
+            }
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
 if __name__ == "__main__":
     reset_hubspot()
\ No newline at end of file
@@ -0,0 +1,61 @@
+import json
+import os
+from typing import Iterator, Optional, TextIO
+from .blob_store import BlobStore, externalize, resolve_blobs
+from .shared import SolveResult, Toolset
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../results")
+
+def results_file_name(toolset_name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in toolset_name.lower())
+
+def results_file_path(toolset_name: str) -> str:
+    return os.path.join(RESULTS_DIR, f"{results_file_name(toolset_name)}.jsonl")
+
+def open_results_path(name: str) -> TextIO:
+    results_file = os.path.join(RESULTS_DIR, f"{name}.jsonl")
+
+    # Create results directory if it doesn't exist
+    if not os.path.exists(RESULTS_DIR):
+        os.makedirs(RESULTS_DIR)
+    
+    # Backup existing file if it exists
+    if os.path.exists(results_file):
+        backup_index = 1
+        backup_file = os.path.join(RESULTS_DIR, f"{name}_{backup_index}.jsonl")
+        while os.path.exists(backup_file):
+            backup_index += 1
+            backup_file = os.path.join(RESULTS_DIR, f"{name}_{backup_index}.jsonl")
+        os.rename(results_file, backup_file)
+    
+    return open(results_file, "w")
+
+def open_results_file(toolset: Toolset) -> TextIO:
+    return open_results_path(results_file_name(toolset.name))
+
+_blob_store: Optional[BlobStore] = None
+
+def set_blob_store(store: Optional[BlobStore]):
+    """
+    Store heavy fields of results written from now on in `store`, or inline when None.
+    """
+    global _blob_store
+    _blob_store = store
+
+def write_result_to_file(file: TextIO, result: SolveResult):
+    data = result.model_dump()
+    if _blob_store is not None:
+        data = externalize(data, _blob_store)
+    file.write(json.dumps(data) + "\n") 
+
+def read_results(results_file: str, *, resolve: bool = False, store: Optional[BlobStore] = None) -> Iterator[SolveResult]:
+    """
+    Reads results one by one. Externalized fields stay empty unless `resolve` is set.
+    """
+    store = store or _blob_store or BlobStore()
+    with open(results_file, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = SolveResult.model_validate(json.loads(line))
+            yield resolve_blobs(result, store) if resolve else result
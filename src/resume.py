@@ -0,0 +1,142 @@
+"""
+Resuming trials after transient failures.
+
+The agent's transcript is its checkpoint: it grows by one assistant message per
+completion and one tool message per tool call, and a failure never rolls back what's
+already in it. When a transient error escapes a completion, a tool call or the CRM
+dump (a 429, a 5xx, a timeout of the provider, a dropped connection), the trial waits
+with exponential backoff and resumes from the last checkpoint: the failed completion is
+requested again with the same messages, the failed read-only tool call runs again while
+the calls before it keep their responses, and the dump is read again. Each trial gets
+`max_retries` resumes in total.
+
+Other errors, and transient ones past the limit, still end the trial with the partial
+transcript kept. Trials ended by a transient error have `info.stop_reason` set to
+`infra_error` and aren't counted in pass^k, so provider outages don't show up as agent
+failures. Calls that may already have changed the CRM before failing aren't resumed,
+running them again could create duplicates: tool calls the toolset's `classify` doesn't
+mark as reads, and streamed completions that failed after their first tool call started.
+They end the trial as an infra error right away.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+import requests
+from .deadline import current_deadline, is_deadline_timeout
+from .metrics import METRICS
+
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504, 529}
+
+T = TypeVar("T")
+
+class NotResumable(Exception):
+    pass
+
+def status_code(error: BaseException) -> Optional[int]:
+    code = getattr(error, "status_code", None)
+    if code is None:
+        response = getattr(error, "response", None)
+        code = getattr(response, "status_code", None)
+    return code if isinstance(code, int) else None
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    True for rate limits, server errors, timeouts and dropped connections, of litellm,
+    requests or the tool SDKs, that may well succeed when tried again.
+    """
+    if isinstance(error, NotResumable):
+        return False
+    if status_code(error) in TRANSIENT_STATUS_CODES:
+        return True
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return True
+    # litellm and the SDKs name their exceptions after the condition
+    name = type(error).__name__
+    return any(word in name for word in ("RateLimit", "Timeout", "Connection", "ServiceUnavailable", "InternalServer", "BadGateway"))
+
+def is_infra_error(error: BaseException) -> bool:
+    """
+    True for transient errors, also when they weren't resumed because of side effects.
+    """
+    if isinstance(error, NotResumable):
+        return error.__cause__ is not None and is_transient_error(error.__cause__)
+    return is_transient_error(error)
+
+def run_once(what: str, fn: Callable[[], T]) -> T:
+    """
+    Calls `fn` that may have had effects by the time it fails, transient errors become
+    `NotResumable` so no resumer tries it again.
+    """
+    try:
+        return fn()
+    except Exception as e:
+        if is_deadline_timeout(e) or not is_transient_error(e):
+            raise
+        raise NotResumable(f"{what} may have been applied before failing: {type(e).__name__}: {e}") from e
+
+class Resumer:
+    def __init__(self, *, max_retries: int = DEFAULT_MAX_RETRIES, backoff: float = DEFAULT_BACKOFF):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.resumes: List[Dict[str, Any]] = []
+
+    def can_resume(self, error: BaseException) -> bool:
+        return (
+            len(self.resumes) < self.max_retries
+            and not is_deadline_timeout(error)
+            and is_transient_error(error)
+        )
+
+    def run(self, what: str, fn: Callable[[], T], *, fallback: Optional[Callable[[], T]] = None) -> T:
+        """
+        Calls `fn`, and after a transient error `fallback` (or `fn` again) until it
+        succeeds or the trial runs out of resumes.
+        """
+        attempt = fn
+        while True:
+            try:
+                return attempt()
+            except Exception as e:
+                if not self.can_resume(e):
+                    raise
+                delay = min(self.backoff * 2 ** len(self.resumes), MAX_BACKOFF)
+                deadline = current_deadline()
+                if deadline:
+                    delay = min(delay, deadline.remaining())
+                self.resumes.append({"at": what, "error": f"{type(e).__name__}: {e}"[:500], "delay": round(delay, 3)})
+                METRICS.record_resume(e)
+                print(f"🔁 Resuming {what} after {type(e).__name__} in {delay:.1f}s ({len(self.resumes)}/{self.max_retries})")
+                time.sleep(delay)
+                attempt = fallback or fn
+
+    def info(self) -> Dict[str, Any]:
+        return {"count": len(self.resumes), "max_retries": self.max_retries, "resumes": self.resumes}
+
+_settings = {"max_retries": DEFAULT_MAX_RETRIES, "backoff": DEFAULT_BACKOFF}
+_resumer: contextvars.ContextVar[Optional[Resumer]] = contextvars.ContextVar("resumer", default=None)
+
+def configure_resume(*, max_retries: int, backoff: float = DEFAULT_BACKOFF):
+    _settings.update(max_retries=max_retries, backoff=backoff)
+
+@contextmanager
+def resume_scope():
+    """
+    Gives the trial run inside its budget of resumes.
+    """
+    resumer = Resumer(**_settings)
+    token = _resumer.set(resumer)
+    try:
+        yield resumer
+    finally:
+        _resumer.reset(token)
+
+def resumable(what: str, fn: Callable[[], T], *, fallback: Optional[Callable[[], T]] = None) -> T:
+    resumer = _resumer.get()
+    if resumer is None:
+        return fn()
+    return resumer.run(what, fn, fallback=fallback)
@@ -0,0 +1,222 @@
+"""
+Scripted stand-in for the LLM, registered as the litellm custom provider `scripted`.
+
+The agent side replays a per-task script of tool calls, written against the vibecode
+toolset, one step per completion. Arguments may reference the ID returned by the
+previous tool call as `{last_id}`. Toolsets without the scripted tools get a single
+call of their first tool. The judge side, recognized by `response_format`, returns a
+verdict that passes with probability `pass_rate`. Each completion waits an
+exponentially distributed think time to mimic model latency. Streamed completions
+spread the same think time evenly before each tool call and the end of the stream.
+"""
+
+import json
+import os
+import random
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+import litellm
+from litellm import CustomLLM, ModelResponse
+from litellm.types.utils import GenericStreamingChunk
+from .shared import Task
+
+PROVIDER = "scripted"
+
+type Step = List[Dict[str, Any]] # tool calls of one completion: {"name": ..., "arguments": {...}}
+
+SCRIPTS: Dict[str, List[Step]] = {
+    "create_lead": [
+        [
+            {"name": "contacts", "arguments": {"operation": "search", "data": {"query": "John Doe"}}},
+            {"name": "companies", "arguments": {"operation": "search", "data": {"query": "ACME"}}},
+        ],
+    ],
+    "update_lead_status": [
+        [{"name": "contacts", "arguments": {"operation": "search", "data": {"filterGroups": [{"filters": [{"propertyName": "email", "operator": "CONTAINS_TOKEN", "value": "*@acme.com"}]}]}}}],
+        [{"name": "contacts", "arguments": {"operation": "update", "contact_id": "{last_id}", "data": {"properties": {"hs_lead_status": "UNQUALIFIED"}}}}],
+    ],
+    "create_deal": [
+        [{"name": "companies", "arguments": {"operation": "search", "data": {"query": "ACME"}}}],
+        [{"name": "deals", "arguments": {"operation": "create", "data": {"properties": {"dealname": "Rich Tools", "amount": "50000"}}}}],
+        [{"name": "associations", "arguments": {"operation": "create", "from_object_type": "deals", "from_object_id": "{last_id}", "to_object_type": "companies", "to_object_id": "1"}}],
+    ],
+    "create_engagement": [
+        [{"name": "deals", "arguments": {"operation": "search", "data": {"query": "Wayne Enterprises Deal"}}}],
+        [{"name": "engagements", "arguments": {"operation": "create", "data": {"properties": {"hs_call_title": "Call with Bruce Wayne"}}}}],
+        [
+            {"name": "engagements", "arguments": {"operation": "create", "data": {"properties": {"hs_task_subject": "Send recap"}}}},
+            {"name": "engagements", "arguments": {"operation": "create", "data": {"properties": {"hs_task_subject": "Confirm demo in 2 weeks"}}}},
+            {"name": "engagements", "arguments": {"operation": "create", "data": {"properties": {"hs_task_subject": "Send case studies"}}}},
+        ],
+    ],
+    "deals_report": [
+        [{"name": "deals", "arguments": {"operation": "search", "data": {}}}],
+    ],
+    "company_report": [
+        [{"name": "companies", "arguments": {"operation": "search", "data": {}}}],
+        [{"name": "contacts", "arguments": {"operation": "search", "data": {}}}],
+    ],
+}
+
+def last_object_id(messages: List[Dict[str, Any]]) -> Optional[str]:
+    for message in reversed(messages):
+        if message.get("role") != "tool":
+            continue
+        try:
+            content = json.loads(message.get("content") or "null")
+        except json.JSONDecodeError:
+            return None
+        if isinstance(content, str):
+            try:
+                content = json.loads(content)
+            except json.JSONDecodeError:
+                return None
+        if isinstance(content, dict):
+            if content.get("id"):
+                return str(content["id"])
+            results = content.get("results") or []
+            if results and isinstance(results[0], dict) and results[0].get("id"):
+                return str(results[0]["id"])
+        return None
+    return None
+
+def find_script(messages: List[Dict[str, Any]]) -> List[Step]:
+    prompt = next((m.get("content") for m in messages if m.get("role") == "user"), "")
+    tasks_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data/tasks.jsonl")
+    with open(tasks_file, "r") as f:
+        for line in f:
+            task = Task(**json.loads(line))
+            if task.prompt == prompt:
+                return SCRIPTS.get(task.name, [])
+    return []
+
+class ScriptedLLM(CustomLLM):
+    def __init__(self, *, think_time: float = 0.0, pass_rate: float = 0.8, seed: Optional[int] = None):
+        super().__init__()
+        self.think_time = think_time
+        self.pass_rate = pass_rate
+        self.random = random.Random(seed)
+        self.scripts_cache: Dict[str, List[Step]] = {}
+
+    def think_seconds(self) -> float:
+        return self.random.expovariate(1 / self.think_time) if self.think_time > 0 else 0.0
+
+    def think(self):
+        time.sleep(self.think_seconds())
+
+    def completion(self, model: str, messages: list, *args, **kwargs) -> ModelResponse:
+        self.think()
+        return self.respond(model, messages, kwargs.get("optional_params") or {})
+
+    def streaming(self, model: str, messages: list, *args, **kwargs) -> Iterator[GenericStreamingChunk]:
+        pause = self.think_seconds()
+        response = self.respond(model, messages, kwargs.get("optional_params") or {})
+        message = response.choices[0].message
+        tool_calls = message.tool_calls or []
+        pause /= len(tool_calls) + 1
+        if message.content:
+            time.sleep(pause)
+            yield {"text": message.content, "tool_use": None, "is_finished": False, "finish_reason": "", "usage": None, "index": 0}
+        for index, tool_call in enumerate(tool_calls):
+            time.sleep(pause)
+            yield {
+                "text": "",
+                "tool_use": {
+                    "id": tool_call.id,
+                    "type": "function",
+                    "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments},
+                    "index": index,
+                },
+                "is_finished": False,
+                "finish_reason": "",
+                "usage": None,
+                "index": 0,
+            }
+        if tool_calls:
+            time.sleep(pause)
+        yield {
+            "text": "",
+            "tool_use": None,
+            "is_finished": True,
+            "finish_reason": response.choices[0].finish_reason,
+            "usage": {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens,
+            },
+            "index": 0,
+        }
+
+    def respond(self, model: str, messages: list, optional_params: Dict[str, Any]) -> ModelResponse:
+        if optional_params.get("response_format"):
+            message = {"role": "assistant", "content": self.judge()}
+        else:
+            message = self.act(messages, optional_params.get("tools") or [])
+
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in messages) // 4
+        prompt_tokens += len(json.dumps(optional_params.get("tools") or [])) // 4
+        completion_tokens = len(json.dumps(message)) // 4
+        return ModelResponse(
+            model=model,
+            choices=[{
+                "index": 0,
+                "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+                "message": message,
+            }],
+            usage={
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        )
+
+    def judge(self) -> str:
+        verdict = self.random.random() < self.pass_rate
+        return json.dumps({
+            "reasoning": "Scripted verdict",
+            "verdict": verdict,
+            "confidence": 1.0,
+        })
+
+    def act(self, messages: List[Dict[str, Any]], tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+        prompt = next((m.get("content") for m in messages if m.get("role") == "user"), "")
+        if prompt not in self.scripts_cache:
+            self.scripts_cache[prompt] = find_script(messages)
+        script = self.scripts_cache[prompt]
+
+        tool_names = [tool["function"]["name"] for tool in tools]
+        if script and not all(call["name"] in tool_names for step in script for call in step):
+            # scripts are written for the vibecode toolset, use a generic one-step policy elsewhere
+            script = [[{"name": tool_names[0], "arguments": {}}]] if tool_names else []
+
+        step_idx = sum(1 for m in messages if m.get("role") == "assistant")
+        if step_idx >= len(script):
+            return {"role": "assistant", "content": "Done."}
+
+        last_id = last_object_id(messages) or ""
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:24]}",
+                    "type": "function",
+                    "function": {
+                        "name": call["name"],
+                        "arguments": json.dumps(call["arguments"]).replace("{last_id}", last_id),
+                    },
+                }
+                for call in script[step_idx]
+            ],
+        }
+
+def register_scripted_llm(*, think_time: float = 0.0, pass_rate: float = 0.8, seed: Optional[int] = None) -> ScriptedLLM:
+    """
+    Makes `Model.SCRIPTED` resolvable by litellm.
+    """
+    handler = ScriptedLLM(think_time=think_time, pass_rate=pass_rate, seed=seed)
+    litellm.custom_provider_map = [
+        entry for entry in litellm.custom_provider_map if entry["provider"] != PROVIDER
+    ] + [{"provider": PROVIDER, "custom_handler": handler}]
+    return handler
@@ -0,0 +1,296 @@
+"""
+Splitting a sweep across several runners.
+
+A sweep is a list of trial items, one per (toolset, task, trial index). Runners either
+take a static slice of it with `--shard i/N`, or share a SQLite work queue in which
+every item is leased to one runner at a time and kept alive with heartbeats. Each
+runner writes its own shard results file; `merge.py` folds them into the regular
+results files that `process.py` reads.
+
+Every trial resets the whole HubSpot portal, so runners working at the same time need
+a portal each: the GitHub workflow gives shard `i` the `HUBSPOT_API_KEY_<i>` secret, and
+a queue refuses a second live worker with the same HubSpot key.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple
+from pydantic import BaseModel
+from .results import RESULTS_DIR, open_results_path
+
+SHARDS_DIR = os.path.join(RESULTS_DIR, "shards")
+
+class TrialItem(BaseModel):
+    toolset: str # results file name of the toolset, e.g. `superface_toolset`
+    task: str
+    trial_idx: int
+    trials_count: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.toolset}/{self.task}/{self.trial_idx}"
+
+class Shard(BaseModel):
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, value: str) -> "Shard":
+        """
+        Parses `i/N` where `0 <= i < N`.
+        """
+        try:
+            index, count = (int(part) for part in value.split("/"))
+        except ValueError:
+            raise ValueError(f"Invalid shard '{value}', expected format i/N")
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Invalid shard '{value}', expected 0 <= i < N")
+        return cls(index=index, count=count)
+
+    @property
+    def name(self) -> str:
+        return f"{self.index}of{self.count}"
+
+    def select(self, items: List[TrialItem]) -> List[TrialItem]:
+        return [item for i, item in enumerate(items) if i % self.count == self.index]
+
+def enumerate_trials(toolsets: Iterable[str], tasks: Iterable[str], trials_count: int) -> List[TrialItem]:
+    tasks = list(tasks)
+    return [
+        TrialItem(toolset=toolset, task=task, trial_idx=i, trials_count=trials_count)
+        for toolset in toolsets
+        for task in tasks
+        for i in range(1, trials_count+1)
+    ]
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def portal_fingerprint() -> str:
+    """
+    Identifies the HubSpot portal of this runner by its key, without storing the key.
+    """
+    return hashlib.sha256((os.getenv("HUBSPOT_API_KEY") or "").encode()).hexdigest()[:16]
+
+def open_shard_results_file(toolset: str, shard_name: str, *, append: bool = False) -> TextIO:
+    """
+    A static shard starts its file over, so a rerun doesn't leave the old results next to
+    the new ones; queue workers append, they pick up where a restarted worker stopped.
+    """
+    if not os.path.exists(SHARDS_DIR):
+        os.makedirs(SHARDS_DIR)
+    return open(os.path.join(SHARDS_DIR, f"{toolset}.{shard_name}.jsonl"), "a" if append else "w")
+
+class WorkQueue:
+    """
+    SQLite-backed queue of trial items. A leased item is handed to another runner once
+    its lease expires without a heartbeat, up to `max_attempts` times.
+    """
+
+    def __init__(self, path: str, *, lease_seconds: float = 300, max_attempts: int = 3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    key TEXT PRIMARY KEY,
+                    item TEXT NOT NULL,
+                    toolset TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS workers (
+                    worker TEXT PRIMARY KEY,
+                    portal TEXT NOT NULL,
+                    seen_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def enqueue(self, items: Iterable[TrialItem]):
+        """
+        Adds items that are not in the queue yet, so every runner can enqueue the same matrix.
+        """
+        with closing(self._connect()) as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO items (key, item, toolset, updated_at) VALUES (?, ?, ?, ?)",
+                [(item.key, item.model_dump_json(), item.toolset, time.time()) for item in items]
+            )
+
+    def claim_portal(self, worker: str, portal: str):
+        """
+        Registers the worker with its HubSpot portal, raises ValueError when another worker
+        seen within the lease time uses the same one, its resets would wipe this worker's trials.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT worker FROM workers WHERE portal = ? AND worker != ? AND seen_at > ?",
+                (portal, worker, now - self.lease_seconds)
+            ).fetchone()
+            if row is not None:
+                conn.execute("ROLLBACK")
+                raise ValueError(f"Worker {row[0]} already runs against this HubSpot portal, give each worker its own HUBSPOT_API_KEY")
+            conn.execute(
+                "INSERT OR REPLACE INTO workers (worker, portal, seen_at) VALUES (?, ?, ?)",
+                (worker, portal, now)
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def release_portal(self, worker: str):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM workers WHERE worker = ?", (worker,))
+
+    def _seen(self, conn: sqlite3.Connection, worker: str, now: float):
+        conn.execute("UPDATE workers SET seen_at = ? WHERE worker = ?", (now, worker))
+
+    def lease(self, owner: str, toolsets: List[str]) -> Optional[TrialItem]:
+        now = time.time()
+        placeholders = ",".join("?" for _ in toolsets)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._seen(conn, owner, now)
+            row = conn.execute(
+                f"""
+                SELECT key, item FROM items
+                WHERE toolset IN ({placeholders})
+                  AND attempts < ?
+                  AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                ORDER BY rowid LIMIT 1
+                """,
+                (*toolsets, self.max_attempts, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE items SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? WHERE key = ?",
+                (owner, now + self.lease_seconds, now, row[0])
+            )
+            conn.execute("COMMIT")
+            return TrialItem.model_validate_json(row[1])
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, item: TrialItem, owner: str) -> bool:
+        """
+        Extends the lease, returns False if the item was taken over by another runner.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            self._seen(conn, owner, now)
+            cursor = conn.execute(
+                "UPDATE items SET lease_expires = ?, updated_at = ? WHERE key = ? AND owner = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, item.key, owner)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, item: TrialItem, owner: str):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE items SET status = 'done', lease_expires = NULL, updated_at = ? WHERE key = ? AND owner = ?",
+                (time.time(), item.key, owner)
+            )
+
+    def release(self, item: TrialItem, owner: str):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE items SET status = 'pending', owner = NULL, lease_expires = NULL, updated_at = ? WHERE key = ? AND owner = ?",
+                (time.time(), item.key, owner)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall())
+
+class Heartbeat:
+    """
+    Context manager that keeps the lease of an item alive while a trial runs.
+    """
+
+    def __init__(self, queue: WorkQueue, item: TrialItem, owner: str):
+        self.queue = queue
+        self.item = item
+        self.owner = owner
+        self.interval = queue.lease_seconds / 3
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+
+    def _beat(self):
+        while not self._stop.wait(self.interval):
+            if not self.queue.heartbeat(self.item, self.owner):
+                print(f"⚠️ Lost lease for {self.item.key}")
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def merge_shards(shards_dir: str = SHARDS_DIR) -> List[Tuple[str, int, int, int]]:
+    """
+    Merges `{toolset}.{shard}.jsonl` files into `{toolset}.jsonl` results files.
+    Duplicate trials, e.g. from an expired lease or a rerun, keep their latest occurrence:
+    the last line of the most recently written file. A last line without a newline was cut
+    off by a worker that died mid-write, its trial is rerun once the lease expires.
+    Returns (toolset, merged trials, dropped duplicates, skipped partial lines) for each toolset.
+    """
+    lines_per_toolset: Dict[str, Dict[Tuple[str, int], str]] = {}
+    duplicates: Dict[str, int] = {}
+    partial: Dict[str, int] = {}
+    for path in sorted(glob.glob(os.path.join(shards_dir, "*.jsonl")), key=lambda path: (os.path.getmtime(path), path)):
+        toolset = os.path.basename(path).split(".", 1)[0]
+        lines = lines_per_toolset.setdefault(toolset, {})
+        duplicates.setdefault(toolset, 0)
+        partial.setdefault(toolset, 0)
+        with open(path, "r") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    partial[toolset] += 1
+                    break
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                key = (result["task"]["name"], result["trial_idx"])
+                if key in lines:
+                    duplicates[toolset] += 1
+                lines[key] = line
+
+    merged = []
+    for toolset, lines in lines_per_toolset.items():
+        task_order: Dict[str, int] = {}
+        for task_name, _ in lines:
+            task_order.setdefault(task_name, len(task_order))
+        with open_results_path(toolset) as f:
+            for key in sorted(lines, key=lambda key: (task_order[key[0]], key[1])):
+                f.write(lines[key])
+        merged.append((toolset, len(lines), duplicates[toolset], partial[toolset]))
+    return merged
@@ -1,12 +1,16 @@
 import abc
+import json
 from pydantic import BaseModel
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
+
+CrmScope = Dict[str, List[str]] # object type -> properties, empty for the discovered defaults
 
 class Task(BaseModel):
     name: str
     prompt: str
     outcome: str
+    crm_scope: Optional[CrmScope] = None # object types and properties the outcome depends on, all when not set
 
 class CrmStateEngagements(BaseModel):
     emails: List[Dict[str, Any]]
@@ -24,6 +28,7 @@ class CrmState(BaseModel):
 class Model(str, Enum):
     GPT_4o = "openai/gpt-4o"
     GPT_4o_MINI = "openai/gpt-4o-mini"
+    SCRIPTED = "scripted/crm" # local stand-in, see src/scripted_llm.py
     #CLAUDE_35 = "anthropic/claude-3.5"
     #CLAUDE_37 = "anthropic/claude-3.7"
     #GEMINI_20 = "google/gemini-2.0"
@@ -44,6 +49,7 @@ class SolveResult(BaseModel):
     crm_state: Optional[CrmState] = None
     error: Optional[str] = None
     verdict: Optional[Verdict] = None
+    blobs: Optional[Dict[str, str]] = None # field name -> blob store reference, see src/blob_store.py
 
 class Agent(abc.ABC):
     @abc.abstractmethod
@@ -75,19 +81,39 @@ class Tool(abc.ABC):
     def run(self, arguments: Dict[str, Any]):
         return self.handler(arguments)
 
+class ToolAccess(BaseModel):
+    write: bool
+    object_types: Optional[List[str]] = None # touched by the call, all when not set
+
+type ToolClassifier = Callable[[str, Dict[str, Any]], Optional[ToolAccess]] # tool name, arguments -> access, None when unknown
+
 class Toolset:
     name: str
     tools: List[Tool]
+    classify: Optional[ToolClassifier]
 
-    def __init__(self, name: str, tools: List[Tool]):
+    def __init__(self, name: str, tools: List[Tool], classify: Optional[ToolClassifier] = None):
         self.name = name
         self.tools = tools
+        self.classify = classify
 
     def __getitem__(self, item):
         for tool in self.tools:
             if tool.name == item:
                 return tool
         raise KeyError(f"Tool {item} not found.")
+
+    def access(self, tool_name: str, arguments: Any) -> Optional[ToolAccess]:
+        """
+        What a call of the tool reads or writes, None when the toolset can't tell.
+        """
+        if self.classify is None:
+            return None
+        try:
+            parsed = json.loads(arguments) if isinstance(arguments, str) else arguments
+        except json.JSONDecodeError:
+            return None
+        return self.classify(tool_name, parsed) if isinstance(parsed, dict) else None
     
     def __iter__(self):
         return iter(self.tools)
@@ -0,0 +1,118 @@
+"""
+Streaming completions with pipelined tool calls.
+
+In streaming mode the agent reads each completion as a stream and feeds the tool call
+deltas to a `ToolPipeline`, which assembles them by index. A call's arguments are
+complete once the next call starts or the stream ends, and its handler starts right
+away while the model is still writing the later calls or text. Handlers of one step
+still run one after another, in the order the model wrote them, as without streaming;
+what's saved is the tool time that overlaps with generation.
+
+Per step the pipeline records the time from the request to the first handler start,
+how long the stream and the handlers took, and how many handler seconds overlapped
+with the stream.
+"""
+
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+from .profiler import inherit_stage
+
+class ToolPipeline:
+    def __init__(self, run_call: Callable[[str, str], Any]):
+        """
+        `run_call(name, arguments)` runs one tool call and returns its response.
+        """
+        self.run_call = run_call
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tool-pipeline")
+        self.calls: List[Dict[str, Any]] = []
+        self.futures: List[Future] = []
+        self.spans: List[List[float]] = [] # started, finished per handler
+        self.failed = False
+        self.requested_at = time.perf_counter()
+        self.stream_ended_at: Optional[float] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        # after a failed stream the queued calls never need to run
+        self.executor.shutdown(wait=False, cancel_futures=exc_type is not None)
+
+    def feed(self, deltas: Optional[List[Any]]):
+        """
+        Takes the `tool_calls` of one stream chunk's delta.
+        """
+        for delta in deltas or []:
+            index = delta.index if delta.index is not None else max(len(self.calls) - 1, 0)
+            while len(self.calls) <= index:
+                self.calls.append({"id": None, "name": "", "arguments": ""})
+            # a later call started, the ones before it are complete
+            self.start_until(index)
+            call = self.calls[index]
+            call["id"] = delta.id or call["id"]
+            if delta.function is not None:
+                # names arrive whole, arguments in fragments
+                call["name"] = call["name"] or delta.function.name or ""
+                call["arguments"] += delta.function.arguments or ""
+
+    def finish(self):
+        """
+        Marks the end of the stream and starts the calls still waiting for it.
+        """
+        self.stream_ended_at = time.perf_counter()
+        self.start_until(len(self.calls))
+
+    def start_until(self, index: int):
+        while len(self.futures) < index:
+            call = self.calls[len(self.futures)]
+            context = contextvars.copy_context()
+            self.futures.append(self.executor.submit(context.run, inherit_stage, self.run_timed, call["name"], call["arguments"]))
+
+    def run_timed(self, name: str, arguments: str) -> Any:
+        if self.failed:
+            # an earlier call of the step failed, as without streaming the rest don't run
+            raise RuntimeError(f"Tool {name} skipped after an earlier tool call failed")
+        span = [time.perf_counter(), 0.0]
+        self.spans.append(span)
+        try:
+            return self.run_call(name, arguments)
+        except BaseException:
+            self.failed = True
+            raise
+        finally:
+            span[1] = time.perf_counter()
+
+    def ran(self, index: int) -> bool:
+        """
+        Whether the call at `index` ran, waiting for its turn, calls after a failed one don't.
+        """
+        wait([self.futures[index]])
+        return index < len(self.spans)
+
+    def response(self, index: int) -> Any:
+        """
+        Response of the call at `index`, waiting for it to finish, raises its failure.
+        """
+        return self.futures[index].result()
+
+    def info(self) -> Dict[str, Any]:
+        stream_ended_at = self.stream_ended_at or time.perf_counter()
+        overlap = sum(max(min(finished, stream_ended_at) - started, 0.0) for started, finished in self.spans)
+        return {
+            "tool_calls": len(self.calls),
+            "time_to_first_tool": round(self.spans[0][0] - self.requested_at, 4) if self.spans else None,
+            "stream_seconds": round(stream_ended_at - self.requested_at, 4),
+            "tool_seconds": round(sum(finished - started for started, finished in self.spans), 4),
+            "overlap_seconds": round(overlap, 4),
+        }
+
+def summarize_streaming(steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+    with_tools = [step for step in steps if step["time_to_first_tool"] is not None]
+    return {
+        "steps": steps,
+        "time_to_first_tool_avg": round(sum(step["time_to_first_tool"] for step in with_tools) / len(with_tools), 4) if with_tools else None,
+        "tool_seconds": round(sum(step["tool_seconds"] for step in steps), 4),
+        "overlap_seconds": round(sum(step["overlap_seconds"] for step in steps), 4),
+    }
@@ -0,0 +1,53 @@
+import json
+import os
+from superface import Superface
+from superface.client.superface import SuperfaceAPI
+from .shared import Tool, Toolset
+
+def create_superface_toolset() -> Toolset:
+    superface = Superface(api_key=os.getenv("SUPERFACE_API_KEY"))
+    sf_tools = superface.get_tools(user_id="benchmark")
+    return Toolset(
+        name="Superface Toolset",
+        tools=[
+            Tool(
+                name=tool.name,
+                description=tool.description,
+                parameters=tool.input_schema_raw,
+                handler=lambda arguments, tool=tool: tool.run(arguments),
+            )
+            for tool in sf_tools
+        ]
+    )
+
+def create_superface_specialiasts_toolset() -> Toolset:
+    superface = SuperfaceAPI(api_key=os.getenv("SUPERFACE_API_KEY"), base_url="https://pod.superface.ai")
+    specialist_fd = superface.get(path='/api/specialists/hubspot', user_id="benchmark")
+
+    return Toolset(
+        name="Superface Specialist Toolset",
+        tools=[
+            Tool(
+                name=specialist_fd['name'],
+                description=specialist_fd['description'],
+                parameters=specialist_fd['parameters'],
+                handler=lambda arguments: superface.post(path='/api/specialists/hubspot', data=json.loads(arguments), user_id="benchmark"),
+            )
+        ]
+    )
+
+def create_superface_dynamic_specialists_toolset() -> Toolset:
+    superface = SuperfaceAPI(api_key=os.getenv("SUPERFACE_API_KEY"), base_url="https://pod.superface.ai")
+    specialist_fd = superface.get(path='/api/specialists/dynamic/hubspot', user_id="benchmark")
+
+    return Toolset(
+        name="Superface Dynamic Specialist Toolset",
+        tools=[
+            Tool(
+                name=specialist_fd['name'],
+                description=specialist_fd['description'],
+                parameters=specialist_fd['parameters'],
+                handler=lambda arguments: superface.post(path='/api/specialists/dynamic/hubspot', data=json.loads(arguments), user_id="benchmark"),
+            )
+        ]
+    )
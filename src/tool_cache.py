@@ -0,0 +1,149 @@
+"""
+Per-trial memoization of read-only tool calls.
+
+With `--tool-cache` every trial gets a `ToolCache` in front of the toolset. The toolset's
+`classify(tool_name, arguments)` tells whether a call reads or writes and which object
+types it touches. A read is served from the cache when the same tool was called with the
+same arguments earlier in the trial and no write touched its object types since; a write
+drops the cached reads of the object types it touches. Calls the toolset can't classify,
+and all calls of toolsets without `classify`, go to the backend and count as writes to
+every object type. Error responses are never cached.
+
+`info.tool_cache` records reads, hits, writes, invalidated entries and the seconds the
+hits saved, each hit counted at the duration of the call that filled its entry.
+"""
+
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, List, Optional
+from .processing.pass_k import ROUND_TO_DECIMALS, ResultCounts, add_totals, feature_totals, register_counter
+from .shared import Toolset
+from .trajectory_monitor import fingerprint, is_error_response
+
+class CacheEntry:
+    def __init__(self, response: Any, object_types: Optional[List[str]], seconds: float):
+        self.response = response
+        self.object_types = object_types
+        self.seconds = seconds
+
+class ToolCache:
+    def __init__(self, toolset: Toolset):
+        self.toolset = toolset
+        self.tool_names = {tool.name for tool in toolset.tools}
+        self.lock = threading.Lock()
+        self.entries: Dict[str, CacheEntry] = {}
+        self.reads = 0
+        self.hits = 0
+        self.writes = 0
+        self.invalidated = 0
+        self.saved_seconds = 0.0
+
+    def call(self, tool_name: str, arguments: Any, run: Callable[[], Any]) -> Any:
+        if tool_name not in self.tool_names:
+            # local tools like find_tools don't touch the CRM
+            return run()
+
+        try:
+            parsed = json.loads(arguments) if isinstance(arguments, str) else arguments
+        except json.JSONDecodeError:
+            parsed = None
+        access = None
+        if self.toolset.classify is not None and isinstance(parsed, dict):
+            access = self.toolset.classify(tool_name, parsed)
+        if access is None or access.write:
+            with self.lock:
+                self.writes += 1
+                self.invalidate(access.object_types if access else None)
+            return run()
+
+        # parsed, so the same arguments in a different key order or spacing match
+        key = fingerprint({"name": tool_name, "arguments": parsed})
+        with self.lock:
+            self.reads += 1
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self.saved_seconds += entry.seconds
+                return entry.response
+
+        started = time.monotonic()
+        response = run()
+        if not is_error_response(response):
+            with self.lock:
+                self.entries[key] = CacheEntry(response, access.object_types, time.monotonic() - started)
+        return response
+
+    def invalidate(self, object_types: Optional[List[str]]):
+        for key, entry in list(self.entries.items()):
+            if object_types is None or entry.object_types is None or set(entry.object_types) & set(object_types):
+                del self.entries[key]
+                self.invalidated += 1
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "reads": self.reads,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.reads, 4) if self.reads else 0.0,
+            "writes": self.writes,
+            "invalidated": self.invalidated,
+            "saved_seconds": round(self.saved_seconds, 4),
+        }
+
+_enabled = False
+_cache: contextvars.ContextVar[Optional[ToolCache]] = contextvars.ContextVar("tool_cache", default=None)
+
+def install_tool_cache():
+    global _enabled
+    _enabled = True
+
+def tool_cache_installed() -> bool:
+    return _enabled
+
+def tool_cache_scope(toolset: Toolset):
+    """
+    Memoizes the reads of one trial, when the cache is installed.
+    """
+    if not _enabled:
+        return nullcontext(None)
+    return _scope(ToolCache(toolset))
+
+@contextmanager
+def _scope(cache: ToolCache):
+    token = _cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _cache.reset(token)
+
+def cached_tool_call(tool_name: str, arguments: Any, run: Callable[[], Any]) -> Any:
+    cache = _cache.get()
+    if cache is None:
+        return run()
+    return cache.call(tool_name, arguments, run)
+
+# === Results ===
+
+def count_cache(totals: Dict[str, int], passed: bool, cache: Dict[str, Any]):
+    add_totals(totals, trials=1, reads=cache["reads"], hits=cache["hits"], saved_ms=round(cache["saved_seconds"] * 1000))
+
+register_counter("tool_cache", count_cache)
+
+def cache_summary(counts: ResultCounts) -> Optional[Dict[str, float]]:
+    """
+    Tool cache hit rate and the tool call time it saved, for runs with `--tool-cache`.
+    """
+    totals = feature_totals(counts, "tool_cache").values()
+    trials = sum(task_totals["trials"] for task_totals in totals)
+    if not trials:
+        return None
+    reads = sum(task_totals["reads"] for task_totals in totals)
+    hits = sum(task_totals["hits"] for task_totals in totals)
+    return {
+        "trials": trials,
+        "reads": reads,
+        "hit_rate": round(hits / reads, ROUND_TO_DECIMALS) if reads else 0.0,
+        "saved_seconds_per_trial": round(sum(task_totals["saved_ms"] for task_totals in totals) / 1000 / trials, 3),
+    }
@@ -0,0 +1,208 @@
+"""
+Per-task tool retrieval.
+
+Instead of sending every tool schema with every completion, `ToolSelection` exposes the
+`top_k` tools that best match the task prompt under a local BM25 index over tool names,
+descriptions and parameters, plus a `find_tools` tool. When the model calls `find_tools`
+with a description of what it needs, the best matching tools not yet exposed are added
+for the following steps, so the exposed set only grows and the request prefix stays
+stable between widenings.
+"""
+
+import json
+import math
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
+from .processing.pass_k import AVG_LITERAL, ROUND_TO_DECIMALS, ResultCounts, add_totals, feature_totals, pass_k_from_counts, register_counter
+from .shared import Tool
+
+FIND_TOOLS = "find_tools"
+STOPWORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or", "the", "this", "to", "with"}
+
+def tokenize(text: str) -> List[str]:
+    # split snake_case, camelCase and punctuation, fold simple plurals
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return [word[:-1] if len(word) > 3 and word.endswith("s") else word for word in words if word not in STOPWORDS]
+
+def schema_strings(value: Any) -> Iterable[str]:
+    """
+    Property names and descriptions of a JSON schema
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == "properties" and isinstance(item, dict):
+                yield from item.keys()
+            if key in ("description", "title") and isinstance(item, str):
+                yield item
+            yield from schema_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from schema_strings(item)
+
+def tool_text(tool: Tool) -> str:
+    # the name counts twice, it's the most specific part
+    return " ".join([tool.name, tool.name, tool.description or "", *schema_strings(tool.parameters)])
+
+class ToolRetriever:
+    """
+    Okapi BM25 over tool texts
+    """
+
+    def __init__(self, tools: List[Tool], *, k1: float = 1.5, b: float = 0.75):
+        self.tools = tools
+        self.k1 = k1
+        self.b = b
+        self.docs = [tokenize(tool_text(tool)) for tool in tools]
+        self.avg_length = sum(len(doc) for doc in self.docs) / len(self.docs) if self.docs else 0.0
+        self.doc_freq: Dict[str, int] = {}
+        for doc in self.docs:
+            for term in set(doc):
+                self.doc_freq[term] = self.doc_freq.get(term, 0) + 1
+
+    def idf(self, term: str) -> float:
+        n = self.doc_freq.get(term, 0)
+        return math.log(1 + (len(self.docs) - n + 0.5) / (n + 0.5))
+
+    def rank(self, query: str, *, exclude: Set[str] = frozenset()) -> List[Tool]:
+        terms = set(tokenize(query))
+        scored = []
+        for ix, (tool, doc) in enumerate(zip(self.tools, self.docs)):
+            if tool.name in exclude:
+                continue
+            score = 0.0
+            for term in terms:
+                freq = doc.count(term)
+                if freq:
+                    norm = freq + self.k1 * (1 - self.b + self.b * len(doc) / self.avg_length)
+                    score += self.idf(term) * freq * (self.k1 + 1) / norm
+            scored.append((-score, ix, tool))
+        return [tool for _, _, tool in sorted(scored, key=lambda item: item[:2])]
+
+class ToolSelection:
+    """
+    Tools exposed to one trajectory
+    """
+
+    def __init__(self, tools: List[Tool], *, query: str, top_k: int, model: str):
+        self.tools = tools
+        self.top_k = top_k
+        self.model = model
+        self.retriever = ToolRetriever(tools)
+        self.exposed: List[str] = [tool.name for tool in self.retriever.rank(query)[:top_k]]
+        self.widenings = 0
+        self.sent_tokens = 0
+        self.full_tokens = 0
+        self._tokens_cache: Dict[tuple, int] = {}
+        self.find_tools = Tool(
+            name=FIND_TOOLS,
+            description=(
+                "Find more tools. Only some of the available tools are listed, describe what you need to do "
+                "and the best matching tools become available from the next step."
+            ),
+            parameters={
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "What the tool should do, e.g. 'associate a contact with a company'"},
+                },
+                "required": ["query"],
+            },
+            handler=self.widen,
+        )
+
+    def widen(self, arguments: Any) -> Dict[str, Any]:
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments)
+            except json.JSONDecodeError:
+                arguments = {"query": arguments}
+        query = str((arguments or {}).get("query", ""))
+        found = self.retriever.rank(query, exclude=set(self.exposed))[:self.top_k]
+        if not found:
+            return {"error": "All tools are already available"}
+        self.exposed.extend(tool.name for tool in found)
+        self.widenings += 1
+        return {"tools": [{"name": tool.name, "description": tool.description} for tool in found]}
+
+    def available(self) -> List[Tool]:
+        """
+        Tools that can be sent. Every tool of the toolset stays callable, in case the model knows its name.
+        """
+        exposed = set(self.exposed)
+        tools = [tool for tool in self.tools if tool.name in exposed]
+        if len(exposed) < len(self.tools):
+            tools.append(self.find_tools)
+        return tools
+
+    def lookup(self, name: str) -> Optional[Tool]:
+        if name == FIND_TOOLS:
+            return self.find_tools
+        return next((tool for tool in self.tools if tool.name == name), None)
+
+    def count_tokens(self, schemas: List[Dict[str, Any]]) -> int:
+        key = tuple(schema["function"]["name"] for schema in schemas)
+        if key not in self._tokens_cache:
+            from litellm import token_counter
+            self._tokens_cache[key] = token_counter(model=self.model, text=json.dumps(schemas))
+        return self._tokens_cache[key]
+
+    def record_step(self, sent: List[Dict[str, Any]], full: List[Dict[str, Any]]):
+        self.sent_tokens += self.count_tokens(sent)
+        self.full_tokens += self.count_tokens(full)
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "top_k": self.top_k,
+            "total_tools": len(self.tools),
+            "exposed_tools": len(self.exposed),
+            "widenings": self.widenings,
+            "schema_tokens": self.sent_tokens,
+            "schema_tokens_full": self.full_tokens,
+            "schema_tokens_saved": self.full_tokens - self.sent_tokens,
+        }
+
+# === Results ===
+
+def count_retrieval(totals: Dict[str, int], passed: bool, retrieval: Dict[str, Any]):
+    add_totals(
+        totals,
+        trials=1,
+        passed=1 if passed else 0,
+        schema_tokens=retrieval["schema_tokens"],
+        schema_tokens_full=retrieval["schema_tokens_full"],
+    )
+
+register_counter("tool_retrieval", count_retrieval)
+
+def retrieval_summary(counts: ResultCounts) -> Optional[Dict[str, Any]]:
+    """
+    Tool schema tokens sent with and without tool retrieval, for runs with `--tool-top-k`,
+    and the average pass^k of trials with retrieval next to the other trials in the file.
+    """
+    totals = feature_totals(counts, "tool_retrieval")
+    trials = sum(task_totals["trials"] for task_totals in totals.values())
+    if not trials:
+        return None
+    sent = sum(task_totals["schema_tokens"] for task_totals in totals.values())
+    full = sum(task_totals["schema_tokens_full"] for task_totals in totals.values())
+    with_retrieval = {
+        task_name: {"n": task_totals["trials"], "c": task_totals["passed"], "k": counts[task_name]["k"]}
+        for task_name, task_totals in totals.items()
+    }
+    without_retrieval = {
+        task_name: {
+            "n": task_counts["n"] - totals.get(task_name, {}).get("trials", 0),
+            "c": task_counts["c"] - totals.get(task_name, {}).get("passed", 0),
+            "k": task_counts["k"],
+        }
+        for task_name, task_counts in counts.items()
+    }
+    return {
+        "trials": trials,
+        "schema_tokens_per_trial": round(sent / trials, 1),
+        "schema_tokens_full_per_trial": round(full / trials, 1),
+        "schema_tokens_saved": round(1 - sent / full, ROUND_TO_DECIMALS) if full else 0.0,
+        "pass_k": pass_k_from_counts(with_retrieval)[AVG_LITERAL],
+        "trials_without": sum(task_counts["n"] for task_counts in without_retrieval.values()),
+        "pass_k_without": pass_k_from_counts(without_retrieval)[AVG_LITERAL],
+    }
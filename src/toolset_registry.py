@@ -0,0 +1,50 @@
+"""
+Toolsets by CLI name.
+
+Every toolset is registered as the `module:function` path of its creator, and the module
+is imported only when the toolset is created, so listing names doesn't pay for the SDK
+imports. Other packages can add toolsets without editing this repo by declaring an entry
+point in the `crm_tools_benchmark.toolsets` group, e.g. in their pyproject.toml:
+
+    [project.entry-points."crm_tools_benchmark.toolsets"]
+    my_toolset = "my_package.toolset:create_toolset"
+
+The creator takes no arguments and returns a `Toolset`.
+"""
+
+import importlib
+from functools import lru_cache
+from importlib.metadata import entry_points
+from typing import Dict, List
+from .shared import Toolset
+
+ENTRY_POINT_GROUP = "crm_tools_benchmark.toolsets"
+
+BUILTIN_TOOLSETS = {
+    "superface": "src.superface_toolset:create_superface_toolset",
+    "superface_specialist": "src.superface_toolset:create_superface_specialiasts_toolset",
+    "superface_dynamic_specialist": "src.superface_toolset:create_superface_dynamic_specialists_toolset",
+    "composio": "src.composio_toolset:create_composio_toolset",
+    "vibecode": "src.vibecode_toolset:create_vibecode_toolset",
+}
+
+@lru_cache(maxsize=1)
+def toolset_paths() -> Dict[str, str]:
+    paths = dict(BUILTIN_TOOLSETS)
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        if entry_point.name in paths:
+            print(f"⚠️ Toolset {entry_point.name} from {entry_point.value} ignored, the name is taken by {paths[entry_point.name]}")
+            continue
+        paths[entry_point.name] = entry_point.value
+    return paths
+
+def toolset_names() -> List[str]:
+    return list(toolset_paths())
+
+def create_toolset(name: str) -> Toolset:
+    path = toolset_paths().get(name)
+    if path is None:
+        raise ValueError(f"Unknown toolset {name}, expected one of: {', '.join(toolset_names())}")
+    module_name, _, function_name = path.partition(":")
+    creator = getattr(importlib.import_module(module_name), function_name)
+    return creator()
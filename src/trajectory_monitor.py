@@ -0,0 +1,95 @@
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+def fingerprint(value: Any) -> str:
+    """
+    Stable short hash of a JSON-like value. Strings holding JSON are parsed first,
+    so the same arguments with different key order or whitespace match.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            pass
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+def is_error_response(response: Any) -> bool:
+    return isinstance(response, dict) and bool(response.get("error"))
+
+class TrajectoryMonitor:
+    """
+    Watches the tool calls and responses of one agent trajectory and reports when
+    it stops making progress:
+
+    - `repeated_tool_call`: the same call with identical arguments got the same response `max_repeats` times
+    - `error_streak`: `max_error_streak` tool calls in a row returned an error
+    - `alternating_steps`: the last steps alternate between two states `max_alternations` times
+    """
+
+    def __init__(self, *, max_repeats: int = 3, max_error_streak: int = 5, max_alternations: int = 3):
+        self.max_repeats = max_repeats
+        self.max_error_streak = max_error_streak
+        self.max_alternations = max_alternations
+        self.call_counts: Dict[str, int] = {}
+        self.step_fingerprints: List[str] = []
+        self.error_streak = 0
+        self.tool_calls = 0
+        self.tool_errors = 0
+        self.last_error: Optional[str] = None
+        self.stop_reason: Optional[str] = None
+        self.stop_details: Dict[str, Any] = {}
+
+    def observe_tool_call(self, tool_name: str, arguments: Any, response: Any) -> Optional[str]:
+        # the arguments come as the JSON string of the completion, fingerprinted first to parse it
+        call_fp = fingerprint({"name": tool_name, "arguments": fingerprint(arguments), "response": response})
+        self.call_counts[call_fp] = self.call_counts.get(call_fp, 0) + 1
+        self.tool_calls += 1
+
+        if is_error_response(response):
+            self.tool_errors += 1
+            self.error_streak += 1
+            self.last_error = str(response["error"])
+        else:
+            self.error_streak = 0
+
+        if self.stop_reason is None:
+            if self.call_counts[call_fp] >= self.max_repeats:
+                self._stop("repeated_tool_call", tool=tool_name, count=self.call_counts[call_fp])
+            elif self.error_streak >= self.max_error_streak:
+                self._stop("error_streak", tool=tool_name, count=self.error_streak, error=self.last_error)
+
+        return call_fp
+
+    def observe_step(self, call_fingerprints: List[str]) -> Optional[str]:
+        """
+        Records the fingerprints of one step's tool calls and returns the stop reason, if any.
+        """
+        self.step_fingerprints.append(fingerprint(call_fingerprints))
+
+        if self.stop_reason is None and self._is_alternating():
+            self._stop("alternating_steps", count=self.max_alternations)
+
+        return self.stop_reason
+
+    def _is_alternating(self) -> bool:
+        window = 2 * self.max_alternations
+        steps = self.step_fingerprints[-window:]
+        if len(steps) < window or steps[0] == steps[1]:
+            return False
+        return all(step == steps[i % 2] for i, step in enumerate(steps))
+
+    def _stop(self, reason: str, **details):
+        self.stop_reason = reason
+        self.stop_details = details
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "stop_reason": self.stop_reason,
+            "stop_details": self.stop_details,
+            "steps": len(self.step_fingerprints),
+            "tool_calls": self.tool_calls,
+            "tool_errors": self.tool_errors,
+            "unique_tool_calls": len(self.call_counts),
+        }
@@ -0,0 +1,50 @@
+from typing import Any, Dict, List, Optional, Set
+
+# models without a price in litellm's cost map, looked up only once
+_unpriced_models: Set[str] = set()
+
+def estimate_cost(model: str, *, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """
+    Dollar cost of one completion from litellm's price map, 0 for models it doesn't know.
+    """
+    if model in _unpriced_models:
+        return 0.0
+    from litellm import cost_per_token
+    try:
+        prompt_cost, completion_cost = cost_per_token(
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cache_read_input_tokens=cached_tokens,
+        )
+    except Exception:
+        _unpriced_models.add(model)
+        return 0.0
+    return prompt_cost + completion_cost
+
+def step_usage(response: Any, model: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Token usage reported by the provider for one completion, including prompt tokens
+    served from the provider's prefix cache, and its estimated cost.
+    """
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    step = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", None) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+    }
+    step["cost_usd"] = estimate_cost(model or getattr(response, "model", None) or "", **step)
+    return step
+
+def summarize_usage(steps: List[Dict[str, Any]]) -> Dict[str, Any]:
+    prompt_tokens = sum(step["prompt_tokens"] for step in steps)
+    cached_tokens = sum(step["cached_tokens"] for step in steps)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": sum(step["completion_tokens"] for step in steps),
+        "cached_tokens": cached_tokens,
+        "cache_hit_rate": round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0,
+        "cost_usd": round(sum(step.get("cost_usd", 0.0) for step in steps), 6),
+        "steps": steps,
+    }
@@ -27,7 +27,8 @@ import os
 import json
 import requests
 from typing import Dict, Any, List, Optional
-from .shared import Tool, Toolset
+from .deadline import request_timeout
+from .shared import Tool, ToolAccess, Toolset
 
 HUBSPOT_BASE_URL = "https://api.hubapi.com"
 
@@ -51,13 +52,34 @@ def make_hubspot_request(method: str, endpoint: str, data: Optional[Dict] = None
             method=method,
             url=url,
             headers=headers,
-            json=data
+            json=data,
+            timeout=request_timeout()
         )
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
         return {"error": str(e)}
 
+OBJECT_TOOLS = ["contacts", "companies", "deals", "engagements"]
+
+def classify_vibecode_call(tool_name: str, arguments: Dict[str, Any]) -> Optional[ToolAccess]:
+    """Tell reads from writes for the tool cache."""
+    if tool_name in OBJECT_TOOLS:
+        operation = arguments.get("operation", "search")
+        if operation not in ("create", "search", "update"):
+            return None
+        return ToolAccess(write=operation != "search", object_types=[tool_name])
+    if tool_name == "properties":
+        return ToolAccess(write=False, object_types=["properties"])
+    if tool_name == "associations":
+        operation = arguments.get("operation", "list")
+        if operation == "list":
+            return ToolAccess(write=False, object_types=["association_types"])
+        if operation == "create":
+            object_types = [arguments.get("from_object_type"), arguments.get("to_object_type")]
+            return ToolAccess(write=True, object_types=object_types if all(object_types) else None)
+    return None
+
 def create_vibecode_toolset() -> Toolset:
     """Create a toolset for HubSpot API operations."""
     
@@ -312,4 +334,4 @@ def create_vibecode_toolset() -> Toolset:
         )
     ]
 
-    return Toolset(name="Vibecode Toolset", tools=tools)
+    return Toolset(name="Vibecode Toolset", tools=tools, classify=classify_vibecode_call)
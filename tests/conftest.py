@@ -0,0 +1,22 @@
+import os
+
+# offline: litellm's bundled price map, and a token the vibecode toolset accepts
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+os.environ.setdefault("HUBSPOT_API_KEY", "test")
+
+import pytest
+from unittest import mock
+
+from src.fake_hubspot import FakeHubSpot
+
+@pytest.fixture
+def hubspot():
+    hubspot = FakeHubSpot()
+    # rate limit pauses of reset and dump
+    with hubspot.patch(), mock.patch("time.sleep", lambda seconds: None):
+        yield hubspot
+
+@pytest.fixture
+def results_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.results.RESULTS_DIR", str(tmp_path))
+    return tmp_path
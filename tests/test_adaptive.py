@@ -0,0 +1,63 @@
+import pytest
+
+from src.adaptive import AdaptiveScheduler, beta_cdf, beta_quantile, credible_interval, expected_pass_hat_k
+
+def test_beta_quantile_inverts_cdf():
+    for a, b in [(1, 1), (3, 7), (12, 2)]:
+        for q in [0.05, 0.5, 0.95]:
+            assert beta_cdf(beta_quantile(q, a, b), a, b) == pytest.approx(q, abs=1e-5)
+
+def test_credible_interval_narrows_with_trials():
+    lower, upper = credible_interval(5, 10)
+    lower_more, upper_more = credible_interval(50, 100)
+    assert lower < 0.5 < upper
+    assert upper_more - lower_more < upper - lower
+
+def test_expected_pass_hat_k_is_posterior_mean_for_k_1():
+    assert expected_pass_hat_k(3, 4, 1) == pytest.approx(4 / 6)
+    assert expected_pass_hat_k(3, 4, 2) == pytest.approx(4 / 6 * 5 / 7)
+
+def test_warms_up_cells_in_order_then_picks_widest():
+    scheduler = AdaptiveScheduler(min_trials=2, max_trials=20, ci_width=0.1)
+    for key in ["a", "b"]:
+        scheduler.add_cell(key)
+    order = []
+    for _ in range(4):
+        cell = scheduler.next_cell()
+        order.append(cell.key)
+        scheduler.record(cell.key, True)
+    assert order == ["a", "a", "b", "b"]
+
+    # a split record leaves a wider interval than a unanimous one
+    scheduler.record("b", False)
+    assert scheduler.next_cell().key == "b"
+
+def test_settles_at_max_trials_and_narrow_interval():
+    scheduler = AdaptiveScheduler(min_trials=1, max_trials=3, ci_width=0.5)
+    cell = scheduler.add_cell("a")
+    for _ in range(3):
+        scheduler.record("a", cell.trials % 2 == 0)
+    assert scheduler.is_settled(cell)
+    assert scheduler.next_cell() is None
+
+    narrow = AdaptiveScheduler(min_trials=1, max_trials=100, ci_width=0.3)
+    cell = narrow.add_cell("b")
+    while not narrow.is_settled(cell):
+        narrow.record("b", True)
+    assert cell.trials < 100
+
+def test_gives_up_cells_after_max_excluded():
+    scheduler = AdaptiveScheduler(min_trials=5, max_trials=10, ci_width=0.1, max_excluded=2)
+    scheduler.add_cell("a")
+    scheduler.record_excluded("a")
+    assert scheduler.next_cell().key == "a"
+    cell = scheduler.record_excluded("a")
+    assert scheduler.is_given_up(cell)
+    assert scheduler.next_cell() is None
+    assert cell.trials == 0
+
+def test_exclude_skips_cells():
+    scheduler = AdaptiveScheduler(min_trials=1, max_trials=5, ci_width=0.1)
+    scheduler.add_cell("a")
+    scheduler.add_cell("b")
+    assert scheduler.next_cell(exclude={"a"}).key == "b"
@@ -0,0 +1,92 @@
+import json
+import os
+
+from src.blob_store import BlobStore, externalize, get_crm_state, get_messages, put_crm_state, put_messages, resolve_blobs, split_message
+from src.shared import CrmState, CrmStateEngagements, Model, SolveResult, Task
+
+def record(record_id: str, name: str, created: str) -> dict:
+    return {
+        "id": record_id,
+        "properties": {"name": name, "hs_object_id": record_id, "createdate": created},
+        "createdAt": created,
+        "updatedAt": created,
+        "archived": False,
+        "associations": {"contacts": {"results": [{"id": str(int(record_id) + 100), "type": "company_to_contact"}]}},
+    }
+
+def crm_state(first_id: int, created: str) -> dict:
+    state = CrmState(
+        contacts=[],
+        companies=[record(str(first_id + i), f"Company {i}", created) for i in range(3)],
+        deals=[],
+        engagements=CrmStateEngagements(emails=[], notes=[], calls=[], meetings=[], tasks=[]),
+    )
+    return state.model_dump(mode="json")
+
+def transcript(first_id: int, call_id: str, created: str) -> list:
+    return [
+        {"role": "system", "content": "You are a CRM agent. You can interact with HubSpot."},
+        {"role": "user", "content": "Find ACME"},
+        {"role": "assistant", "content": None, "tool_calls": [{"id": call_id, "type": "function", "function": {"name": "companies", "arguments": "{\"operation\": \"search\"}"}}]},
+        {"role": "tool", "tool_call_id": call_id, "content": json.dumps({"total": 1, "results": [record(str(first_id), "ACME", created)]})},
+        {"role": "tool", "tool_call_id": "call_x", "content": "not json"},
+        {"role": "assistant", "content": "Found it."},
+    ]
+
+def blob_count(root) -> int:
+    return sum(len(files) for _, _, files in os.walk(root))
+
+def test_crm_state_round_trip_and_dedupe(tmp_path):
+    store = BlobStore(str(tmp_path))
+    first, second = crm_state(1, "2025-01-01T00:00:00.000Z"), crm_state(51, "2025-02-01T00:00:00.000Z")
+    refs = [put_crm_state(first, store), put_crm_state(second, store)]
+    assert get_crm_state(refs[0], store) == first
+    assert get_crm_state(refs[1], store) == second
+    # same records under new ids and timestamps: only the manifests differ
+    before = blob_count(tmp_path)
+    put_crm_state(crm_state(91, "2025-03-01T00:00:00.000Z"), store)
+    assert blob_count(tmp_path) == before + 1
+
+def test_messages_round_trip_and_dedupe(tmp_path):
+    store = BlobStore(str(tmp_path))
+    first = transcript(1, "call_1", "2025-01-01T00:00:00.000Z")
+    ref = put_messages(first, store)
+    assert get_messages(ref, BlobStore(str(tmp_path))) == first
+
+    before = blob_count(tmp_path)
+    second = transcript(51, "call_2", "2025-02-01T00:00:00.000Z")
+    ref = put_messages(second, store)
+    assert get_messages(ref, store) == second
+    assert blob_count(tmp_path) == before + 1
+
+def test_split_message_moves_ids_and_timestamps():
+    message = transcript(1, "call_1", "2025-01-01T00:00:00.000Z")[3]
+    volatile, body = split_message(message)
+    assert volatile["tool_call_id"] == "call_1"
+    assert "1" in volatile["content_values"] and "2025-01-01T00:00:00.000Z" in volatile["content_values"]
+    assert "call_1" not in json.dumps(body) and "2025" not in body["content"]
+
+def test_reads_blobs_stored_whole(tmp_path):
+    store = BlobStore(str(tmp_path))
+    messages = transcript(1, "call_1", "2025-01-01T00:00:00.000Z")
+    state = crm_state(1, "2025-01-01T00:00:00.000Z")
+    assert get_messages(store.put(messages), store) == messages
+    assert get_crm_state(store.put(state), store) == state
+
+def test_externalize_and_resolve(tmp_path):
+    store = BlobStore(str(tmp_path))
+    result = SolveResult(
+        task=Task(name="find", prompt="Find ACME", outcome="Found"),
+        model=Model.SCRIPTED,
+        messages=transcript(1, "call_1", "2025-01-01T00:00:00.000Z"),
+        info={},
+        trial_idx=1,
+        trials_count=1,
+        crm_state=CrmState.model_validate(crm_state(1, "2025-01-01T00:00:00.000Z")),
+    )
+    data = externalize(result.model_dump(mode="json"), store)
+    assert data["messages"] == [] and data["crm_state"] is None
+    assert set(data["blobs"]) == {"messages", "crm_state"}
+
+    resolved = resolve_blobs(SolveResult.model_validate(json.loads(json.dumps(data))), store)
+    assert resolved.model_dump(mode="json") == result.model_dump(mode="json")
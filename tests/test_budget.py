@@ -0,0 +1,51 @@
+from src.budget import BudgetGovernor, Spend
+
+def spend(tokens: int, usd: float) -> Spend:
+    trial = Spend()
+    trial.add(tokens, usd)
+    return trial
+
+def test_over_names_the_spent_cap():
+    governor = BudgetGovernor(sweep_usd=10, toolset_tokens=1000, trial_usd=1)
+    assert governor.over("vibecode") is None
+    assert governor.over("vibecode", spend(10, 1.0)) == ("trial", "trial budget spent")
+
+    governor.charge("vibecode", 1000, 0.5)
+    assert governor.over("vibecode") == ("toolset", "vibecode budget spent")
+    assert governor.over("superface") is None
+
+    governor.charge("superface", 0, 9.5)
+    assert governor.over("superface") == ("sweep", "sweep budget spent")
+
+def test_zero_cap_is_spent_from_the_start():
+    governor = BudgetGovernor(trial_tokens=0)
+    assert governor.used("trial", Spend()) == float("inf")
+    assert governor.used("sweep", Spend()) == 0
+
+def test_settled_cells_are_low_value():
+    governor = BudgetGovernor(min_trials=2)
+    governor.record("vibecode", "a", True)
+    assert not governor.is_low_value("vibecode", "a")
+    governor.record("vibecode", "a", True)
+    assert governor.is_low_value("vibecode", "a")
+
+    governor.record("vibecode", "b", True)
+    governor.record("vibecode", "b", False)
+    assert not governor.is_low_value("vibecode", "b")
+
+def test_admit_skips_settled_cells_past_the_soft_limit():
+    governor = BudgetGovernor(sweep_usd=10, soft_limit=0.8, min_trials=2)
+    for passed in (True, True, True, False):
+        governor.record("vibecode", "settled" if passed else "open", passed)
+    governor.record("vibecode", "open", True)
+
+    governor.charge("vibecode", 0, 7.0)
+    assert governor.admit("vibecode", "settled")
+
+    governor.charge("vibecode", 0, 1.0)
+    assert not governor.admit("vibecode", "settled")
+    assert governor.admit("vibecode", "open")
+
+    governor.charge("vibecode", 0, 2.0)
+    assert not governor.admit("vibecode", "open")
+    assert governor.skipped == {"vibecode": 2}
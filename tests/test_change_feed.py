@@ -0,0 +1,95 @@
+import time
+from unittest import mock
+
+import pytest
+import requests
+
+import src.fake_hubspot as fake_hubspot
+from src.change_feed import CrmMirror
+from src.dump_hubspot import BASE_URL, HEADERS, OBJECT_TYPES, dump_hubspot, use_change_feed
+from src.reset_hubspot import reset_hubspot
+
+@pytest.fixture
+def mirror():
+    mirror = CrmMirror()
+    use_change_feed(mirror)
+    yield mirror
+    use_change_feed(None)
+
+def seed_portal(hubspot, size: int) -> dict:
+    """
+    `size` records of every type, created before the trial, and a reset result listing them.
+    """
+    gmtime = time.gmtime
+    with mock.patch.object(fake_hubspot.time, "gmtime", lambda *args: gmtime(time.time() - 10)):
+        hubspot.seed(size)
+        for i in range(1, 50):
+            hubspot.associate("contacts", str(size + i), "companies", str(i))
+    records = {object_type: [hubspot.serialize(object_type, record) for record in hubspot.objects[object_type].values()] for object_type in OBJECT_TYPES}
+    associations = [
+        [object_type, record["id"], to_type, to_id]
+        for object_type in OBJECT_TYPES
+        for record in hubspot.objects[object_type].values()
+        for to_type, ids in record["associations"].items()
+        for to_id in ids
+    ]
+    return {"records": records, "associations": associations, "finished_at": time.time() - 9}
+
+def full_dump(hubspot):
+    use_change_feed(None)
+    hubspot.requests_count.clear()
+    state = dump_hubspot()
+    return state, hubspot.total_requests()
+
+def mirror_dump(hubspot, mirror, touched=None):
+    use_change_feed(mirror)
+    hubspot.requests_count.clear()
+    state = dump_hubspot(touched=touched)
+    return state, hubspot.total_requests()
+
+def test_seeded_dump_of_unchanged_portal_searches_once_per_type(hubspot, mirror):
+    mirror.seed(seed_portal(hubspot, 300))
+
+    # the first dump also discovers the properties of every type
+    expected, _ = full_dump(hubspot)
+    expected, full_requests = full_dump(hubspot)
+    state, requests_made = mirror_dump(hubspot, mirror)
+    assert state == expected
+    assert requests_made == len(OBJECT_TYPES)
+    assert full_requests > requests_made
+    assert mirror.full_loads == 0
+
+def test_seeded_dump_sees_the_trial_changes(hubspot, mirror):
+    mirror.seed(seed_portal(hubspot, 300))
+
+    requests.patch(f"{BASE_URL}/crm/v3/objects/contacts/305", headers=HEADERS, json={"properties": {"firstname": "John"}})
+    deal_id = requests.post(f"{BASE_URL}/crm/v3/objects/deals", headers=HEADERS, json={"properties": {"dealname": "New deal"}}).json()["id"]
+    requests.put(f"{BASE_URL}/crm/v3/objects/deals/{deal_id}/associations/companies/3/deal_to_company", headers=HEADERS)
+    requests.delete(f"{BASE_URL}/crm/v3/objects/companies/7", headers=HEADERS)
+
+    state, requests_made = mirror_dump(hubspot, mirror, touched={"305", deal_id, "3", "7"})
+    expected, full_requests = full_dump(hubspot)
+    assert state == expected
+    assert requests_made < full_requests
+    assert "7" not in {company["id"] for company in state.companies}
+
+def test_small_types_are_listed(hubspot, mirror):
+    mirror.seed(reset_hubspot())
+
+    state, requests_made = mirror_dump(hubspot, mirror)
+    expected, full_requests = full_dump(hubspot)
+    assert state == expected
+    # a single page with its associations, like the full dump
+    assert requests_made == full_requests
+
+def test_unseeded_mirror_syncs_since_previous_dump(hubspot, mirror):
+    hubspot.seed(150, ["contacts", "companies", "deals"])
+    first, _ = mirror_dump(hubspot, mirror)
+    assert mirror.full_loads == len(OBJECT_TYPES)
+
+    requests.patch(f"{BASE_URL}/crm/v3/objects/companies/160", headers=HEADERS, json={"properties": {"name": "Renamed"}})
+    requests.delete(f"{BASE_URL}/crm/v3/objects/contacts/5", headers=HEADERS)
+    state, _ = mirror_dump(hubspot, mirror, touched={"160", "5"})
+    expected, _ = full_dump(hubspot)
+    assert state == expected
+    assert mirror.syncs == 3
@@ -0,0 +1,47 @@
+import json
+
+from src.crm_agent import CRMAgent
+from src.evaluator import Evaluator
+from src.fingerprint import cell_fingerprint, load_baseline
+from src.shared import Model, Task, Tool, Toolset
+
+def make_agent(description: str = "Search contacts", **kwargs) -> CRMAgent:
+    tool = Tool("contacts", description, {"type": "object", "properties": {"query": {"type": "string"}}}, lambda args: {})
+    return CRMAgent(model=Model.SCRIPTED, tools=Toolset("test", [tool]), **kwargs)
+
+TASK = Task(name="create_lead", prompt="Create a lead", outcome="The lead exists")
+
+def test_fingerprint_is_stable():
+    assert cell_fingerprint(make_agent(), TASK) == cell_fingerprint(make_agent(), TASK)
+
+def test_fingerprint_changes_with_inputs(monkeypatch):
+    base = cell_fingerprint(make_agent(), TASK)
+    changed = [
+        cell_fingerprint(make_agent(), TASK.model_copy(update={"prompt": "Create a lead named John"})),
+        cell_fingerprint(make_agent("Search and list contacts"), TASK),
+        cell_fingerprint(make_agent(stream=True), TASK),
+        cell_fingerprint(make_agent(tool_top_k=3), TASK),
+        cell_fingerprint(make_agent(), TASK, trial_timeout=60),
+        cell_fingerprint(make_agent(), TASK, judge=Evaluator(model=Model.SCRIPTED)),
+    ]
+    monkeypatch.setattr("src.tool_cache._enabled", True)
+    changed.append(cell_fingerprint(make_agent(), TASK))
+    assert base not in changed
+    assert len(set(changed)) == len(changed)
+
+def test_load_baseline_skips_partial_line_and_unfingerprinted_trials(tmp_path):
+    path = tmp_path / "results.jsonl"
+    lines = [
+        json.dumps({"task": {"name": "a"}, "info": {"fingerprint": "f1"}}) + "\n",
+        json.dumps({"task": {"name": "a"}, "info": {"stop_reason": "timeout"}}) + "\n",
+        "\n",
+        json.dumps({"task": {"name": "a"}, "info": {"fingerprint": "f1"}}) + "\n",
+        json.dumps({"task": {"name": "b"}, "info": {"fingerprint": "f2"}})[:25],
+    ]
+    path.write_text("".join(lines))
+
+    baseline = load_baseline(str(path))
+    assert baseline == {"f1": [lines[0], lines[3]]}
+
+def test_load_baseline_without_file(tmp_path):
+    assert load_baseline(str(tmp_path / "missing.jsonl")) == {}
@@ -0,0 +1,43 @@
+import pytest
+import requests
+
+from src.http_hooks import register_send_hook, unregister_send_hook
+
+@pytest.fixture
+def calls(hubspot):
+    calls = []
+    yield calls
+    for name in ("outer", "inner", "short"):
+        unregister_send_hook(name)
+
+def recording_hook(name, calls):
+    def hook(request, send, **kwargs):
+        calls.append(f"{name} before")
+        response = send(request, **kwargs)
+        calls.append(f"{name} after {response.status_code}")
+        return response
+    return hook
+
+def test_hooks_run_by_order_whatever_the_registration_order(calls):
+    register_send_hook("inner", recording_hook("inner", calls), order=10)
+    register_send_hook("outer", recording_hook("outer", calls), order=0)
+
+    requests.get("https://api.hubapi.com/crm/v3/objects/contacts", headers={"Authorization": "Bearer test"})
+    assert calls == ["outer before", "inner before", "inner after 200", "outer after 200"]
+
+def test_outer_hook_sees_the_response_of_an_inner_one(calls):
+    def short_circuit(request, send, **kwargs):
+        response = requests.Response()
+        response.status_code = 429
+        return response
+
+    register_send_hook("outer", recording_hook("outer", calls), order=0)
+    register_send_hook("short", short_circuit, order=10)
+    assert requests.get("https://api.hubapi.com/crm/v3/objects/contacts").status_code == 429
+    assert calls == ["outer before", "outer after 429"]
+
+def test_registering_a_name_again_replaces_the_hook(calls):
+    register_send_hook("outer", recording_hook("first", calls), order=0)
+    register_send_hook("outer", recording_hook("second", calls), order=0)
+    requests.get("https://api.hubapi.com/crm/v3/objects/contacts", headers={"Authorization": "Bearer test"})
+    assert calls == ["second before", "second after 200"]
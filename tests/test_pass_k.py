@@ -0,0 +1,59 @@
+import json
+from math import comb
+
+import pytest
+
+from src.processing.pass_k import COUNTERS, add_totals, count_result, feature_totals, pass_k_from_counts
+from src.processing.result_index import load_index, update_counts
+
+def result_line(task: str, passed: bool, info=None) -> str:
+    return json.dumps({"task": {"name": task}, "verdict": {"verdict": passed}, "trials_count": 4, "info": info}) + "\n"
+
+@pytest.fixture
+def retries_counter(monkeypatch):
+    def count_retries(totals, passed, retries):
+        add_totals(totals, trials=1, retries=retries)
+    monkeypatch.setitem(COUNTERS, "retries", count_retries)
+
+@pytest.mark.parametrize("n, c", [(4, 4), (4, 3), (10, 7), (59, 31)])
+def test_pass_k_matches_the_binomial_ratio(n, c):
+    counts = {"a": {"n": n, "c": c, "k": n}}
+    pass_k = pass_k_from_counts(counts)["a"]
+    assert pass_k == {k: round(comb(c, k) / comb(n, k), 4) for k in range(1, n+1)}
+
+def test_excluded_trials_are_counted_apart():
+    counts = {}
+    count_result(counts, "a", True, 4)
+    count_result(counts, "a", False, 4, {"stop_reason": "infra_error"})
+    count_result(counts, "a", False, 4, {"stop_reason": "budget", "budget": {"cap": "sweep"}})
+    count_result(counts, "a", False, 4, {"stop_reason": "budget", "budget": {"cap": "trial"}})
+    assert counts["a"] == {"n": 2, "c": 1, "k": 4, "infra_errors": 1, "budget_stopped": 1}
+
+def test_registered_counters_fill_feature_totals(retries_counter):
+    counts = {}
+    count_result(counts, "a", True, 4, {"retries": 2})
+    count_result(counts, "a", False, 4, {"retries": 1})
+    count_result(counts, "b", True, 4)
+    assert feature_totals(counts, "retries") == {"a": {"trials": 2, "retries": 3}}
+
+def test_index_folds_only_appended_lines(tmp_path, retries_counter):
+    results_file = tmp_path / "vibecode.jsonl"
+    results_file.write_text(result_line("a", True, {"retries": 1}))
+    assert update_counts(str(results_file))["a"]["n"] == 1
+
+    with open(results_file, "a") as f:
+        f.write(result_line("a", False))
+        # still being written
+        f.write(result_line("a", True)[:10])
+    counts = update_counts(str(results_file))
+    assert counts["a"] == {"n": 2, "c": 1, "k": 4, "retries": {"trials": 1, "retries": 1}}
+    assert load_index(str(results_file))["offset"] == len(result_line("a", True, {"retries": 1})) + len(result_line("a", False))
+
+def test_index_is_rebuilt_when_the_counters_change(tmp_path, retries_counter, monkeypatch):
+    results_file = tmp_path / "vibecode.jsonl"
+    results_file.write_text(result_line("a", True, {"retries": 1, "cached": 3}))
+    assert "cached" not in update_counts(str(results_file))["a"]
+
+    monkeypatch.setitem(COUNTERS, "cached", lambda totals, passed, cached: add_totals(totals, calls=cached))
+    assert load_index(str(results_file)) is None
+    assert update_counts(str(results_file))["a"]["cached"] == {"calls": 3}
@@ -0,0 +1,86 @@
+import json
+import os
+
+import pytest
+
+from src.sharding import Shard, TrialItem, WorkQueue, enumerate_trials, merge_shards
+
+def result_line(task: str, trial_idx: int, verdict: bool = True) -> str:
+    return json.dumps({"task": {"name": task}, "trial_idx": trial_idx, "verdict": {"verdict": verdict}}) + "\n"
+
+def write_shard(path, lines, mtime):
+    path.write_text("".join(lines))
+    os.utime(path, (mtime, mtime))
+
+def test_shards_partition_the_sweep():
+    items = enumerate_trials(["superface", "vibecode"], ["a", "b", "c"], 4)
+    shards = [Shard.parse(f"{i}/3") for i in range(3)]
+    selected = [item.key for shard in shards for item in shard.select(items)]
+    assert sorted(selected) == sorted(item.key for item in items)
+    assert len(set(selected)) == len(items)
+
+@pytest.mark.parametrize("value", ["3/3", "-1/2", "1", "a/b", "0/0"])
+def test_invalid_shard(value):
+    with pytest.raises(ValueError):
+        Shard.parse(value)
+
+def test_merge_keeps_latest_result_in_task_order(tmp_path, results_dir):
+    shards = tmp_path / "shards"
+    shards.mkdir()
+    write_shard(shards / "vibecode.0of2.jsonl", [result_line("b", 1), result_line("a", 1, verdict=False)], 1000)
+    # rerun of a/1 written later
+    write_shard(shards / "vibecode.1of2.jsonl", [result_line("a", 2), result_line("a", 1, verdict=True)], 2000)
+
+    assert merge_shards(str(shards)) == [("vibecode", 3, 1, 0)]
+    merged = [json.loads(line) for line in (results_dir / "vibecode.jsonl").read_text().splitlines()]
+    assert [(r["task"]["name"], r["trial_idx"], r["verdict"]["verdict"]) for r in merged] == [("b", 1, True), ("a", 1, True), ("a", 2, True)]
+
+def test_merge_skips_partially_written_last_line(tmp_path, results_dir):
+    shards = tmp_path / "shards"
+    shards.mkdir()
+    # a queue worker killed in the middle of writing its second result
+    write_shard(shards / "vibecode.worker.jsonl", [result_line("a", 1), result_line("a", 2)[:20]], 1000)
+
+    assert merge_shards(str(shards)) == [("vibecode", 1, 0, 1)]
+    assert (results_dir / "vibecode.jsonl").read_text() == result_line("a", 1)
+
+def items(count):
+    return [TrialItem(toolset="vibecode", task="a", trial_idx=i, trials_count=count) for i in range(1, count+1)]
+
+def test_queue_leases_each_item_once(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.enqueue(items(2))
+    # enqueueing the same matrix again adds nothing
+    queue.enqueue(items(2))
+
+    first = queue.lease("w1", ["vibecode"])
+    second = queue.lease("w2", ["vibecode"])
+    assert {first.key, second.key} == {item.key for item in items(2)}
+    assert queue.lease("w3", ["vibecode"]) is None
+    assert queue.lease("w1", ["superface"]) is None
+
+    queue.complete(first, "w1")
+    queue.release(second, "w2")
+    assert queue.stats() == {"done": 1, "pending": 1}
+    assert queue.lease("w3", ["vibecode"]).key == second.key
+
+def test_expired_lease_moves_to_another_worker(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=-1, max_attempts=2)
+    queue.enqueue(items(1))
+
+    item = queue.lease("w1", ["vibecode"])
+    taken_over = queue.lease("w2", ["vibecode"])
+    assert taken_over.key == item.key
+    # the first worker learns on its next heartbeat that it lost the item
+    assert not queue.heartbeat(item, "w1")
+    # no more attempts left
+    assert queue.lease("w3", ["vibecode"]) is None
+
+def test_second_worker_on_the_same_portal_is_refused(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.claim_portal("w1", "portal")
+    queue.claim_portal("w2", "other portal")
+    with pytest.raises(ValueError):
+        queue.claim_portal("w3", "portal")
+    queue.release_portal("w1")
+    queue.claim_portal("w3", "portal")
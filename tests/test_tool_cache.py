@@ -0,0 +1,89 @@
+import json
+
+from src.processing.pass_k import count_result
+from src.shared import Tool, Toolset
+from src.tool_cache import ToolCache, cache_summary
+from src.vibecode_toolset import classify_vibecode_call
+
+def make_cache() -> ToolCache:
+    tools = [Tool(name, name, {}, lambda args: {}) for name in ["contacts", "companies", "associations", "properties"]]
+    return ToolCache(Toolset("test", tools, classify=classify_vibecode_call))
+
+class Backend:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, response=None):
+        def run():
+            self.calls += 1
+            return response if response is not None else {"results": [], "call": self.calls}
+        return run
+
+def call(cache: ToolCache, backend: Backend, tool: str, arguments, response=None):
+    return cache.call(tool, json.dumps(arguments) if isinstance(arguments, dict) else arguments, backend(response))
+
+SEARCH = {"operation": "search", "data": {"query": "ACME"}}
+
+def test_classifies_vibecode_calls():
+    assert classify_vibecode_call("contacts", {"operation": "search"}).write is False
+    assert classify_vibecode_call("contacts", {"operation": "create"}).write is True
+    assert classify_vibecode_call("contacts", {"operation": "delete"}) is None
+    assert classify_vibecode_call("properties", {}).object_types == ["properties"]
+    link = classify_vibecode_call("associations", {"operation": "create", "from_object_type": "contacts", "to_object_type": "companies"})
+    assert link.write and link.object_types == ["contacts", "companies"]
+    assert classify_vibecode_call("associations", {"operation": "create", "from_object_type": "contacts"}).object_types is None
+    assert classify_vibecode_call("unknown", {}) is None
+
+def test_repeated_reads_are_served_from_cache():
+    cache, backend = make_cache(), Backend()
+    first = call(cache, backend, "companies", SEARCH)
+    # same arguments in another key order
+    again = call(cache, backend, "companies", '{"data": {"query": "ACME"}, "operation": "search"}')
+    assert again == first
+    assert backend.calls == 1
+    assert cache.info()["reads"] == 2 and cache.info()["hits"] == 1
+
+def test_write_invalidates_only_its_object_types():
+    cache, backend = make_cache(), Backend()
+    call(cache, backend, "companies", SEARCH)
+    call(cache, backend, "contacts", SEARCH)
+    call(cache, backend, "contacts", {"operation": "create", "data": {"email": "john@acme.com"}})
+    assert cache.invalidated == 1
+
+    call(cache, backend, "companies", SEARCH)
+    assert backend.calls == 3
+    call(cache, backend, "contacts", SEARCH)
+    assert backend.calls == 4
+
+def test_association_write_invalidates_both_sides():
+    cache, backend = make_cache(), Backend()
+    call(cache, backend, "companies", SEARCH)
+    call(cache, backend, "contacts", SEARCH)
+    call(cache, backend, "properties", {"object_type": "contacts"})
+    call(cache, backend, "associations", {"operation": "create", "from_object_type": "contacts", "to_object_type": "companies"})
+    assert cache.invalidated == 2
+    assert len(cache.entries) == 1
+
+def test_unclassified_calls_clear_the_cache():
+    cache, backend = make_cache(), Backend()
+    call(cache, backend, "companies", SEARCH)
+    call(cache, backend, "properties", {"object_type": "contacts"})
+    call(cache, backend, "contacts", {"operation": "delete", "id": "1"})
+    call(cache, backend, "companies", "not json")
+    assert cache.entries == {}
+    assert cache.writes == 2
+
+def test_errors_are_not_cached():
+    cache, backend = make_cache(), Backend()
+    call(cache, backend, "companies", SEARCH, response={"error": "rate limited"})
+    call(cache, backend, "companies", SEARCH)
+    assert backend.calls == 2
+
+def test_cache_summary_from_trial_info():
+    counts = {}
+    count_result(counts, "a", True, 2, {"tool_cache": {"reads": 4, "hits": 1, "saved_seconds": 0.5}})
+    count_result(counts, "a", False, 2, {"tool_cache": {"reads": 4, "hits": 3, "saved_seconds": 1.5}})
+    count_result(counts, "b", True, 2, {})
+    assert counts["a"]["n"] == 2 and counts["b"]["n"] == 1
+    assert cache_summary(counts) == {"trials": 2, "reads": 8, "hit_rate": 0.5, "saved_seconds_per_trial": 1.0}
+    assert cache_summary({"b": counts["b"]}) is None
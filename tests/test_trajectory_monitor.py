@@ -0,0 +1,43 @@
+from src.trajectory_monitor import TrajectoryMonitor, fingerprint
+
+def test_fingerprint_ignores_key_order_and_whitespace():
+    assert fingerprint('{"a": 1, "b": [1, 2]}') == fingerprint({"b": [1, 2], "a": 1})
+    assert fingerprint({"a": 1}) != fingerprint({"a": 2})
+
+def test_repeated_tool_call():
+    monitor = TrajectoryMonitor(max_repeats=3)
+    for _ in range(2):
+        monitor.observe_tool_call("search", {"q": "acme"}, {"results": []})
+    # a different response is a different call
+    monitor.observe_tool_call("search", {"q": "acme"}, {"results": [1]})
+    assert monitor.stop_reason is None
+
+    monitor.observe_tool_call("search", '{"q":"acme"}', {"results": []})
+    assert monitor.stop_reason == "repeated_tool_call"
+    assert monitor.stop_details == {"tool": "search", "count": 3}
+
+def test_error_streak_is_reset_by_a_success():
+    monitor = TrajectoryMonitor(max_error_streak=3)
+    monitor.observe_tool_call("update", {"id": 1}, {"error": "Not found"})
+    monitor.observe_tool_call("update", {"id": 2}, {"error": "Not found"})
+    monitor.observe_tool_call("get", {"id": 2}, {"id": 2})
+    monitor.observe_tool_call("update", {"id": 3}, {"error": "Not found"})
+    assert monitor.stop_reason is None
+
+    monitor.observe_tool_call("update", {"id": 4}, {"error": "Not found"})
+    monitor.observe_tool_call("update", {"id": 5}, {"error": "Forbidden"})
+    assert monitor.stop_reason == "error_streak"
+    assert monitor.stop_details["error"] == "Forbidden"
+    assert monitor.info()["tool_errors"] == 5
+
+def test_alternating_steps():
+    monitor = TrajectoryMonitor(max_alternations=2)
+    assert monitor.observe_step(["a"]) is None
+    assert monitor.observe_step(["b"]) is None
+    assert monitor.observe_step(["a"]) is None
+    assert monitor.observe_step(["b"]) == "alternating_steps"
+
+def test_repeating_one_step_is_not_alternating():
+    monitor = TrajectoryMonitor(max_alternations=2)
+    for _ in range(4):
+        assert monitor.observe_step(["a"]) is None